@@ -1,55 +1,589 @@
+import argparse
+import json
 import logging
+import os
+import time
+from datetime import date, datetime
+from sqlalchemy import case, func, select, update
 from sqlalchemy.orm import Session
-from models import Order, Inventory, AllocationResult
+from sqlalchemy.orm.exc import StaleDataError
+from models import Order, Inventory, AllocationResult, InventorySummary
+from result_writer import AllocationResultWriter
+import pricing
+import metrics
+from lot_cache import lot_cache
+from lot_index import LotIndex, SPECIFIC_LOT_SELECTION, linear_select
+import ranking
+from inventory_summary import (build_summary, ensure_summaries, get_summary, load_summaries, deplete_lot, apply_depletions, apply_consumption,
+                               apply_consumptions, consumption, summary_values, average_price as summary_average_price)
+import checkpoints
+from checkpoints import find_checkpoint, start_checkpoint, record_progress
+from backorders import BACKORDER_MAX_ATTEMPTS, BACKORDER_STRATEGY, BackorderDemand, load_backorders, queue_backorder, settle_backorder
+from log_config import ALLOCATION_LOG_INTERVAL, configure_logging
+import scheduler
+from strategies import AllocationStrategy, ASCENDING, DESCENDING, get_strategy, register_strategy, strategy_names
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def allocate_inventory(db: Session, strategy: str):
+# 割当API・一括割当で在庫・注文の更新が競合した場合の最大試行回数（一括割当は競合した商品ごとに再試行する）
+ALLOCATION_MAX_ATTEMPTS = int(os.environ.get("ALLOCATION_MAX_ATTEMPTS", "3"))
+
+def allocate_inventory(db: Session, strategy: str, chunk_size: int = None, item_codes: list[str] = None, time_slice: float = None,
+                       commit_orders: int = None, commit_seconds: float = None, resume: bool = False) -> dict:
     """
     在庫割り当てを実行する関数
     :param db: データベースセッション
-    :param strategy: 割り当て戦略
+    :param strategy: 割り当て戦略名（strategies.get_strategy で解決する）
+    :param chunk_size: 割り当て結果を一括INSERTする行数（省略時はライタの既定値）
+    :param item_codes: 割り当て対象の商品コード（省略時は全商品。並列実行時のシャード指定に使用）
+    :param time_slice: 処理時間の目安の秒数（省略時は環境変数 ALLOCATION_TIME_SLICE。0は無制限）
+    :param commit_orders: 1トランザクションで割り当てる注文数の目安（省略時は環境変数 ALLOCATION_COMMIT_ORDERS。
+                          0は処理時間の目安・再開のみの場合に ALLOCATION_COMMIT_ORDERS_DEFAULT、それ以外は区切らない）
+    :param commit_seconds: 1トランザクションの処理時間の目安の秒数（省略時は環境変数 ALLOCATION_COMMIT_SECONDS。0は区切らない）
+    :param resume: 戦略・対象商品の実行中のチェックポイントから再開するかどうか
+
+    未割当の注文と対象商品の在庫をそれぞれ一括で取得し、商品コードごとに
+    メモリ上でグループ化してから割り当てを行う（注文ごとの在庫クエリは発行しない）。
+    在庫は戦略が宣言した並び順に商品ごとに1回だけ並べ替えて渡す。
+    在庫不足で注文数量をすべて引き当てられなかった注文はバックオーダーに登録する（割当済みにはしない）。
+    商品は最も緊急度の高い注文の順に、商品内の注文は優先度・納期順に割り当てる（scheduler）。
+    処理時間が time_slice を超えた場合は商品の区切りで中断してコミットする（残りの商品数は要約の remaining_items。
+    再度実行すると残りの商品を処理する）。
+    commit_orders・commit_seconds・resume を指定した場合は、未割当の注文のある商品を商品コード順のキーセットで
+    注文数の目安ずつ取得して区切りとし（区切り内は緊急度順）、区切りごとに注文・在庫を取得して割り当て、
+    処理時間の目安でも商品の区切りでコミットする（進捗はチェックポイントに記録し、再開時は最後の区切りの商品コードから続ける）。
+    区切りの割り当てはセーブポイント内で行い、割当APIの引当などと在庫・注文のバージョンが競合した場合は
+    セーブポイントまでロールバックして、区切りの商品ごとに注文・在庫を読み込み直して割り当てる（reallocate_items）。
+    :return: 実行結果の要約（件数・DBラウンドトリップ数・フェーズごとの所要時間。ログにも出力する）
     """
-    logger.info(f"Starting inventory allocation with strategy: {strategy}")
+    logger.info("Starting inventory allocation with strategy: %s", strategy)
+    allocation_strategy = get_strategy(strategy)
+    # 注文ごとのログはDEBUGの場合のみ出力する（判定は実行ごとに1回）
+    debug = logger.isEnabledFor(logging.DEBUG)
+    time_slice = scheduler.ALLOCATION_TIME_SLICE if time_slice is None else time_slice
+    commit_orders = checkpoints.ALLOCATION_COMMIT_ORDERS if commit_orders is None else commit_orders
+    commit_seconds = checkpoints.ALLOCATION_COMMIT_SECONDS if commit_seconds is None else commit_seconds
+    chunked = bool(commit_orders or commit_seconds or resume)
+    if chunked and not commit_orders:
+        # 処理時間の目安・再開のみの場合も1区切りで取得する注文・在庫の行数は上限までとする
+        commit_orders = checkpoints.ALLOCATION_COMMIT_ORDERS_DEFAULT
+    checkpoint = None
+    max_order_id = None
+
+    with metrics.allocation_run(strategy) as run:
+        # 割り当て対象の注文を一括取得し、商品コードごとにグループ化
+        with run.phase("query_orders"):
+            if chunked:
+                # 区切りコミットでは注文を一括取得しない（商品コードのキーセットで区切りごとに取得する）
+                checkpoint = find_checkpoint(db, strategy, item_codes) if resume else None
+                if checkpoint is None:
+                    # 実行中に登録された注文は次回の実行で割り当てる
+                    max_order_id = db.execute(select(func.max(Order.id)).where(*open_order_filters(item_codes))).scalar()
+                    if max_order_id is not None:
+                        checkpoint = start_checkpoint(db, strategy, item_codes, max_order_id)
+                else:
+                    max_order_id = checkpoint.max_order_id
+                after_item_code = checkpoint.last_item_code if checkpoint is not None else None
+                item_order = []
+            else:
+                orders_by_item = group_by_item_code(query_open_orders(db, item_codes).all())
+                item_order = scheduler.order_items(orders_by_item)
+
+        # 割り当て結果はORMオブジェクトを生成せずにチャンク単位で書き込む
+        writer = AllocationResultWriter(db, chunk_size=chunk_size)
+        next_progress = ALLOCATION_LOG_INTERVAL
+        processed = 0
+        suspended = False
+        started = time.monotonic()
+
+        with allocation_strategy.run_scope():
+            while True:
+                if chunked:
+                    # 前の区切りの商品コードより後の、注文数の目安に達するまでの商品を1つの区切りとし、その注文・在庫・在庫集計を取得する
+                    if max_order_id is None:
+                        break
+                    with run.phase("query_orders"):
+                        page, last_page = next_partition(db, item_codes, max_order_id, after_item_code, commit_orders)
+                        partition_orders = group_by_item_code(query_open_orders(db, page, max_order_id).all())
+                        partition = scheduler.order_items(partition_orders)
+                    with run.phase("query_inventories"):
+                        inventories_by_item = load_inventories_by_item(db, partition)
+                        ensure_summaries(db, partition)
+                        summaries = load_summaries(db, partition)
+                else:
+                    partition = item_order
+                    partition_orders = orders_by_item
+                    # 対象商品の在庫と在庫集計を一括取得し、商品コードごとにグループ化（各グループはID順）
+                    with run.phase("query_inventories"):
+                        inventories_by_item = load_inventories_by_item(db, item_codes)
+                        ensure_summaries(db, open_item_codes(item_codes))
+                        summaries = load_summaries(db, open_item_codes(item_codes))
+
+                done = 0
+                consumed = {}
+                partition_items = partition_orders_count = 0
+                suspended = False
+                partition_started = time.monotonic()
+                counts = (run.items, run.orders, run.backorders, run.lots_touched, writer.written)
+                savepoint = db.begin_nested()
+                try:
+                    with run.phase("strategy"):
+                        for item_code in partition:
+                            if processed + done:
+                                now = time.monotonic()
+                                if time_slice and now - started > time_slice:
+                                    # 時間枠を超えた場合は商品の区切りで中断する（残りの商品は次回の実行で処理する）
+                                    suspended = True
+                                    break
+                                if commit_seconds and done and now - partition_started > commit_seconds:
+                                    # 区切りの処理時間の目安を超えた場合は商品の区切りでコミットする（残りの商品は次の区切りで取得し直す）
+                                    break
+                            done += 1
+                            item_orders = partition_orders.get(item_code)
+                            if not item_orders:
+                                # 区切りの取得までに割り当て済みになった商品
+                                continue
+                            # 集計の行が無い商品は在庫も無い（空の集計で割り当て、集計は更新しない）
+                            inventories = inventories_by_item.get(item_code, [])
+                            summary = summaries.get(item_code) or build_summary(item_code, inventories)
+                            consumed[item_code] = allocate_item_orders(db, allocation_strategy, item_orders, inventories, writer, summary, run, debug)
+                            partition_items += 1
+                            partition_orders_count += len(item_orders)
+                            if run.orders >= next_progress:
+                                # 進捗は一定の注文数ごとにまとめて出力する
+                                logger.info("Allocated %d orders (%d items, %d results written)", run.orders, run.items, writer.written)
+                                next_progress = (run.orders // ALLOCATION_LOG_INTERVAL + 1) * ALLOCATION_LOG_INTERVAL
+                    # 在庫集計は割り当て前後の差分を減算する（APIの入荷・引当と同時に更新しても失われない）
+                    apply_consumptions(db, consumed)
+                    # 在庫数量・割当フラグの更新はまとめてフラッシュしてからコミットする
+                    writer.flush()
+                    with run.phase("flush"):
+                        db.flush()
+                    savepoint.commit()
+                except StaleDataError as error:
+                    # 読み込んだ後に割当APIなどが更新した在庫・注文がある場合は、区切りの割り当てを取り消して商品ごとにやり直す
+                    savepoint.rollback()
+                    writer.discard()
+                    run.items, run.orders, run.backorders, run.lots_touched, writer.written = counts
+                    logger.warning("Allocation conflicted with a concurrent update, retrying %d items one by one: %s", done, error)
+                    partition_items, partition_orders_count = reallocate_items(db, allocation_strategy, partition[:done], max_order_id, writer, run, debug)
+                processed += done
+                completed = done == len(partition)
+                if chunked and completed:
+                    # 区切りの商品をすべて割り当てた場合のみ次の区切りに進む（途中でコミットした区切りの残りの商品は取得し直す。
+                    # 割り当てた商品は割当済み・バックオーダーになるため再び取得されない）
+                    after_item_code = page[-1] if page else after_item_code
+                    completed = last_page
+
+                if checkpoint is not None:
+                    # 進捗は区切りのコミットと同じトランザクションで記録する
+                    record_progress(checkpoint, after_item_code, partition_items, partition_orders_count, completed=completed)
+                with run.phase("commit"):
+                    db.commit()
+                run.commits += 1
+
+                # 割当APIのロットキャッシュは一括割当による在庫の変更を含まないため破棄する
+                for item_code in partition[:done]:
+                    lot_cache.invalidate(item_code)
+                if suspended or (completed and (not chunked or last_page)):
+                    break
+        if not chunked:
+            run.remaining_items = len(item_order) - processed
+        elif suspended:
+            run.remaining_items = count_open_items(db, item_codes, max_order_id)
 
-    # 割り当て対象の注文を取得
-    orders = db.query(Order).filter(Order.allocated == False).all()
+    run_summary = run.summary(allocation_results=writer.written)
+    logger.info("Inventory allocation completed: %s", json.dumps(run_summary))
+    return run_summary
 
+def allocate_item_orders(db: Session, allocation_strategy: AllocationStrategy, orders: list[Order], inventories: list[Inventory],
+                         writer: AllocationResultWriter, summary: InventorySummary, run: metrics.AllocationRun, debug: bool = False) -> tuple:
+    """
+    一括割当で1商品分の未割当の注文に在庫を割り当てる関数
+    :param db: データベースセッション
+    :param allocation_strategy: 割り当て戦略
+    :param orders: 割り当て対象の注文リスト（同一商品）
+    :param inventories: 在庫リスト（ID順）
+    :param writer: 割り当て結果ライタ
+    :param summary: 在庫集計
+    :param run: 一括割当の計測（件数を加算する）
+    :param debug: 注文ごとのログを出力するかどうか
+    :return: 在庫集計から減算する差分（inventory_summary.consumption）
+    """
+    before = summary_values(summary)
+    lots = inventories if allocation_strategy.lot_order == ASCENDING else inventories[::-1]
+    orders = scheduler.schedule(orders, sum(lot.quantity for lot in lots))
+    run.lots_touched += allocate_orders(db, allocation_strategy, orders, lots, writer, summary, debug)
+    # 注文数量をすべて引き当てられなかった注文はバックオーダーとして入荷時に引き当てる（次回の一括割当では読み込まない）
     for order in orders:
-        logger.info(f"Processing order {order.id} with item code {order.item_code} and quantity {order.quantity}")
-
-        # 在庫を取得
-        inventories = db.query(Inventory).filter(Inventory.item_code == order.item_code).order_by(Inventory.id).all()
-
-        # 割り当て戦略に応じて在庫割り当てを実行
-        if strategy == "FIFO":
-            allocate_fifo(db, order, inventories)
-        elif strategy == "LIFO":
-            allocate_lifo(db, order, inventories)
-        elif strategy == "AVERAGE":
-            allocate_average(db, order, inventories)
-        elif strategy == "SPECIFIC":
-            allocate_specific(db, order, inventories)
-        elif strategy == "TOTAL_AVERAGE":
-            allocate_total_average(db, order, inventories)
-        elif strategy == "MOVING_AVERAGE":
-            allocate_moving_average(db, order, inventories)
+        if order.remaining_quantity > 0:
+            queue_backorder(db, order)
+            run.backorders += 1
         else:
-            raise ValueError(f"Unknown allocation strategy: {strategy}")
+            order.allocated = True
+    run.items += 1
+    run.orders += len(orders)
+    return consumption(summary, before)
+
+def reallocate_items(db: Session, allocation_strategy: AllocationStrategy, item_codes: list[str], max_order_id: int,
+                     writer: AllocationResultWriter, run: metrics.AllocationRun, debug: bool = False) -> tuple[int, int]:
+    """
+    競合でロールバックした区切りの商品を1商品ずつ割り当て直す関数
+    :param db: データベースセッション
+    :param allocation_strategy: 割り当て戦略
+    :param item_codes: 割り当て直す商品コード（処理順）
+    :param max_order_id: 対象の注文IDの上限（省略時は上限なし）
+    :param writer: 割り当て結果ライタ
+    :param run: 一括割当の計測
+    :param debug: 注文ごとのログを出力するかどうか
+    :return: (割り当てた商品数, 割り当てた注文数)
+
+    商品ごとにセーブポイントを作成し、注文・在庫・在庫集計を読み込み直して割り当てる。再び競合した場合は
+    その商品のみをロールバックし、ALLOCATION_MAX_ATTEMPTS 回まで再試行する（連続して失敗した場合は例外を送出する）。
+    """
+    items = orders_count = 0
+    for item_code in item_codes:
+        for attempt in range(1, ALLOCATION_MAX_ATTEMPTS + 1):
+            # ロールバックしたセーブポイントより前に読み込んだ在庫・注文も、他の処理の更新を反映して読み込み直す
+            db.expire_all()
+            counts = (run.items, run.orders, run.backorders, run.lots_touched, writer.written)
+            savepoint = db.begin_nested()
+            try:
+                orders = query_open_orders(db, [item_code], max_order_id).all()
+                if orders:
+                    inventories = load_inventories_by_item(db, [item_code]).get(item_code, [])
+                    ensure_summaries(db, [item_code])
+                    summary = load_summaries(db, [item_code]).get(item_code) or build_summary(item_code, inventories)
+                    apply_consumptions(db, {item_code: allocate_item_orders(db, allocation_strategy, orders, inventories, writer, summary, run, debug)})
+                    writer.flush()
+                    db.flush()
+                savepoint.commit()
+            except StaleDataError as error:
+                savepoint.rollback()
+                writer.discard()
+                run.items, run.orders, run.backorders, run.lots_touched, writer.written = counts
+                if attempt == ALLOCATION_MAX_ATTEMPTS:
+                    raise
+                logger.warning("Allocation for item code %s conflicted with a concurrent update (attempt %d): %s", item_code, attempt, error)
+                continue
+            if orders:
+                items += 1
+                orders_count += len(orders)
+            break
+    return items, orders_count
+
+def allocate_orders(db: Session, allocation_strategy: AllocationStrategy, orders: list, lots: list[Inventory], writer: AllocationResultWriter,
+                    summary: InventorySummary, debug: bool = False) -> int:
+    """
+    1商品分の注文に在庫を割り当てる関数（一括割当とバックオーダーの引当で共用）
+    :param db: データベースセッション
+    :param allocation_strategy: 割り当て戦略
+    :param orders: 割り当て対象の注文リスト（同一商品、処理順。quantity を必要数量として割り当てる）
+    :param lots: 在庫リスト（戦略が宣言した並び順）
+    :param writer: 割り当て結果ライタ
+    :param summary: 在庫集計
+    :param debug: 注文ごとのログを出力するかどうか
+    :return: 引当したロット数
+
+    各注文の引当数量は create_allocation_result で order.allocated_quantity に加算される。
+    """
+    # 在庫集計を参照しない戦略は、商品ごとの割り当て後に引当数量をまとめて集計に反映する
+    strategy_summary = summary if allocation_strategy.needs_aggregate else None
+    quantities_before = [lot.quantity for lot in lots]
+
+    # 商品単位の一括計算（平均系の戦略のNumPyカーネル）が可能な場合は全注文をまとめて割り当てる
+    if allocation_strategy.allocate_item is not None and allocation_strategy.allocate_item(db, orders, lots, writer, strategy_summary):
+        if debug:
+            logger.debug("Allocated %d orders for item code %s with vectorized %s", len(orders), orders[0].item_code, allocation_strategy.name)
+    else:
+        for order in orders:
+            if debug:
+                logger.debug("Processing order %d with item code %s and quantity %d", order.id, order.item_code, order.quantity)
+            allocation_strategy.allocate(db, order, lots, writer, strategy_summary)
+
+    if not allocation_strategy.needs_aggregate:
+        apply_depletions(summary, lots, quantities_before)
+    return sum(1 for lot, before in zip(lots, quantities_before) if lot.quantity != before)
+
+def allocate_backorders(db: Session, item_code: str, strategy: str = None, chunk_size: int = None, limit: int = None) -> int:
+    """
+    商品のバックオーダーに在庫を割り当てる関数（入荷時に呼び出す。コミットは呼び出し側で行う）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param strategy: 割り当て戦略名（省略時は環境変数 BACKORDER_STRATEGY）
+    :param chunk_size: 割り当て結果を一括INSERTする行数
+    :param limit: 割り当てるバックオーダー数の上限（省略時はすべて）
+    :return: 引き当てた数量の合計
+
+    バックオーダーを優先度順に、在庫の残数量の合計に達するまで取り出して割り当てる
+    （処理量はその商品のバックオーダー数と在庫ロット数に比例し、注文テーブルの大きさに依存しない）。
+    """
+    backorders = load_backorders(db, item_code, limit)
+    if not backorders:
+        return 0
+    allocation_strategy = get_strategy(strategy or BACKORDER_STRATEGY)
+    inventories = db.query(Inventory).filter(Inventory.item_code == item_code, Inventory.quantity > 0).order_by(Inventory.id).all()
+
+    # 在庫で引き当てられる範囲のバックオーダーのみを割り当てる（最後の1件は一部のみ引き当てられる場合がある）
+    available = sum(inventory.quantity for inventory in inventories)
+    selected = []
+    for backorder, order in backorders:
+        if available <= 0:
+            break
+        selected.append((backorder, order))
+        available -= backorder.remaining_quantity
+    if not selected:
+        return 0
+
+    summary = get_summary(db, item_code)
+    before = summary_values(summary)
+    lots = inventories if allocation_strategy.lot_order == ASCENDING else inventories[::-1]
+    demands = [BackorderDemand(backorder, order) for backorder, order in selected]
+    writer = AllocationResultWriter(db, chunk_size=chunk_size)
+    allocate_orders(db, allocation_strategy, demands, lots, writer, summary)
+    apply_consumptions(db, {item_code: consumption(summary, before)})
+    writer.flush()
+
+    completed = 0
+    for demand, (backorder, order) in zip(demands, selected):
+        completed += settle_backorder(db, backorder, order, demand.allocated_quantity)
+    allocated_quantity = sum(demand.allocated_quantity for demand in demands)
+    logger.info("Allocated %d units to %d backorders for item code %s (%d completed)", allocated_quantity, len(demands), item_code, completed)
+    return allocated_quantity
+
+def fill_backorders(db: Session, item_code: str, limit: int = None, max_attempts: int = None) -> int:
+    """
+    商品のバックオーダーに在庫を割り当ててコミットする関数（入荷の登録をコミットした後に呼び出す）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param limit: 割り当てるバックオーダー数の上限（省略時はすべて）
+    :param max_attempts: 最大試行回数（省略時は環境変数 BACKORDER_MAX_ATTEMPTS）
+    :return: 引き当てた数量の合計（試行回数の上限まで競合した場合は0）
+
+    割当APIの引当・一括割当と在庫・注文のバージョンが競合した場合はロールバックし、バックオーダーと在庫を
+    読み込み直して再試行する。引き当てられなかったバックオーダーは、入荷のイベントから差分割当のワーカーが引き当てる。
+    """
+    max_attempts = BACKORDER_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    for attempt in range(1, max_attempts + 1):
+        try:
+            allocated_quantity = allocate_backorders(db, item_code, limit=limit)
+            db.commit()
+            return allocated_quantity
+        except StaleDataError as error:
+            db.rollback()
+            logger.warning("Backorder allocation for item code %s conflicted with a concurrent update (attempt %d): %s", item_code, attempt, error)
+    return 0
+
+def allocate_with_kernel(db: Session, orders: list[Order], inventories: list[Inventory], writer: AllocationResultWriter, kernel, summary: InventorySummary = None) -> bool:
+    """
+    NumPyカーネルで複数の注文をまとめて割り当てる関数
+    :param db: データベースセッション
+    :param orders: 割り当て対象の注文リスト（同一商品、処理順）
+    :param inventories: 在庫リスト（ID順）
+    :param writer: 割り当て結果ライタ
+    :param kernel: pricing モジュールの価格計算関数
+    :param summary: 在庫集計（指定時は引当数量を反映する）
+    :return: カーネルで割り当てた場合はTrue、カーネルを使用できない場合はFalse
+    """
+    lot_quantities = [inventory.quantity for inventory in inventories]
+    lot_prices = [inventory.unit_price for inventory in inventories]
+    demands = [order.quantity for order in orders]
+    if not pricing.is_supported(lot_quantities, lot_prices, demands):
+        return False
+
+    prices, remaining = kernel(lot_quantities, lot_prices, demands)
+    # 各注文の引当数量（在庫を先頭から順に引き当てるため、在庫総数量に達した以降の注文は不足する）
+    available = sum(lot_quantities)
+    for order, price in zip(orders, prices):
+        allocated_quantity = min(order.quantity, available)
+        available -= allocated_quantity
+        create_allocation_result(db, order, allocated_quantity, price, writer)
+    for inventory, quantity in zip(inventories, remaining):
+        if inventory.quantity != quantity:
+            deplete_lot(inventory, inventory.quantity - quantity, summary)
+    return True
+
+def group_by_item_code(records: list) -> dict[str, list]:
+    """
+    レコードを商品コードごとにグループ化する関数
+    :param records: item_code属性を持つレコードのリスト
+    :return: 商品コードをキー、レコードのリスト（元の順序を保持）を値とする辞書
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(record.item_code, []).append(record)
+    return groups
+
+def open_order_filters(item_codes: list[str] = None, max_order_id: int = None) -> list:
+    """
+    未割当の注文（バックオーダーの注文を除く）の条件を返す関数
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限（省略時は上限なし）
+    :return: WHERE句の条件のリスト
+    """
+    filters = [Order.allocated == False, Order.backordered == False]
+    if item_codes is not None:
+        filters.append(Order.item_code.in_(item_codes))
+    if max_order_id is not None:
+        filters.append(Order.id <= max_order_id)
+    return filters
+
+def query_open_orders(db: Session, item_codes: list[str] = None, max_order_id: int = None):
+    """
+    未割当の注文を商品コード・ID順に取得するクエリ（部分インデックス ix_orders_open を使用。バックオーダーの注文は除く）
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限（省略時は上限なし。チェックポイントからの再開で使用）
+    """
+    return db.query(Order).filter(*open_order_filters(item_codes, max_order_id)).order_by(Order.item_code, Order.id)
+
+def query_open_item_counts(db: Session, item_codes: list[str] = None, max_order_id: int = None, after_item_code: str = None, limit: int = None):
+    """
+    未割当の注文のある商品コードと注文数を商品コード順に取得するクエリ（区切りコミットのキーセットページングに使用）
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限（省略時は上限なし）
+    :param after_item_code: この商品コードより後の商品を取得する（前の区切りの最後の商品コード）
+    :param limit: 取得する商品数の上限
+    """
+    filters = open_order_filters(item_codes, max_order_id)
+    if after_item_code is not None:
+        filters.append(Order.item_code > after_item_code)
+    return db.execute(
+        select(Order.item_code, func.count()).where(*filters).group_by(Order.item_code).order_by(Order.item_code).limit(limit)
+    )
+
+def next_partition(db: Session, item_codes: list[str], max_order_id: int, after_item_code: str, commit_orders: int) -> tuple[list[str], bool]:
+    """
+    区切りコミットの次の区切りの商品コードを取得する関数
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限
+    :param after_item_code: 前の区切りの最後の商品コード（最初の区切りはNone）
+    :param commit_orders: 1区切りの注文数の目安
+    :return: (区切りの商品コードのリスト（商品コード順。最低1商品を含み、1商品の注文は分割しない）, 最後の区切りかどうか)
+
+    取得する行数は commit_orders + 1 商品まで（各商品の注文は1件以上のため、目安に達するまでの商品と
+    その次の商品の有無が分かる）。注文のキーをすべて読み込まないため、メモリ使用量は未割当の注文数に依存しない。
+    """
+    rows = query_open_item_counts(db, item_codes, max_order_id, after_item_code, commit_orders + 1).all()
+    page = []
+    count = 0
+    for item_code, orders in rows:
+        if page and count >= commit_orders:
+            break
+        page.append(item_code)
+        count += orders
+    return page, len(page) == len(rows)
+
+def count_open_items(db: Session, item_codes: list[str] = None, max_order_id: int = None) -> int:
+    """
+    未割当の注文のある商品数を返す関数（区切りコミットを時間枠で中断した場合の残りの商品数）
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限（省略時は上限なし）
+    """
+    return db.execute(select(func.count(func.distinct(Order.item_code))).where(*open_order_filters(item_codes, max_order_id))).scalar()
+
+def query_inventories(db: Session, item_codes: list[str] = None):
+    """
+    未割当の注文が存在する商品の残数量のある在庫を商品コード・ID順に取得するクエリ
+    （使い切ったロットは読み込まない。部分インデックス ix_inventories_open_lots を使用）
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    """
+    return (
+        db.query(Inventory)
+        .filter(Inventory.item_code.in_(open_item_codes(item_codes)), Inventory.quantity > 0)
+        .order_by(Inventory.item_code, Inventory.id)
+    )
+
+def reserve_lot(db: Session, item_code: str, lot_id: int, quantity: int, unit_price: float) -> bool:
+    """
+    在庫ロットから条件付きUPDATEで数量を引き当てる関数（割当APIで使用）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param lot_id: 在庫ID
+    :param quantity: 引当数量
+    :param unit_price: 在庫単価（在庫集計の更新に使用）
+    :return: 引き当てた場合はTrue、残数量が足りない場合（他の処理が先に引き当てた場合）はFalse
+
+    在庫を読み込まずに UPDATE ... SET quantity = quantity - :n WHERE id = :id AND quantity >= :n を発行し、
+    更新後の残数量をRETURNINGで受け取って在庫集計に反映する。バージョンも加算するため、
+    同じロットを読み込んでいる一括割当の更新は競合として検出される。
+    """
+    remaining = db.execute(
+        update(Inventory)
+        .where(Inventory.id == lot_id, Inventory.quantity >= quantity)
+        .values(
+            quantity=Inventory.quantity - quantity,
+            version=Inventory.version + 1,
+            depleted_at=case((Inventory.quantity <= quantity, datetime.utcnow()), else_=Inventory.depleted_at),
+        )
+        .returning(Inventory.quantity)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if remaining is None:
+        return False
+    apply_consumption(db, item_code, quantity, quantity * unit_price, 1 if remaining <= 0 else 0)
+    return True
+
+def query_lot_for_update(db: Session, item_code: str, quantity: int):
+    """
+    指定数量以上の残数量がある最も古い入荷の在庫をロックして取得するクエリ
+    （複合インデックス ix_inventories_item_code_receipt_date_id で入荷日・ID順に検索する）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param quantity: 必要数量
+    """
+    return (
+        db.query(Inventory.id, Inventory.unit_price)
+        .filter(Inventory.item_code == item_code, Inventory.quantity >= quantity)
+        .order_by(Inventory.receipt_date, Inventory.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+def select_lot_for_update(db: Session, item_code: str, quantity: int):
+    """
+    指定数量以上の残数量がある最も古い入荷の在庫をロックして取得する関数（割当APIの再試行で使用）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param quantity: 必要数量
+    :return: 在庫IDと単価の行（該当なしの場合はNone）
+
+    PostgreSQLでは SELECT ... FOR UPDATE SKIP LOCKED を発行し、他のトランザクションが
+    引当中のロットを待たずに次のロットを選ぶ（SQLiteではロック句は無視される）。
+    """
+    return query_lot_for_update(db, item_code, quantity).first()
 
-        logger.info(f"Allocation completed for order {order.id}")
-        order.allocated = True
+def open_item_codes(item_codes: list[str] = None):
+    """
+    未割当の注文が存在する商品コードを返すサブクエリ
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    """
+    query = select(Order.item_code).where(Order.allocated == False, Order.backordered == False)
+    if item_codes is not None:
+        query = query.where(Order.item_code.in_(item_codes))
+    return query.distinct()
 
-    db.commit()
-    logger.info("Inventory allocation completed")
+def load_inventories_by_item(db: Session, item_codes: list[str] = None) -> dict[str, list[Inventory]]:
+    """
+    未割当の注文が存在する商品の残数量のある在庫を一括取得する関数
+    :param db: データベースセッション
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :return: 商品コードをキー、在庫リスト（ID順）を値とする辞書
+    """
+    return group_by_item_code(query_inventories(db, item_codes).all())
 
-def allocate_fifo(db: Session, order: Order, inventories: list[Inventory]):
+def allocate_fifo(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     FIFO戦略で在庫割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は引当数量を反映する）
 
     FIFO (First-In-First-Out) 引当:
     - 説明: 先入先出法。最も古い在庫から順番に引き当てる方法。
@@ -63,15 +597,17 @@ def allocate_fifo(db: Session, order: Order, inventories: list[Inventory]):
             break
         allocated_quantity = min(remaining_quantity, inventory.quantity)
         remaining_quantity -= allocated_quantity
-        inventory.quantity -= allocated_quantity
-        create_allocation_result(db, order, allocated_quantity, allocated_quantity * inventory.unit_price)
+        deplete_lot(inventory, allocated_quantity, summary)
+        create_allocation_result(db, order, allocated_quantity, allocated_quantity * inventory.unit_price, writer)
 
-def allocate_lifo(db: Session, order: Order, inventories: list[Inventory]):
+def allocate_lifo(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     LIFO戦略で在庫割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は引当数量を反映する）
 
     LIFO (Last-In-First-Out) 引当:
     - 説明: 後入先出法。最も新しい在庫から順番に引き当てる方法。
@@ -79,21 +615,16 @@ def allocate_lifo(db: Session, order: Order, inventories: list[Inventory]):
       - 引当数量 = min(注文数量, 在庫数量)
       - 引当価格 = 引当数量 × 在庫単価
     """
-    remaining_quantity = order.quantity
-    for inventory in reversed(inventories):
-        if remaining_quantity <= 0:
-            break
-        allocated_quantity = min(remaining_quantity, inventory.quantity)
-        remaining_quantity -= allocated_quantity
-        inventory.quantity -= allocated_quantity
-        create_allocation_result(db, order, allocated_quantity, allocated_quantity * inventory.unit_price)
+    allocate_fifo(db, order, inventories[::-1], writer, summary)
 
-def allocate_average(db: Session, order: Order, inventories: list[Inventory]):
+def allocate_average(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     平均価格戦略で在庫割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は平均単価を在庫集計から取得し、引当数量を反映する）
 
     平均引当 (Average Allocation):
     - 説明: 在庫の平均単価を使用して引き当てる方法。
@@ -101,10 +632,16 @@ def allocate_average(db: Session, order: Order, inventories: list[Inventory]):
       - 平均単価 = (在庫数量1 × 在庫単価1 + 在庫数量2 × 在庫単価2 + ...) / (在庫数量1 + 在庫数量2 + ...)
       - 引当価格 = 注文数量 × 平均単価
     """
-    total_quantity = sum(inventory.quantity for inventory in inventories)
-    total_price = sum(inventory.quantity * inventory.unit_price for inventory in inventories)
-    average_price = total_price / total_quantity if total_quantity > 0 else 0
-    logger.info(f"Calculated average price: {average_price}")
+    if summary is not None:
+        # 在庫集計から平均単価を取得する（在庫数に依存しない）
+        average_price = summary_average_price(summary)
+    elif allocate_with_kernel(db, [order], inventories, writer, pricing.average_prices):
+        return
+    else:
+        total_quantity = sum(inventory.quantity for inventory in inventories)
+        total_price = sum(inventory.quantity * inventory.unit_price for inventory in inventories)
+        average_price = total_price / total_quantity if total_quantity > 0 else 0
+    logger.debug("Calculated average price: %s", average_price)
 
     remaining_quantity = order.quantity
     total_allocated_price = 0
@@ -113,48 +650,82 @@ def allocate_average(db: Session, order: Order, inventories: list[Inventory]):
             break
         allocated_quantity = min(remaining_quantity, inventory.quantity)
         remaining_quantity -= allocated_quantity
-        inventory.quantity -= allocated_quantity
+        deplete_lot(inventory, allocated_quantity, summary)
         total_allocated_price += allocated_quantity * average_price
 
-    create_allocation_result(db, order, order.quantity, total_allocated_price)
+    create_allocation_result(db, order, order.quantity - remaining_quantity, total_allocated_price, writer)
 
-def allocate_specific(db: Session, order: Order, inventories: list[Inventory]):
+def allocate_specific(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     特定の在庫から割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は引当数量を反映する）
 
     特定在庫引当 (Specific Allocation):
     - 説明: 特定の在庫から注文数量分を引き当てる方法。
+      注文数量以上の残数量がある在庫のうち、環境変数 SPECIFIC_LOT_SELECTION の選び方
+      （best_fit: 残数量が最小の在庫 / first_fit: 最も古い在庫）で1件を選ぶ。
     - 数式:
       - 引当数量 = 注文数量
       - 引当価格 = 引当数量 × 特定在庫の単価
     """
-    for inventory in inventories:
-        if inventory.quantity >= order.quantity:
-            allocated_quantity = order.quantity
-            inventory.quantity -= allocated_quantity
-            create_allocation_result(db, order, allocated_quantity, allocated_quantity * inventory.unit_price)
-            break
+    inventory = linear_select(inventories, order.quantity, SPECIFIC_LOT_SELECTION)
+    if inventory is not None:
+        allocated_quantity = order.quantity
+        deplete_lot(inventory, allocated_quantity, summary)
+        create_allocation_result(db, order, allocated_quantity, allocated_quantity * inventory.unit_price, writer)
+
+def allocate_specific_item(db: Session, orders: list[Order], inventories: list[Inventory], writer: AllocationResultWriter, summary: InventorySummary = None) -> bool:
+    """
+    SPECIFIC戦略で1商品分の注文をまとめて割り当てる関数（AllocationStrategy.allocate_item）
+    :param db: データベースセッション
+    :param orders: 割り当て対象の注文リスト（同一商品、処理順）
+    :param inventories: 在庫リスト（ID順）
+    :param writer: 割り当て結果ライタ
+    :param summary: 在庫集計（指定時は引当数量を反映する）
+    :return: 常にTrue
 
-def allocate_total_average(db: Session, order: Order, inventories: list[Inventory]):
+    在庫の残数量の索引を商品ごとに1回作成し、注文ごとのロットの選択を O(log n) で行う
+    （選び方は allocate_specific と同じ）。
+    """
+    index = LotIndex(inventories)
+    for order in orders:
+        inventory = index.select(order.quantity, SPECIFIC_LOT_SELECTION)
+        if inventory is None:
+            continue
+        deplete_lot(inventory, order.quantity, summary)
+        index.update(inventory)
+        create_allocation_result(db, order, order.quantity, order.quantity * inventory.unit_price, writer)
+    return True
+
+def allocate_total_average(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     全体の平均価格で在庫割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は全体平均単価を在庫集計から取得し、引当数量を反映する）
 
     全体平均引当 (Total Average Allocation):
     - 説明: 全ての在庫の平均単価を使用して引き当てる方法。
     - 数式:
       - 全体平均単価 = (在庫数量1 × 在庫単価1 + 在庫数量2 × 在庫単価2 + ...) / (在庫数量1 + 在庫数量2 + ...)
-      - 引当価格 = 注文数量 × 全体平均単価
+      - 引当価格 = 引当数量 × 全体平均単価（在庫不足の場合、残りはバックオーダーの引当時に計上する）
     """
-    total_quantity = sum(inventory.quantity for inventory in inventories)
-    total_price = sum(inventory.quantity * inventory.unit_price for inventory in inventories)
-    total_average_price = total_price / total_quantity if total_quantity > 0 else 0
-    logger.info(f"Calculated total average price: {total_average_price}")
+    if summary is not None:
+        # 在庫集計から全体平均単価を取得する（在庫数に依存しない）
+        total_average_price = summary_average_price(summary)
+    elif allocate_with_kernel(db, [order], inventories, writer, pricing.total_average_prices):
+        return
+    else:
+        total_quantity = sum(inventory.quantity for inventory in inventories)
+        total_price = sum(inventory.quantity * inventory.unit_price for inventory in inventories)
+        total_average_price = total_price / total_quantity if total_quantity > 0 else 0
+    logger.debug("Calculated total average price: %s", total_average_price)
 
     remaining_quantity = order.quantity
     for inventory in inventories:
@@ -162,64 +733,173 @@ def allocate_total_average(db: Session, order: Order, inventories: list[Inventor
             break
         allocated_quantity = min(remaining_quantity, inventory.quantity)
         remaining_quantity -= allocated_quantity
-        inventory.quantity -= allocated_quantity
+        deplete_lot(inventory, allocated_quantity, summary)
 
-    create_allocation_result(db, order, order.quantity, order.quantity * total_average_price)
+    allocated_quantity = order.quantity - remaining_quantity
+    create_allocation_result(db, order, allocated_quantity, allocated_quantity * total_average_price, writer)
 
-def allocate_moving_average(db: Session, order: Order, inventories: list[Inventory]):
+def allocate_moving_average(db: Session, order: Order, inventories: list[Inventory], writer: AllocationResultWriter = None, summary: InventorySummary = None):
     """
     移動平均価格で在庫割り当てを実行する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param inventories: 在庫リスト
+    :param writer: 割り当て結果ライタ（省略時はセッションに直接追加）
+    :param summary: 在庫集計（指定時は引当数量を反映する）
 
     移動平均引当 (Moving Average Allocation):
     - 説明: 直近の一定数の在庫の平均単価を使用して引き当てる方法。
     - 数式:
       - 移動平均単価 = (直近の在庫単価1 + 直近の在庫単価2 + ...) / ウィンドウサイズ
-      - 引当価格 = 注文数量 × 移動平均単価
+      - 引当価格 = 引当数量 × 移動平均単価（在庫不足の場合、残りはバックオーダーの引当時に計上する）
     """
+    if allocate_with_kernel(db, [order], inventories, writer, pricing.moving_average_prices, summary):
+        return
+
     window_size = 3
     prices = []
+    moving_average_price = 0  # 引当可能な在庫が無い場合
     remaining_quantity = order.quantity
     for inventory in inventories:
         if remaining_quantity <= 0:
             break
         allocated_quantity = min(remaining_quantity, inventory.quantity)
         remaining_quantity -= allocated_quantity
-        inventory.quantity -= allocated_quantity
+        deplete_lot(inventory, allocated_quantity, summary)
         prices.append(inventory.unit_price)
         if len(prices) > window_size:
             prices.pop(0)
         moving_average_price = sum(prices) / len(prices)
 
-    create_allocation_result(db, order, order.quantity, order.quantity * moving_average_price)
+    allocated_quantity = order.quantity - remaining_quantity
+    create_allocation_result(db, order, allocated_quantity, allocated_quantity * moving_average_price, writer)
 
-def create_allocation_result(db: Session, order: Order, allocated_quantity: int, allocated_price: float):
+def allocate_ranked_item(db: Session, orders: list[Order], inventories: list[Inventory], writer: AllocationResultWriter, summary: InventorySummary = None) -> bool:
+    """
+    順位付け（RANKED戦略）で1商品分の注文をまとめて割り当てる関数（AllocationStrategy.allocate_item）
+    :param db: データベースセッション
+    :param orders: 割り当て対象の注文リスト（同一商品、処理順）
+    :param inventories: 在庫リスト（ID順）
+    :param writer: 割り当て結果ライタ
+    :param summary: 在庫集計（指定時は引当数量を反映する）
+    :return: 順位付けで割り当てた場合はTrue、順位付けの期限を過ぎた場合はFalse（注文ごとにFIFOで割り当てる）
+
+    順位付け (Ranked Allocation):
+    - 説明: 商品ごとに注文を緊急度（優先度・納期）の階級順、同じ階級の中では数量の少ない順に並べ、
+      費用（単価と入荷からの経過日数）の低い在庫から引き当てる。在庫不足の商品では、緊急度の高い注文と
+      全量を引き当てられる注文を増やす。商品をまたぐ制約は扱わない。
+      階級は scheduler.schedule の処理順から求める（顧客ごとの割当上限で後回しにした注文は最後の階級になる）。
+    - 数式:
+      - 費用 = 単価 - 経過日数の重み × 入荷からの経過日数
+      - 引当価格 = 引当数量 × 在庫単価
+    """
+    if ranking.budget_exhausted():
+        return False
+    assignments = ranking.rank_assignments(
+        [order.quantity for order in orders],
+        [inventory.quantity for inventory in inventories],
+        ranking.lot_costs(inventories),
+        ranks=scheduler.urgency_ranks(orders),
+    )
+    for order_index, lot_index, quantity in assignments:
+        inventory = inventories[lot_index]
+        deplete_lot(inventory, quantity, summary)
+        create_allocation_result(db, orders[order_index], quantity, quantity * inventory.unit_price, writer)
+    return True
+
+def kernel_allocator(kernel):
+    """
+    NumPyカーネルで商品単位に一括計算する関数（AllocationStrategy.allocate_item）を作成する関数
+    :param kernel: pricing モジュールの価格計算関数
+    """
+    def allocate_item(db: Session, orders: list[Order], lots: list[Inventory], writer: AllocationResultWriter, summary: InventorySummary = None) -> bool:
+        return allocate_with_kernel(db, orders, lots, writer, kernel, summary)
+    return allocate_item
+
+# 組み込みの割り当て戦略（平均系の戦略はNumPyが利用可能な場合に、SPECIFICはロットの索引を使用して、商品単位で全注文をまとめて割り当てる）
+register_strategy(AllocationStrategy("FIFO", allocate_fifo))
+register_strategy(AllocationStrategy("LIFO", allocate_fifo, lot_order=DESCENDING))
+register_strategy(AllocationStrategy("AVERAGE", allocate_average, needs_aggregate=True, allocate_item=kernel_allocator(pricing.average_prices)))
+register_strategy(AllocationStrategy("SPECIFIC", allocate_specific, allocate_item=allocate_specific_item))
+register_strategy(AllocationStrategy("TOTAL_AVERAGE", allocate_total_average, needs_aggregate=True, allocate_item=kernel_allocator(pricing.total_average_prices)))
+register_strategy(AllocationStrategy("MOVING_AVERAGE", allocate_moving_average, allocate_item=kernel_allocator(pricing.moving_average_prices)))
+# 順位付けは期限（RANKING_TIME_BUDGET）を過ぎた後の商品をFIFOで割り当てる
+register_strategy(AllocationStrategy("RANKED", allocate_fifo, allocate_item=allocate_ranked_item, run_scope=ranking.time_budget))
+
+def create_allocation_result(db: Session, order: Order, allocated_quantity: int, allocated_price: float, writer: AllocationResultWriter = None):
     """
     割り当て結果を作成する関数
     :param db: データベースセッション
     :param order: 割り当て対象の注文
     :param allocated_quantity: 割り当てた数量
     :param allocated_price: 割り当てた価格
+    :param writer: 割り当て結果ライタ（指定時はバッファに追加し、ORMオブジェクトを生成しない）
+
+    引当数量は注文の引当済み数量（allocated_quantity）に加算する。
     """
+    order.allocated_quantity = (order.allocated_quantity or 0) + allocated_quantity
+    if writer is not None:
+        writer.add(order.id, allocated_quantity, allocated_price, order.item_code)
+        return
+
     allocation_result = AllocationResult(
         order_id=order.id,
+        item_code=order.item_code,
         allocated_quantity=allocated_quantity,
-        allocated_price=allocated_price
+        allocated_price=allocated_price,
+        allocation_date=date.today()
     )
     db.add(allocation_result)
-    logger.info(f"Created allocation result for order {order.id} with allocated quantity {allocated_quantity} and price {allocated_price}")
+    logger.debug("Created allocation result for order %d with allocated quantity %d and price %s", order.id, allocated_quantity, allocated_price)
+
+def allocate_in_slices(db: Session, strategy: str, chunk_size: int = None, item_codes: list[str] = None, time_slice: float = None,
+                       commit_orders: int = None, commit_seconds: float = None, resume: bool = False):
+    """
+    残りの商品がなくなるまで在庫割り当てを繰り返す関数（引数は allocate_inventory と同じ）
+
+    時間枠ごとにコミットし、その間に登録された優先度の高い注文を次の時間枠で先に割り当てる。
+    区切りコミットの実行は時間枠で中断しても同じチェックポイントから続ける
+    （時間枠のみの実行は毎回注文を読み直し、中断中に登録された注文を含めて並べ直す）。
+    """
+    commit_orders = checkpoints.ALLOCATION_COMMIT_ORDERS if commit_orders is None else commit_orders
+    commit_seconds = checkpoints.ALLOCATION_COMMIT_SECONDS if commit_seconds is None else commit_seconds
+    chunked = bool(resume or commit_orders or commit_seconds)
+    while allocate_inventory(db, strategy, chunk_size=chunk_size, item_codes=item_codes, time_slice=time_slice,
+                             commit_orders=commit_orders, commit_seconds=commit_seconds, resume=resume)["remaining_items"]:
+        resume = chunked
 
 def main():
     """
     メイン関数
     """
+    strategies = strategy_names()
+    parser = argparse.ArgumentParser(description="未割当の注文に在庫を割り当てる")
+    parser.add_argument("--strategy", choices=strategies, action="append", help="割り当て戦略（複数指定可。省略時は全戦略を順に実行）")
+    parser.add_argument("--workers", type=int, default=1, help="並列実行するワーカープロセス数（2以上で商品コード単位に分割して並列実行）")
+    parser.add_argument("--chunk-size", type=int, default=None, help="割り当て結果を一括INSERTする行数")
+    parser.add_argument("--time-slice", type=float, default=None, help="1回のコミットまでの処理時間の目安の秒数（超えた場合は商品の区切りでコミットして続行）")
+    parser.add_argument("--commit-orders", type=int, default=None, help="1トランザクションで割り当てる注文数の目安（商品の区切りでコミットし、進捗をチェックポイントに記録する）")
+    parser.add_argument("--commit-seconds", type=float, default=None, help="1トランザクションの処理時間の目安の秒数")
+    parser.add_argument("--resume", action="store_true", help="中断した一括割当を最後のチェックポイントから再開する")
+    args = parser.parse_args()
+    if args.resume and args.workers > 1:
+        # シャードの商品コードは未割当の注文の商品から決めるため、中断したシャードのチェックポイントを特定できない
+        parser.error("--resume cannot be used with --workers > 1")
+
+    configure_logging()
     from database import SessionLocal
     db = SessionLocal()
-    strategies = ["FIFO", "LIFO", "AVERAGE", "SPECIFIC", "TOTAL_AVERAGE", "MOVING_AVERAGE"]
-    for strategy in strategies:
-        allocate_inventory(db, strategy)
+    try:
+        for strategy in args.strategy or strategies:
+            if args.workers > 1:
+                from parallel_allocation import allocate_inventory_parallel
+                allocate_inventory_parallel(db, strategy, workers=args.workers, chunk_size=args.chunk_size, time_slice=args.time_slice,
+                                            commit_orders=args.commit_orders, commit_seconds=args.commit_seconds)
+            else:
+                allocate_in_slices(db, strategy, chunk_size=args.chunk_size, time_slice=args.time_slice,
+                                   commit_orders=args.commit_orders, commit_seconds=args.commit_seconds, resume=args.resume)
+    finally:
+        db.close()
 
 if __name__ == "__main__":
     main()
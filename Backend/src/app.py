@@ -1,148 +1,273 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from database import get_db
 from models import Order, Inventory, AllocationResult
-from schemas import OrderRequest, InventoryRequest, AllocationRequest, OrderResponse, InventoryResponse, AllocationResultResponse, TokenPayload
-import jwt
+from inventory_summary import ensure_summaries, apply_receipt
+from allocation import ALLOCATION_MAX_ATTEMPTS, fill_backorders, reserve_lot, select_lot_for_update
+from backorders import BACKORDER_FILL_LIMIT, discard_backorder, reduce_backorder
+from lot_cache import lot_cache
+from outbox import ORDER_CREATED, INVENTORY_RECEIVED, record_event
+from listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_list_query, page_response
+from schemas import OrderRequest, InventoryRequest, AllocationRequest, OrderResponse, InventoryResponse, AllocationResultResponse, TokenPayload, BulkResponse
 from jwt.exceptions import InvalidTokenError
-from datetime import datetime
+from auth import get_verifier
+import metrics
+from log_config import LOG_FORMAT, LOG_LEVEL, queue_handler
+from datetime import date, datetime
 from mangum import Mangum
 import logging
 
-# ロガーの設定
+# ロガーの設定（ログレベルは環境変数 LOG_LEVEL。DEBUGでリクエストごとの詳細を出力する）
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(LOG_LEVEL)
 
 # ログ出力のフォーマットを設定
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+formatter = logging.Formatter(LOG_FORMAT)
 
 # コンソールハンドラを作成し、フォーマットを設定
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
 
-# ロガーにコンソールハンドラを追加
-logger.addHandler(console_handler)
+# ロガーにコンソールハンドラを追加（書き込みはキュー経由で別スレッドから行う）
+logger.addHandler(queue_handler(console_handler))
 
 # FastAPI アプリケーションのインスタンスを作成
 app = FastAPI()
 
 
-COGNITO_PUBLIC_KEYS = {
-    "key_id_1": "public_key_1",
-    "key_id_2": "public_key_2",
-}
-
 def authenticate_token(token: str) -> TokenPayload:
     """
     Amazon Cognitoが発行するJWTトークンを検証する関数
+    （公開鍵はJWKSから読み込んで保持し、検証済みのトークンは有効期限までキャッシュする）
     """
     try:
-        headers = jwt.get_unverified_header(token)
-        kid = headers.get("kid")
-        if not kid:
-            raise HTTPException(status_code=401, detail="無効なトークンです")
-        public_key = COGNITO_PUBLIC_KEYS.get(kid)
-        if not public_key:
-            raise HTTPException(status_code=401, detail="無効なトークンです")
-        payload = jwt.decode(token, public_key, algorithms=["RS256"], audience="your_audience", issuer="your_issuer")
-        return TokenPayload(**payload)
+        return get_verifier().verify(token)
     except InvalidTokenError:
         raise HTTPException(status_code=401, detail="無効なトークンです")
-    
+
 @app.middleware("http")
 async def authentication_middleware(request, call_next):
     """
-    認証ミドルウェア
+    認証ミドルウェア（検証結果は request.state.user に保持し、get_token_payload で参照する）
     """
     token = request.headers.get("Authorization")
     if not token or not token.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="認証トークンが見つからないか、無効です")
+        return JSONResponse(status_code=401, content={"detail": "認証トークンが見つからないか、無効です"})
     token = token.split(" ")[1]
     try:
-        payload = authenticate_token(token)
-        request.state.user = payload
+        request.state.user = authenticate_token(token)
     except HTTPException as e:
-        raise e
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
     response = await call_next(request)
     return response
 
+# エンドポイントの所要時間の計測（認証を含めて計測するため、認証ミドルウェアの外側に登録する）
+app.middleware("http")(metrics.http_middleware)
+
+def get_token_payload(request: Request) -> TokenPayload:
+    """
+    認証ミドルウェアが検証したトークンのペイロードを返す依存関係（トークンを再検証しない）
+    """
+    payload = getattr(request.state, "user", None)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="認証トークンが見つからないか、無効です")
+    return payload
+
 @app.post("/orders", response_model=OrderResponse, status_code=201)  # ここにstatus_code=201を追加
-def create_order(order: OrderRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def create_order(order: OrderRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
     """
     注文を作成するエンドポイント
     """
-    db_order = Order(item_code=order.item_code, quantity=order.quantity)
+    db_order = Order(item_code=order.item_code, quantity=order.quantity, priority=order.priority,
+                     due_date=date.fromisoformat(order.due_date) if order.due_date else None, customer_id=order.customer_id)
     db.add(db_order)
+    db.flush()
+    # 差分割当のイベントは注文の登録と同じトランザクションで追加する
+    record_event(db, ORDER_CREATED, db_order.item_code, db_order.id)
     db.commit()
     db.refresh(db_order)
 
     # レスポンスデータをログ出力
-    logger.debug("==== Create Order Response Data ====")
-    logger.debug(f"Response data: {db_order.__dict__}")
-    logger.debug("=====================================")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("==== Create Order Response Data ====")
+        logger.debug("Response data: %s", db_order.__dict__)
+        logger.debug("=====================================")
 
     return db_order
 
+@app.post("/orders:bulk", response_model=BulkResponse)
+async def create_orders_bulk(request: Request, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    注文を一括登録するエンドポイント（JSON配列またはNDJSON。行ごとの登録IDとエラーを返す）
+    """
+    body = await request.body()
+    from bulk import ingest_orders  # 一括登録は利用頻度が低いため初回使用時に読み込む
+    return await run_in_threadpool(ingest_orders, db, body, request.headers.get("content-type"))
+
 @app.get("/orders", response_model=list[OrderResponse])
-def read_orders(db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def read_orders(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                fields: str = None, item_code: str = None, allocated: bool = None,
+                db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
     """
-    注文一覧を取得するエンドポイント
+    注文一覧を取得するエンドポイント（IDによるキーセットページング。次のページの after_id はレスポンスヘッダで返す）
     """
-    orders = db.query(Order).all()
-    return orders
+    query = build_list_query(Order, after_id, limit, fields, item_code=item_code, allocated=allocated)
+    return page_response(response, db.execute(query), limit, fields)
 
 @app.post("/inventories", response_model=InventoryResponse, status_code=201)  # ここにstatus_code=201を追加
-def create_inventory(inventory: InventoryRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def create_inventory(inventory: InventoryRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
     """
     在庫を作成するエンドポイント
     """
+    return register_inventory(db, inventory)
+
+def register_inventory(db: Session, inventory: InventoryRequest) -> Inventory:
+    """
+    在庫を登録する関数（同期・非同期のエンドポイントで共用）
+    :param db: データベースセッション
+    :param inventory: 在庫登録リクエスト
+    :return: 登録した在庫
+    """
     receipt_date = datetime.strptime(inventory.receipt_date, "%Y-%m-%d").date()
     db_inventory = Inventory(item_code=inventory.item_code, quantity=inventory.quantity, receipt_date=receipt_date, unit_price=inventory.unit_price)
+    # 在庫集計は在庫の登録と同じトランザクションで加算する（未作成の場合は登録前の在庫から作成する）
+    ensure_summaries(db, [inventory.item_code])
     db.add(db_inventory)
+    apply_receipt(db, inventory.item_code, inventory.quantity, inventory.unit_price)
+    db.flush()
+    record_event(db, INVENTORY_RECEIVED, db_inventory.item_code, db_inventory.id)
+    # 入荷は先にコミットする（バックオーダーの引当が競合しても登録した在庫は失われない）
     db.commit()
+    # 入荷した商品のバックオーダーを上限件数まで引き当てる（競合した場合は再試行し、残りは差分割当のワーカーが引き当てる）
+    backorder_quantity = fill_backorders(db, inventory.item_code, BACKORDER_FILL_LIMIT)
     db.refresh(db_inventory)
+    if backorder_quantity > 0:
+        lot_cache.invalidate(inventory.item_code)
+    else:
+        lot_cache.add_lot(db_inventory)
     return db_inventory
 
+@app.post("/inventories:bulk", response_model=BulkResponse)
+async def create_inventories_bulk(request: Request, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    在庫を一括登録するエンドポイント（JSON配列またはNDJSON。行ごとの登録IDとエラーを返す）
+    """
+    body = await request.body()
+    from bulk import ingest_inventories
+    return await run_in_threadpool(ingest_inventories, db, body, request.headers.get("content-type"))
+
 @app.get("/inventories", response_model=list[InventoryResponse])
-def read_inventories(db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def read_inventories(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     fields: str = None, item_code: str = None, date_from: date = None, date_to: date = None,
+                     db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
     """
-    在庫一覧を取得するエンドポイント
+    在庫一覧を取得するエンドポイント（IDによるキーセットページング。日付範囲は入荷日で絞り込む）
     """
-    logger.debug("==== Get Inventories ====")
-    logger.debug(f"Token Payload: {token_payload}")
-    logger.debug("==========================")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("==== Get Inventories ====")
+        logger.debug("Token Payload: %s", token_payload)
+        logger.debug("==========================")
 
-    inventories = db.query(Inventory).all()
-    return inventories
+    query = build_list_query(Inventory, after_id, limit, fields, item_code=item_code, date_from=date_from, date_to=date_to)
+    return page_response(response, db.execute(query), limit, fields)
 
 @app.post("/orders/{order_id}/allocate", response_model=AllocationResultResponse)
-def allocate_inventory(order_id: int, allocation: AllocationRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def allocate_inventory(order_id: int, allocation: AllocationRequest, db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
     """
     在庫を割り当てるエンドポイント
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
-    inventory = db.query(Inventory).filter(Inventory.item_code == allocation.item_code, Inventory.quantity >= allocation.quantity).order_by(Inventory.receipt_date).first()
+    return allocate_order(db, order_id, allocation)
 
+def allocate_order(db: Session, order_id: int, allocation: AllocationRequest) -> AllocationResult:
+    """
+    注文に在庫を割り当てる関数（同期・非同期のエンドポイントで共用）
+    :param db: データベースセッション
+    :param order_id: 注文ID
+    :param allocation: 割当リクエスト
+    :return: 割当結果
+    """
+    order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="注文が見つかりません")
-    if not inventory:
-        raise HTTPException(status_code=404, detail="十分な在庫がありません")
+    if order.allocated:
+        raise HTTPException(status_code=409, detail="注文は割当済みです")
+    if allocation.quantity > order.remaining_quantity:
+        raise HTTPException(status_code=400, detail="割当数量が注文の未引当の数量を超えています")
+
+    # 在庫は初回はキャッシュから、キャッシュに無い場合や再試行時はデータベースから（PostgreSQLでは
+    # ロック中のロットを飛ばして）探し、条件付きUPDATEで引き当てる。他の処理が先に引き当てた場合は上限回数まで再試行する。
+    for attempt in range(ALLOCATION_MAX_ATTEMPTS):
+        lot = lot_cache.first_fit(db, allocation.item_code, allocation.quantity) if attempt == 0 else None
+        if lot is None:
+            lot = select_lot_for_update(db, allocation.item_code, allocation.quantity)
+        if lot is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="十分な在庫がありません")
+        if reserve_lot(db, allocation.item_code, lot.id, allocation.quantity, lot.unit_price):
+            break
+        lot_cache.invalidate(allocation.item_code)
+    else:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="在庫の引当が競合しました。再度実行してください")
 
-    inventory.quantity -= allocation.quantity
     allocation_date = datetime.strptime(allocation.allocation_date, "%Y-%m-%d").date()
-    db_allocation = AllocationResult(order_id=order.id, item_code=inventory.item_code, allocated_quantity=allocation.quantity, allocated_price=inventory.unit_price, allocation_date=allocation_date)
+    db_allocation = AllocationResult(order_id=order.id, item_code=allocation.item_code, allocated_quantity=allocation.quantity, allocated_price=lot.unit_price, allocation_date=allocation_date)
     db.add(db_allocation)
-    db.commit()
+    # 注文の更新は WHERE version = :version 付きで発行されるため、同じ注文の同時割当は一方のみ成功する
+    order.allocated_quantity += allocation.quantity
+    if order.remaining_quantity <= 0:
+        order.allocated = True
+        if order.backordered:
+            discard_backorder(db, order)
+    else:
+        # 一部のみ割り当てた場合は残りの数量をバックオーダーとして入荷時に引き当てる
+        reduce_backorder(db, order)
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        lot_cache.invalidate(allocation.item_code)
+        raise HTTPException(status_code=409, detail="注文の割当が競合しました")
+    except Exception:
+        lot_cache.invalidate(allocation.item_code)
+        raise
+    lot_cache.consume(allocation.item_code, lot.id, allocation.quantity)
     db.refresh(db_allocation)
     return db_allocation
 
 @app.get("/allocation-results", response_model=list[AllocationResultResponse])
-def read_allocation_results(db: Session = Depends(get_db), token_payload: TokenPayload = Depends(authenticate_token)):
+def read_allocation_results(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                            fields: str = None, item_code: str = None, date_from: date = None, date_to: date = None,
+                            db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    割り当て結果一覧を取得するエンドポイント（IDによるキーセットページング。日付範囲は割当日で絞り込む）
+    """
+    query = build_list_query(AllocationResult, after_id, limit, fields, item_code=item_code, date_from=date_from, date_to=date_to)
+    return page_response(response, db.execute(query), limit, fields)
+
+@app.get("/allocation-results/export")
+def export_allocation_results(export_format: str = Query("ndjson", alias="format"), fields: str = None, after_id: int = Query(None, ge=0),
+                              item_code: str = None, date_from: date = None, date_to: date = None,
+                              db: Session = Depends(get_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    割り当て結果をNDJSONまたはCSVで1行ずつ出力するエンドポイント（絞り込み条件は一覧APIと同じ）
+
+    セッションはレスポンスの送信が終わるまで get_db の依存関係が保持する。
+    """
+    from export import build_export_query, check_format, export_response, iter_export  # エクスポートは利用頻度が低いため初回使用時に読み込む
+    check_format(export_format)
+    query, names = build_export_query(AllocationResult, fields, after_id, item_code=item_code, date_from=date_from, date_to=date_to)
+    return export_response(iter_export(db, query, names, export_format), export_format, "allocation_results")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics(token_payload: TokenPayload = Depends(get_token_payload)):
     """
-    割り当て結果一覧を取得するエンドポイント
+    計測値をPrometheusのテキスト形式で返すエンドポイント
     """
-    allocation_results = db.query(AllocationResult).all()
-    return allocation_results
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Lambda関数のエントリーポイント
 handler = Mangum(app)
\ No newline at end of file
@@ -0,0 +1,112 @@
+from datetime import date
+from fastapi import FastAPI, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from async_database import get_async_db
+from listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_list_query, page_response
+from models import Order, Inventory, AllocationResult
+from schemas import OrderRequest, InventoryRequest, AllocationRequest, OrderResponse, InventoryResponse, AllocationResultResponse, TokenPayload, BulkResponse
+from app import get_token_payload, authentication_middleware, register_inventory, allocate_order, read_metrics
+from outbox import ORDER_CREATED, record_event
+import metrics
+from mangum import Mangum
+
+# 非同期版の FastAPI アプリケーション
+# エンドポイントは async def で定義し、データベースI/Oをイベントループ上で待機するため、
+# 同期版（app.py）のようにスレッドプールの大きさで同時実行数が制限されない。
+# 在庫の登録・割当は同期版と同じ処理を AsyncSession.run_sync で実行する（I/Oは非同期ドライバで行われる）。
+app = FastAPI()
+app.middleware("http")(authentication_middleware)
+app.middleware("http")(metrics.http_middleware)
+
+@app.post("/orders", response_model=OrderResponse, status_code=201)
+async def create_order(order: OrderRequest, db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    注文を作成するエンドポイント
+    """
+    db_order = Order(item_code=order.item_code, quantity=order.quantity, priority=order.priority,
+                     due_date=date.fromisoformat(order.due_date) if order.due_date else None, customer_id=order.customer_id)
+    db.add(db_order)
+    await db.flush()
+    record_event(db, ORDER_CREATED, db_order.item_code, db_order.id)
+    await db.commit()
+    await db.refresh(db_order)
+    return db_order
+
+@app.post("/orders:bulk", response_model=BulkResponse)
+async def create_orders_bulk(request: Request, db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    注文を一括登録するエンドポイント
+    """
+    body = await request.body()
+    from bulk import ingest_orders  # 一括登録は利用頻度が低いため初回使用時に読み込む
+    return await db.run_sync(ingest_orders, body, request.headers.get("content-type"))
+
+@app.get("/orders", response_model=list[OrderResponse])
+async def read_orders(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      fields: str = None, item_code: str = None, allocated: bool = None,
+                      db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    注文一覧を取得するエンドポイント
+    """
+    query = build_list_query(Order, after_id, limit, fields, item_code=item_code, allocated=allocated)
+    return page_response(response, await db.execute(query), limit, fields)
+
+@app.post("/inventories", response_model=InventoryResponse, status_code=201)
+async def create_inventory(inventory: InventoryRequest, db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    在庫を作成するエンドポイント
+    """
+    return await db.run_sync(register_inventory, inventory)
+
+@app.post("/inventories:bulk", response_model=BulkResponse)
+async def create_inventories_bulk(request: Request, db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    在庫を一括登録するエンドポイント
+    """
+    body = await request.body()
+    from bulk import ingest_inventories
+    return await db.run_sync(ingest_inventories, body, request.headers.get("content-type"))
+
+@app.get("/inventories", response_model=list[InventoryResponse])
+async def read_inventories(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           fields: str = None, item_code: str = None, date_from: date = None, date_to: date = None,
+                           db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    在庫一覧を取得するエンドポイント
+    """
+    query = build_list_query(Inventory, after_id, limit, fields, item_code=item_code, date_from=date_from, date_to=date_to)
+    return page_response(response, await db.execute(query), limit, fields)
+
+@app.post("/orders/{order_id}/allocate", response_model=AllocationResultResponse)
+async def allocate_inventory(order_id: int, allocation: AllocationRequest, db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    在庫を割り当てるエンドポイント
+    """
+    return await db.run_sync(allocate_order, order_id, allocation)
+
+@app.get("/allocation-results", response_model=list[AllocationResultResponse])
+async def read_allocation_results(response: Response, after_id: int = Query(None, ge=0), limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                  fields: str = None, item_code: str = None, date_from: date = None, date_to: date = None,
+                                  db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    割り当て結果一覧を取得するエンドポイント
+    """
+    query = build_list_query(AllocationResult, after_id, limit, fields, item_code=item_code, date_from=date_from, date_to=date_to)
+    return page_response(response, await db.execute(query), limit, fields)
+
+@app.get("/allocation-results/export")
+async def export_allocation_results(export_format: str = Query("ndjson", alias="format"), fields: str = None, after_id: int = Query(None, ge=0),
+                                    item_code: str = None, date_from: date = None, date_to: date = None,
+                                    db: AsyncSession = Depends(get_async_db), token_payload: TokenPayload = Depends(get_token_payload)):
+    """
+    割り当て結果をNDJSONまたはCSVで1行ずつ出力するエンドポイント
+    """
+    from export import aiter_export, build_export_query, check_format, export_response  # エクスポートは利用頻度が低いため初回使用時に読み込む
+    check_format(export_format)
+    query, names = build_export_query(AllocationResult, fields, after_id, item_code=item_code, date_from=date_from, date_to=date_to)
+    return export_response(aiter_export(db, query, names, export_format), export_format, "allocation_results")
+
+app.get("/metrics")(read_metrics)
+
+# Lambda関数のエントリーポイント
+handler = Mangum(app)
@@ -0,0 +1,71 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from database import SQLALCHEMY_DATABASE_URL, pool_options
+
+# 非同期APIで使用するエンジン・セッション
+# 非同期ドライバ（aiosqlite / asyncpg）は任意の依存関係のため、初回使用時にエンジンを作成する。
+
+# 同期用URLのドライバ名と非同期ドライバの対応
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+_async_engine = None
+_async_sessionmaker = None
+
+def async_database_url(url: str = SQLALCHEMY_DATABASE_URL) -> str:
+    """
+    同期用のデータベースURLを非同期ドライバのURLに変換する関数
+    :param url: 同期用のデータベースURL
+    :return: 非同期ドライバのURL
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name())
+    if drivername is None:
+        raise ValueError(f"Unsupported database for async engine: {url.get_backend_name()}")
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+def create_engine_for_url(url: str):
+    """
+    非同期エンジンを作成する関数
+    :param url: 非同期ドライバのURL
+    :return: 非同期エンジン
+
+    SQLiteのインメモリデータベースは接続ごとに別のデータベースになるため、単一の接続を共有する。
+    それ以外は環境変数の接続プール設定（DB_POOL_SIZE など）を使用する。
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            return create_async_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+        return create_async_engine(url)
+    return create_async_engine(url, **pool_options())
+
+def get_async_engine():
+    """
+    非同期エンジンを返す関数（初回呼び出し時に作成する）
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_engine_for_url(async_database_url())
+    return _async_engine
+
+def get_async_sessionmaker():
+    """
+    非同期セッションのファクトリを返す関数（初回呼び出し時に作成する）
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        # コミット後に属性を再読込すると暗黙のI/Oが発生するため、コミット時に失効させない
+        _async_sessionmaker = async_sessionmaker(bind=get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+# Dependency
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
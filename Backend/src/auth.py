@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+import jwt
+from jwt.exceptions import InvalidTokenError, PyJWKError
+from pydantic import ValidationError
+from schemas import TokenPayload
+from utils import COGNITO_JWKS_URL, COGNITO_AUDIENCE, COGNITO_ISSUER
+
+logger = logging.getLogger(__name__)
+
+# Cognitoが発行するJWTの検証
+# - 公開鍵（JWKS）はファイルまたはURLから読み込み、鍵オブジェクトに変換した状態でTTLの間保持する
+# - 検証済みトークンのペイロードはトークンのハッシュをキーとするLRUキャッシュに有効期限（exp）まで保持する
+# 同じトークンの2回目以降の検証は署名の検証を行わず、キャッシュの参照のみとなる。
+
+JWKS_SOURCE = os.environ.get("COGNITO_JWKS_URL", COGNITO_JWKS_URL)  # JWKSのURLまたはファイルパス
+JWKS_TTL = float(os.environ.get("COGNITO_JWKS_TTL", "3600"))  # JWKSを再取得するまでの秒数
+JWKS_MIN_REFRESH_INTERVAL = float(os.environ.get("COGNITO_JWKS_MIN_REFRESH_INTERVAL", "60"))  # 未知のkidによる再取得の最短間隔
+TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))  # 保持する検証済みトークン数
+
+class JWKSKeyProvider:
+    """
+    JWKSの公開鍵をkidごとに保持するクラス
+    """
+
+    def __init__(self, source: str, ttl: float = JWKS_TTL, min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL, clock=time.monotonic):
+        """
+        :param source: JWKSのURL（http/https）またはファイルパス
+        :param ttl: JWKSを再取得するまでの秒数
+        :param min_refresh_interval: 未知のkidを受け取った場合に再取得する最短間隔（鍵のローテーション対応）
+        :param clock: 現在時刻を返す関数
+        """
+        self.source = source
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+        self.keys = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.refreshes = 0
+
+    def get_key(self, kid: str) -> jwt.PyJWK:
+        """
+        kidに対応する公開鍵を返す
+        :param kid: 鍵ID
+        :return: 鍵オブジェクト（該当なしの場合はNone）
+        """
+        with self.lock:
+            now = self.clock()
+            if self.loaded_at is None or now - self.loaded_at >= self.ttl:
+                self._refresh(now)
+            elif kid not in self.keys and now - self.loaded_at >= self.min_refresh_interval:
+                self._refresh(now)
+            return self.keys.get(kid)
+
+    def _refresh(self, now: float):
+        """
+        JWKSを読み込み、各鍵を鍵オブジェクトに変換する（変換は読み込み時の1回のみ）
+        """
+        try:
+            jwks = self._fetch()
+        except (OSError, ValueError) as e:
+            if not self.keys:
+                raise InvalidTokenError(f"Could not load JWKS: {e}")
+            # 取得に失敗した場合は保持している鍵を使い続け、最短間隔の経過後に再取得する
+            logger.warning("Could not refresh JWKS, keeping %d cached keys: %s", len(self.keys), e)
+            self.loaded_at = now - self.ttl + self.min_refresh_interval
+            return
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk)
+            except (KeyError, PyJWKError) as e:
+                logger.warning("Skipping unusable JWK %s: %s", jwk.get("kid"), e)
+        self.keys = keys
+        self.loaded_at = now
+        self.refreshes += 1
+        logger.info("Loaded %d keys from JWKS", len(keys))
+
+    def _fetch(self) -> dict:
+        """
+        JWKSを取得する
+        """
+        if self.source.startswith(("http://", "https://")):
+            with urllib.request.urlopen(self.source, timeout=5) as response:
+                return json.load(response)
+        with open(self.source, encoding="utf-8") as f:
+            return json.load(f)
+
+class VerifiedTokenCache:
+    """
+    検証済みトークンのペイロードを保持するLRUキャッシュ（トークンのSHA-256ハッシュをキーとする）
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, clock=time.time):
+        """
+        :param max_size: 保持するトークン数の上限
+        :param clock: 現在時刻（UNIX時間）を返す関数
+        """
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> TokenPayload:
+        """
+        有効期限内の検証済みペイロードを返す（該当なし・期限切れの場合はNone）
+        """
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def put(self, token: str, payload: TokenPayload, expires_at: float):
+        """
+        検証済みペイロードを追加する
+        :param expires_at: 有効期限（UNIX時間。トークンのexp）
+        """
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (payload, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+class TokenVerifier:
+    """
+    JWTを検証してペイロードを返すクラス
+    """
+
+    def __init__(self, provider: JWKSKeyProvider, audience: str, issuer: str, algorithms=("RS256",), cache: VerifiedTokenCache = None):
+        """
+        :param provider: 公開鍵の取得元
+        :param audience: 期待するaud
+        :param issuer: 期待するiss
+        :param algorithms: 許可する署名アルゴリズム
+        :param cache: 検証済みトークンのキャッシュ
+        """
+        self.provider = provider
+        self.audience = audience
+        self.issuer = issuer
+        self.algorithms = list(algorithms)
+        self.cache = cache if cache is not None else VerifiedTokenCache()
+        self.verifications = 0
+
+    def verify(self, token: str) -> TokenPayload:
+        """
+        トークンを検証する
+        :param token: JWT
+        :return: ペイロード
+        :raises InvalidTokenError: トークンが無効な場合
+        """
+        payload = self.cache.get(token)
+        if payload is not None:
+            return payload
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not kid:
+            raise InvalidTokenError("Token has no kid")
+        key = self.provider.get_key(kid)
+        if key is None:
+            raise InvalidTokenError(f"Unknown kid: {kid}")
+        self.verifications += 1
+        claims = jwt.decode(token, key, algorithms=self.algorithms, audience=self.audience, issuer=self.issuer, options={"require": ["exp"]})
+        try:
+            payload = TokenPayload(**claims)
+        except ValidationError as e:
+            raise InvalidTokenError(f"Invalid token payload: {e}")
+        self.cache.put(token, payload, claims["exp"])
+        return payload
+
+_verifier = None
+
+def get_verifier() -> TokenVerifier:
+    """
+    既定の設定（Cognito）のトークン検証を返す関数（初回呼び出し時に作成する）
+    """
+    global _verifier
+    if _verifier is None:
+        _verifier = TokenVerifier(JWKSKeyProvider(JWKS_SOURCE), COGNITO_AUDIENCE, COGNITO_ISSUER)
+    return _verifier
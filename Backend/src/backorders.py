@@ -0,0 +1,106 @@
+import os
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from models import Order, Backorder
+
+# バックオーダー（入荷待ちの注文）
+# 一括割当で注文数量をすべて引き当てられなかった注文は、未引当の数量をバックオーダーに登録し、
+# 以降の一括割当では読み込まない。在庫の入荷時にその商品のバックオーダーのみを優先度順に引き当てる
+# （allocation.allocate_backorders）。
+
+BACKORDER_STRATEGY = os.environ.get("BACKORDER_STRATEGY", "FIFO")  # 入荷時にバックオーダーを引き当てる戦略
+BACKORDER_FILL_LIMIT = int(os.environ.get("BACKORDER_FILL_LIMIT", "100"))  # 入荷の登録で引き当てるバックオーダー数の上限（残りは差分割当のワーカーで引き当てる）
+BACKORDER_MAX_ATTEMPTS = int(os.environ.get("BACKORDER_MAX_ATTEMPTS", "3"))  # 入荷時の引当が割当APIなどと競合した場合の最大試行回数
+
+class BackorderDemand:
+    """
+    バックオーダーの未引当の数量を必要数量とする注文（割り当て戦略には注文として渡す）
+    """
+
+    __slots__ = ("id", "item_code", "quantity", "allocated_quantity", "priority", "due_date")
+
+    def __init__(self, backorder: Backorder, order: Order = None):
+        self.id = backorder.order_id
+        self.item_code = backorder.item_code
+        self.quantity = backorder.remaining_quantity
+        self.allocated_quantity = 0
+        self.priority = backorder.priority
+        self.due_date = order.due_date if order is not None else None
+
+def queue_backorder(db: Session, order: Order):
+    """
+    注文の未引当の数量をバックオーダーに登録する関数（コミットは呼び出し側で行う）
+    :param db: データベースセッション
+    :param order: 注文（引当済みの数量を反映済み）
+    """
+    order.backordered = True
+    db.add(Backorder(order_id=order.id, item_code=order.item_code, remaining_quantity=order.remaining_quantity, priority=order.priority or 0))
+
+def load_backorders(db: Session, item_code: str, limit: int = None) -> list[tuple[Backorder, Order]]:
+    """
+    商品のバックオーダーを優先度順（同じ優先度は納期・注文ID順。納期のない注文は後）に取得する関数
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param limit: 取得する件数の上限（省略時はすべて）
+    :return: バックオーダーと注文の組のリスト
+    """
+    return db.execute(
+        select(Backorder, Order)
+        .join(Order, Order.id == Backorder.order_id)
+        .where(Backorder.item_code == item_code)
+        .order_by(Backorder.priority.desc(), Order.due_date.is_(None), Order.due_date, Backorder.order_id)
+        .limit(limit)
+    ).all()
+
+def backordered_item_codes(db: Session, item_codes: list[str]) -> list[str]:
+    """
+    指定した商品のうちバックオーダーが存在する商品コードを返す関数（一括登録で使用）
+    :param db: データベースセッション
+    :param item_codes: 商品コード
+    :return: バックオーダーが存在する商品コード（昇順）
+    """
+    if not item_codes:
+        return []
+    return db.execute(
+        select(Backorder.item_code).where(Backorder.item_code.in_(item_codes)).distinct().order_by(Backorder.item_code)
+    ).scalars().all()
+
+def settle_backorder(db: Session, backorder: Backorder, order: Order, allocated_quantity: int) -> bool:
+    """
+    バックオーダーの引当数量を注文に反映する関数
+    :param db: データベースセッション
+    :param backorder: バックオーダー
+    :param order: 注文
+    :param allocated_quantity: 今回の引当数量
+    :return: 注文数量をすべて引き当てた場合はTrue（バックオーダーを削除し、注文を割当済みにする）
+    """
+    if allocated_quantity <= 0:
+        return False
+    order.allocated_quantity += allocated_quantity
+    backorder.remaining_quantity = order.remaining_quantity
+    if backorder.remaining_quantity > 0:
+        return False
+    db.delete(backorder)
+    order.backordered = False
+    order.allocated = True
+    return True
+
+def reduce_backorder(db: Session, order: Order):
+    """
+    注文の引当後の未引当の数量をバックオーダーに反映する関数（割当APIで注文の一部を割り当てた場合に使用）
+    :param db: データベースセッション
+    :param order: 注文（引当済みの数量を反映済み。バックオーダーが無い場合は登録する）
+    """
+    if not order.backordered:
+        queue_backorder(db, order)
+        return
+    db.execute(update(Backorder).where(Backorder.order_id == order.id).values(remaining_quantity=order.remaining_quantity))
+
+def discard_backorder(db: Session, order: Order):
+    """
+    注文のバックオーダーを削除する関数（割当APIで注文を割り当てた場合に使用）
+    :param db: データベースセッション
+    :param order: 注文
+    """
+    db.execute(delete(Backorder).where(Backorder.order_id == order.id))
+    order.backordered = False
@@ -0,0 +1,170 @@
+import json
+import os
+import time
+from datetime import date
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from models import Order, Inventory
+from schemas import OrderRequest, InventoryRequest, BulkResponse, BulkRowError
+from inventory_summary import ensure_summaries, apply_receipts
+from lot_cache import lot_cache
+from allocation import fill_backorders
+from backorders import BACKORDER_FILL_LIMIT, backordered_item_codes
+from outbox import ORDER_CREATED, INVENTORY_RECEIVED, record_events
+
+# 注文・在庫の一括登録（POST /orders:bulk, /inventories:bulk）のヘルパー
+# リクエスト本文（JSON配列またはNDJSON）を1つのリストモデルで検証し、
+# 検証済みの行をチャンクごとに複数行のINSERT ... RETURNING で登録する。
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "1000"))  # 1回のINSERTで登録する行数
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+ORDER_ROWS = TypeAdapter(list[OrderRequest])
+INVENTORY_ROWS = TypeAdapter(list[InventoryRequest])
+
+def parse_body(body: bytes, content_type: str = None) -> tuple[list, dict[int, list[str]]]:
+    """
+    リクエスト本文を行のリストに変換する関数
+    :param body: リクエスト本文
+    :param content_type: Content-Type（application/x-ndjson の場合は1行1レコードとして読み込む）
+    :return: 行のリスト（読み込めなかった行はNone）と、行番号をキーとするエラーの辞書
+    """
+    if content_type and content_type.split(";")[0].strip() == NDJSON_MEDIA_TYPE:
+        rows, errors = [], {}
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                errors[len(rows)] = [f"JSONとして読み込めません: {e.msg}"]
+                rows.append(None)
+        return rows, errors
+
+    try:
+        rows = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="リクエスト本文をJSONとして読み込めません")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="リクエスト本文はJSON配列またはNDJSONで指定してください")
+    return rows, {}
+
+def validate_rows(adapter: TypeAdapter, rows: list, errors: dict[int, list[str]]) -> dict[int, object]:
+    """
+    行をリストモデルでまとめて検証する関数
+    :param adapter: リストモデル（ORDER_ROWS / INVENTORY_ROWS）
+    :param rows: 行のリスト
+    :param errors: 行番号をキーとするエラーの辞書（検証エラーを追加する）
+    :return: 行番号をキー、検証済みのリクエストを値とする辞書
+
+    全行を1回で検証し、エラーがあった場合のみ残りの行を再検証する。
+    """
+    indexes = [index for index in range(len(rows)) if index not in errors]
+    try:
+        return dict(zip(indexes, adapter.validate_python([rows[index] for index in indexes])))
+    except ValidationError as e:
+        for error in e.errors():
+            index = indexes[error["loc"][0]]
+            field = ".".join(str(part) for part in error["loc"][1:])
+            errors.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error["msg"])
+    indexes = [index for index in indexes if index not in errors]
+    return dict(zip(indexes, adapter.validate_python([rows[index] for index in indexes])))
+
+def insert_rows(db: Session, model, values: list[dict], chunk_size: int = None) -> list[int]:
+    """
+    行をチャンクごとに複数行のINSERTで登録する関数
+    :param db: データベースセッション
+    :param model: モデルクラス
+    :param values: 登録するカラムの値の辞書のリスト
+    :param chunk_size: 1回のINSERTで登録する行数
+    :return: 登録したIDのリスト（values と同じ順序）
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    # SQLiteは書き込みが直列化され、1つのINSERT内ではVALUESの順にIDが採番されるため、
+    # RETURNINGのIDを昇順に並べれば入力順になる（順序を保証させると1行ずつのINSERTになる）。
+    # それ以外のデータベースでは順序の保証を指定する（複数行のINSERTのまま並び替えられる）。
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    statement = insert(model).returning(model.id, sort_by_parameter_order=not sqlite)
+    ids = []
+    for start in range(0, len(values), chunk_size):
+        chunk_ids = db.execute(statement, values[start:start + chunk_size]).scalars().all()
+        ids.extend(sorted(chunk_ids) if sqlite else chunk_ids)
+    return ids
+
+def bulk_response(row_count: int, ids_by_index: dict[int, int], errors: dict[int, list[str]], started: float) -> BulkResponse:
+    """
+    一括登録の結果を作成する関数
+    """
+    elapsed = time.perf_counter() - started
+    return BulkResponse(
+        ids=[ids_by_index.get(index) for index in range(row_count)],
+        errors=[BulkRowError(index=index, errors=messages) for index, messages in sorted(errors.items())],
+        inserted=len(ids_by_index),
+        rows_per_second=row_count / elapsed if elapsed > 0 else 0.0,
+    )
+
+def ingest_orders(db: Session, body: bytes, content_type: str = None, chunk_size: int = None) -> BulkResponse:
+    """
+    注文を一括登録する関数
+    :param db: データベースセッション
+    :param body: リクエスト本文（JSON配列またはNDJSON）
+    :param content_type: Content-Type
+    :param chunk_size: 1回のINSERTで登録する行数
+    :return: 一括登録の結果（エラーの行は登録せず、それ以外の行を登録する）
+    """
+    started = time.perf_counter()
+    rows, errors = parse_body(body, content_type)
+    orders = validate_rows(ORDER_ROWS, rows, errors)
+
+    values = [
+        {"item_code": order.item_code, "quantity": order.quantity, "allocated": False, "priority": order.priority,
+         "due_date": date.fromisoformat(order.due_date) if order.due_date else None, "customer_id": order.customer_id}
+        for order in orders.values()
+    ]
+    ids = insert_rows(db, Order, values, chunk_size)
+    record_events(db, ORDER_CREATED, [(order.item_code, order_id) for order, order_id in zip(orders.values(), ids)])
+    db.commit()
+    return bulk_response(len(rows), dict(zip(orders, ids)), errors, started)
+
+def ingest_inventories(db: Session, body: bytes, content_type: str = None, chunk_size: int = None) -> BulkResponse:
+    """
+    在庫を一括登録する関数
+    :param db: データベースセッション
+    :param body: リクエスト本文（JSON配列またはNDJSON）
+    :param content_type: Content-Type
+    :param chunk_size: 1回のINSERTで登録する行数
+    :return: 一括登録の結果（エラーの行は登録せず、それ以外の行を登録する）
+
+    在庫集計・差分割当のイベントは登録と同じトランザクションで更新・追加し、コミット後に商品ごとにバックオーダーを引き当てる。
+    割当APIのロットキャッシュは対象商品を破棄する。
+    """
+    started = time.perf_counter()
+    rows, errors = parse_body(body, content_type)
+    inventories = validate_rows(INVENTORY_ROWS, rows, errors)
+
+    # 未作成の在庫集計は登録前に作成する（在庫テーブルから集計されるため、登録後では二重に加算される）
+    item_codes = sorted({inventory.item_code for inventory in inventories.values()})
+    ensure_summaries(db, item_codes)
+
+    values = [
+        {"item_code": inventory.item_code, "quantity": inventory.quantity, "receipt_date": date.fromisoformat(inventory.receipt_date), "unit_price": inventory.unit_price}
+        for inventory in inventories.values()
+    ]
+    ids = insert_rows(db, Inventory, values, chunk_size)
+    # 在庫集計には商品ごとの入荷の合計を加算する
+    receipts = {}
+    for inventory in inventories.values():
+        quantity, value, lots = receipts.get(inventory.item_code, (0, 0.0, 0))
+        receipts[inventory.item_code] = (quantity + inventory.quantity, value + inventory.quantity * inventory.unit_price, lots + (1 if inventory.quantity > 0 else 0))
+    apply_receipts(db, receipts)
+    record_events(db, INVENTORY_RECEIVED, [(inventory.item_code, inventory_id) for inventory, inventory_id in zip(inventories.values(), ids)])
+    db.commit()
+    # バックオーダーのある商品のみ、入荷した在庫で上限件数まで引き当てる（残りは差分割当のワーカーが引き当てる）
+    for item_code in backordered_item_codes(db, item_codes):
+        fill_backorders(db, item_code, BACKORDER_FILL_LIMIT)
+
+    for item_code in item_codes:
+        lot_cache.invalidate(item_code)
+    return bulk_response(len(rows), dict(zip(inventories, ids)), errors, started)
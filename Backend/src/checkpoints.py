@@ -0,0 +1,80 @@
+import hashlib
+import os
+from datetime import datetime
+from sqlalchemy.orm import Session
+from models import AllocationCheckpoint
+
+# 一括割当のチェックポイント
+# 区切りコミット（ALLOCATION_COMMIT_ORDERS / ALLOCATION_COMMIT_SECONDS）を設定した一括割当は、
+# 商品の区切りでコミットするたびに同じトランザクションで進捗をチェックポイントに記録する。
+# 区切りは未割当の注文のある商品を商品コード順のキーセット（前の区切りの最後の商品コードより後）で取得するため、
+# 再開時はチェックポイントの注文IDの上限以下の未割当の注文を対象に、最後に記録した商品コードの次の商品から割り当てを続ける
+# （割り当て済みの注文は割当済み・バックオーダーになり、次回は読み込まれない）。
+
+ALLOCATION_COMMIT_ORDERS = int(os.environ.get("ALLOCATION_COMMIT_ORDERS", "0"))  # 1トランザクションで割り当てる注文数の目安（0は区切らない）
+ALLOCATION_COMMIT_SECONDS = float(os.environ.get("ALLOCATION_COMMIT_SECONDS", "0"))  # 1トランザクションの処理時間の目安（秒。0は区切らない）
+# 注文数の目安を指定せずに区切りコミット（処理時間の目安・再開のみ）を行う場合の1区切りの注文数の上限
+# （区切りごとに取得する注文・在庫の行数を抑える）
+ALLOCATION_COMMIT_ORDERS_DEFAULT = int(os.environ.get("ALLOCATION_COMMIT_ORDERS_DEFAULT", "10000"))
+
+RUNNING = "running"
+COMPLETED = "completed"
+
+def partition_key(item_codes: list[str] = None) -> str:
+    """
+    割り当て対象の商品の区分を表す文字列を返す関数
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :return: 全商品は "*"、商品コードの指定は並べ替えた商品コードのハッシュ
+    """
+    if item_codes is None:
+        return "*"
+    return hashlib.sha1("\n".join(sorted(item_codes)).encode()).hexdigest()
+
+def find_checkpoint(db: Session, strategy: str, item_codes: list[str] = None) -> AllocationCheckpoint:
+    """
+    戦略・区分の最新の実行中のチェックポイントを取得する関数
+    :param db: データベースセッション
+    :param strategy: 割り当て戦略名
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :return: チェックポイント（存在しない場合はNone）
+    """
+    return (
+        db.query(AllocationCheckpoint)
+        .filter(
+            AllocationCheckpoint.strategy == strategy,
+            AllocationCheckpoint.partition == partition_key(item_codes),
+            AllocationCheckpoint.status == RUNNING,
+        )
+        .order_by(AllocationCheckpoint.id.desc())
+        .first()
+    )
+
+def start_checkpoint(db: Session, strategy: str, item_codes: list[str], max_order_id: int) -> AllocationCheckpoint:
+    """
+    チェックポイントを作成する関数（コミットは最初の区切りで行う）
+    :param db: データベースセッション
+    :param strategy: 割り当て戦略名
+    :param item_codes: 対象の商品コード（省略時は全商品）
+    :param max_order_id: 対象の注文IDの上限
+    """
+    checkpoint = AllocationCheckpoint(strategy=strategy, partition=partition_key(item_codes), max_order_id=max_order_id,
+                                      items=0, orders=0, status=RUNNING)
+    db.add(checkpoint)
+    return checkpoint
+
+def record_progress(checkpoint: AllocationCheckpoint, last_item_code: str, items: int, orders: int, completed: bool = False):
+    """
+    コミットする区切りの進捗をチェックポイントに反映する関数（区切りのコミットと同じトランザクションで記録する）
+    :param checkpoint: チェックポイント
+    :param last_item_code: 区切りの最後の商品コード
+    :param items: 区切りで割り当てた商品数
+    :param orders: 区切りで割り当てた注文数
+    :param completed: 対象の商品をすべて割り当てた場合はTrue
+    """
+    if last_item_code is not None:
+        checkpoint.last_item_code = last_item_code
+    checkpoint.items += items
+    checkpoint.orders += orders
+    checkpoint.updated_at = datetime.utcnow()
+    if completed:
+        checkpoint.status = COMPLETED
@@ -0,0 +1,80 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from models import Inventory, InventoryArchive
+
+logger = logging.getLogger(__name__)
+
+# アーカイブ対象の在庫と同じ並びのカラム
+ARCHIVED_COLUMNS = ("id", "item_code", "quantity", "receipt_date", "unit_price", "created_at", "depleted_at")
+
+def depleted_lots_query(db: Session, batch_size: int, min_age: timedelta = None):
+    """
+    アーカイブ対象（残数量0以下）のロットIDをID順に取得するクエリ
+    （部分インデックス ix_inventories_depleted_lots を使用）
+    :param db: データベースセッション
+    :param batch_size: 取得件数
+    :param min_age: 使い切ってからの猶予期間
+    """
+    query = db.query(Inventory.id).filter(Inventory.quantity <= 0)
+    if min_age is not None:
+        # 本機能の導入前に使い切ったロットは depleted_at が未設定のため対象に含める
+        cutoff = datetime.utcnow() - min_age
+        query = query.filter(or_(Inventory.depleted_at == None, Inventory.depleted_at < cutoff))
+    return query.order_by(Inventory.id).limit(batch_size)
+
+def compact_depleted_lots(db: Session, batch_size: int = 1000, min_age: timedelta = None) -> int:
+    """
+    使い切った在庫ロットをアーカイブテーブルへ移動する関数（バックグラウンドジョブ）
+    :param db: データベースセッション
+    :param batch_size: 1トランザクションで移動するロット数
+    :param min_age: 使い切ってからアーカイブするまでの猶予期間（省略時は猶予なし）
+    :return: 移動したロット数
+
+    残数量が0以下のロットを在庫テーブルから削除し、同じ内容をアーカイブテーブルへ追加する。
+    バッチごとにコミットするため、実行中に割当処理のロックを長時間保持しない。
+    在庫集計（inventory_summaries）は使い切ったロットを含まないため更新不要。
+    """
+    archived = 0
+    while True:
+        lot_ids = [lot_id for (lot_id,) in depleted_lots_query(db, batch_size, min_age)]
+        if not lot_ids:
+            break
+
+        columns = [getattr(Inventory, name) for name in ARCHIVED_COLUMNS]
+        db.execute(
+            insert(InventoryArchive).from_select(
+                list(ARCHIVED_COLUMNS) + ["archived_at"],
+                select(*columns, literal(datetime.utcnow())).where(Inventory.id.in_(lot_ids)),
+            )
+        )
+        db.execute(delete(Inventory).where(Inventory.id.in_(lot_ids)))
+        db.commit()
+
+        archived += len(lot_ids)
+        logger.info("Archived %d depleted lots (%d total)", len(lot_ids), archived)
+        if len(lot_ids) < batch_size:
+            break
+    return archived
+
+def main():
+    """
+    メイン関数
+    """
+    parser = argparse.ArgumentParser(description="使い切った在庫ロットをアーカイブする")
+    parser.add_argument("--batch-size", type=int, default=1000, help="1トランザクションで移動するロット数")
+    parser.add_argument("--min-age-hours", type=float, default=None, help="使い切ってからアーカイブするまでの猶予時間")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        min_age = timedelta(hours=args.min_age_hours) if args.min_age_hours is not None else None
+        compact_depleted_lots(db, batch_size=args.batch_size, min_age=min_age)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
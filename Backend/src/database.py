@@ -1,20 +1,29 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+def pool_options() -> dict:
+    """
+    接続プールの設定を環境変数から取得する関数（同期・非同期のエンジンで共用）
+    """
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),  # 常時保持する接続数
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),  # pool_sizeを超えて一時的に作成する接続数
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),  # 接続を再作成するまでの秒数
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),  # 空き接続を待つ秒数
+        "pool_pre_ping": True,  # 切断された接続を使用前に検出する
+    }
+
 #ENVIRONMENT = os.environ.get("ENVIRONMENT", "production")
 ENVIRONMENT = "local"
 
 if ENVIRONMENT == "local":
     # ローカル環境用の設定
-    print("Running in local environment")
     SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 else:
     # 本番環境用の設定
-    print("Running in production environment")
     DB_HOST = os.environ.get("DB_HOST")
     DB_PORT = os.environ.get("DB_PORT")
     DB_NAME = os.environ.get("DB_NAME")
@@ -22,19 +31,53 @@ else:
     DB_PASSWORD = os.environ.get("DB_PASSWORD")
 
     SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# エンジンとセッションファクトリは初回使用時に作成する（Lambdaのコールドスタートでは接続・ドライバの読み込みを行わない）。
+# 作成後はモジュールに保持するため、ウォームスタートの呼び出しでは接続プールの接続が再利用される。
+_engine = None
+_sessionmaker = None
+
+def get_engine():
+    """
+    データベースエンジンを返す関数（初回呼び出し時に作成する）
+    """
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        if ENVIRONMENT == "local":
+            logger.info("Running in local environment")
+            _engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+        else:
+            logger.info("Running in production environment")
+            _engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options())
+    return _engine
+
+def get_sessionmaker():
+    """
+    セッションファクトリを返す関数（初回呼び出し時に作成する）
+    """
+    global _sessionmaker
+    if _sessionmaker is None:
+        from sqlalchemy.orm import sessionmaker
+        _sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _sessionmaker
+
+def __getattr__(name: str):
+    """
+    従来のモジュール属性（engine / SessionLocal / TestingSessionLocal）を初回参照時に作成する
+    """
+    if name == "engine":
+        return get_engine()
+    if name in ("SessionLocal", "TestingSessionLocal"):
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Dependency
 def get_db():
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
-
-
-
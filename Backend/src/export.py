@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from listing import LIST_FIELDS, apply_filters, parse_fields
+
+# エクスポートAPIのヘルパー
+# ORMオブジェクトを生成せずにカラムのみを選択し、サーバーサイドカーソル（stream_results）から
+# EXPORT_BATCH_SIZE 行ずつ取り出してNDJSON/CSVに変換するため、件数に関わらずメモリ使用量は一定になる。
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))  # カーソルから一度に取り出す行数
+
+# 出力形式とContent-Type
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def build_export_query(model, fields: str = None, after_id: int = None, batch_size: int = EXPORT_BATCH_SIZE, **filters):
+    """
+    エクスポートのクエリを組み立てる関数
+    :param model: モデルクラス
+    :param fields: 出力するカラム（カンマ区切り。省略時は一覧APIで選択できる全カラム）
+    :param after_id: このIDより大きいレコードを出力する（中断したエクスポートの再開用）
+    :param batch_size: カーソルから一度に取り出す行数
+    :param filters: 絞り込み条件（listing.apply_filters を参照）
+    :return: select 文とカラム名のリスト
+    """
+    names = parse_fields(model, fields) or list(LIST_FIELDS[model])
+    query = apply_filters(select(*[getattr(model, name) for name in names]), model, **filters)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    query = query.order_by(model.id).execution_options(stream_results=True, yield_per=batch_size)
+    return query, names
+
+def json_default(value):
+    """
+    json.dumps で変換できない値（日付・日時）をISO形式の文字列にする関数
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def format_rows(rows, names: list[str], export_format: str) -> str:
+    """
+    行のまとまりをNDJSONまたはCSVの文字列に変換する関数
+    :param rows: 行（カラム名の順に値を持つタプル）のリスト
+    :param names: カラム名のリスト
+    :param export_format: 出力形式（ndjson / csv）
+    :return: 変換した文字列（各行は改行で終わる）
+    """
+    if export_format == "ndjson":
+        return "".join(json.dumps(dict(zip(names, row)), ensure_ascii=False, default=json_default) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+def format_header(names: list[str], export_format: str) -> str:
+    """
+    出力形式のヘッダ（CSVの見出し行。NDJSONは無し）を返す関数
+    """
+    return format_rows([names], names, "csv") if export_format == "csv" else ""
+
+def iter_export(db: Session, query, names: list[str], export_format: str):
+    """
+    エクスポートの内容を行のまとまりごとに生成するジェネレータ
+    :param db: データベースセッション
+    :param query: build_export_query の select 文
+    :param names: カラム名のリスト
+    :param export_format: 出力形式（ndjson / csv）
+    """
+    header = format_header(names, export_format)
+    if header:
+        yield header
+    for partition in db.execute(query).partitions():
+        yield format_rows(partition, names, export_format)
+
+async def aiter_export(db, query, names: list[str], export_format: str):
+    """
+    エクスポートの内容を行のまとまりごとに生成する非同期ジェネレータ（非同期APIで使用）
+    :param db: 非同期データベースセッション
+    :param query: build_export_query の select 文
+    :param names: カラム名のリスト
+    :param export_format: 出力形式（ndjson / csv）
+    """
+    header = format_header(names, export_format)
+    if header:
+        yield header
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield format_rows(partition, names, export_format)
+
+def export_response(content, export_format: str, filename: str) -> StreamingResponse:
+    """
+    エクスポートのストリーミングレスポンスを作成する関数
+    :param content: iter_export / aiter_export のジェネレータ
+    :param export_format: 出力形式（ndjson / csv）
+    :param filename: ダウンロード時のファイル名（拡張子を除く）
+    """
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+def check_format(export_format: str) -> str:
+    """
+    出力形式を検証する関数
+    """
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"出力形式は {', '.join(EXPORT_MEDIA_TYPES)} のいずれかを指定してください")
+    return export_format
@@ -0,0 +1,112 @@
+import argparse
+import logging
+import os
+import time
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from allocation import allocate_backorders, allocate_inventory
+from backorders import backordered_item_codes
+from outbox import OUTBOX_BATCH_SIZE, claim_events, lock_items
+from strategies import strategy_names
+from log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# 差分割当（イベント駆動の割当ワーカー）
+# POST /orders, /inventories（一括登録を含む）で追加されたアウトボックスのイベントを登録順に取得し、
+# イベントのある商品コードのみを割り当てる。処理量は前回の実行以降の変更件数に比例し、テーブルの大きさに依存しない。
+# 入荷の登録で引き当てきれなかったバックオーダー（件数の上限・競合）も、入荷のイベントから引き当てる。
+
+OUTBOX_MAX_RETRIES = int(os.environ.get("OUTBOX_MAX_RETRIES", "5"))  # 割当APIなどとの競合で連続して失敗した場合に再試行する回数
+
+def allocate_pending(db: Session, strategy: str = "FIFO", batch_size: int = None, chunk_size: int = None) -> dict:
+    """
+    未処理のイベントの対象商品に在庫を割り当てる関数
+    :param db: データベースセッション
+    :param strategy: 割り当て戦略名
+    :param batch_size: 1回に処理するイベント数の上限（省略時は環境変数 OUTBOX_BATCH_SIZE）
+    :param chunk_size: 割り当て結果を一括INSERTする行数
+    :return: 実行結果の要約（イベント数と商品コード数を含む。未処理のイベントがない場合はNone）
+
+    イベントの削除と割り当て結果は同じトランザクションでコミットされるため、
+    割り当てに失敗した場合はイベントが残り、次回に再処理される。
+    """
+    try:
+        event_ids, item_codes = claim_events(db, batch_size or OUTBOX_BATCH_SIZE)
+        if not event_ids:
+            db.rollback()
+            return None
+        # 同じ商品の別のイベントを取得した他のワーカーとは商品単位で直列化する
+        lock_items(db, item_codes)
+        # バックオーダーは新しい注文より先に引き当てる
+        for item_code in backordered_item_codes(db, item_codes):
+            allocate_backorders(db, item_code)
+        db.flush()
+        # 取り出したイベントの商品はすべて同じトランザクションで割り当てる（時間枠による中断・区切りコミットはしない）
+        summary = allocate_inventory(db, strategy, chunk_size=chunk_size, item_codes=item_codes, time_slice=0, commit_orders=0, commit_seconds=0)
+    except Exception:
+        db.rollback()
+        raise
+    summary["events"] = len(event_ids)
+    summary["item_codes"] = len(item_codes)
+    logger.info("Processed %d outbox events for %d items", len(event_ids), len(item_codes))
+    return summary
+
+def run_worker(session_factory, strategy: str = "FIFO", batch_size: int = None, chunk_size: int = None,
+               poll_interval: float = 1.0, once: bool = False) -> int:
+    """
+    未処理のイベントを繰り返し割り当てるワーカー
+    :param session_factory: データベースセッションを作成する関数
+    :param strategy: 割り当て戦略名
+    :param batch_size: 1回に処理するイベント数の上限
+    :param chunk_size: 割り当て結果を一括INSERTする行数
+    :param poll_interval: 未処理のイベントがない場合に待機する秒数
+    :param once: Trueの場合は未処理のイベントがなくなった時点で終了する
+    :return: 処理したイベント数
+
+    割当APIの引当（在庫のバージョンの更新）などと競合した場合は、ロールバック済みのイベントを
+    OUTBOX_MAX_RETRIES 回まで再試行する（連続して失敗した場合は例外を送出する）。
+    """
+    processed = 0
+    conflicts = 0
+    db = session_factory()
+    try:
+        while True:
+            try:
+                summary = allocate_pending(db, strategy, batch_size, chunk_size)
+            except (StaleDataError, IntegrityError) as error:
+                conflicts += 1
+                if conflicts > OUTBOX_MAX_RETRIES:
+                    raise
+                logger.warning("Allocation conflicted with a concurrent update (attempt %d): %s", conflicts, error)
+                continue
+            conflicts = 0
+            if summary is not None:
+                processed += summary["events"]
+                continue
+            if once:
+                return processed
+            time.sleep(poll_interval)
+    finally:
+        db.close()
+
+def main():
+    """
+    メイン関数
+    """
+    parser = argparse.ArgumentParser(description="新しい注文・入荷の対象商品のみに在庫を割り当てる")
+    parser.add_argument("--strategy", choices=strategy_names(), default="FIFO", help="割り当て戦略")
+    parser.add_argument("--batch-size", type=int, default=None, help="1回に処理するイベント数の上限")
+    parser.add_argument("--chunk-size", type=int, default=None, help="割り当て結果を一括INSERTする行数")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="未処理のイベントがない場合に待機する秒数")
+    parser.add_argument("--once", action="store_true", help="未処理のイベントを処理したら終了する")
+    args = parser.parse_args()
+
+    configure_logging()
+    from database import SessionLocal
+    processed = run_worker(SessionLocal, args.strategy, args.batch_size, args.chunk_size, args.poll_interval, args.once)
+    logger.info("Processed %d outbox events", processed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+from datetime import datetime
+from sqlalchemy import bindparam, case, exists, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import Inventory, InventorySummary
+
+# 商品コードごとの在庫集計（総数量・総額・残ロット数）を維持するヘルパー
+# 集計は在庫の登録・引当と同じトランザクション内で更新するため、ここではコミットしない。
+# 集計の行は読み込んだ値を書き戻さず、加算・減算のUPDATE（入荷は UPSERT）で更新する
+# （APIの入荷・引当と一括割当が同時に更新しても更新が失われない）。割り当て戦略が参照する集計は
+# セッションに追加しないスナップショット（load_summaries）とし、割り当て後の差分を apply_consumptions で反映する。
+
+SUMMARY_TABLE = InventorySummary.__table__
+
+def build_summary(item_code: str, inventories: list[Inventory]) -> InventorySummary:
+    """
+    在庫リストから在庫集計を作成する関数
+    :param item_code: 商品コード
+    :param inventories: 商品の全在庫リスト
+    :return: 在庫集計（セッションには追加しない）
+    """
+    return InventorySummary(
+        item_code=item_code,
+        total_quantity=sum(inventory.quantity for inventory in inventories),
+        total_value=sum(inventory.quantity * inventory.unit_price for inventory in inventories),
+        lot_count=sum(1 for inventory in inventories if inventory.quantity > 0),
+    )
+
+def dialect_insert(db: Session):
+    """
+    ON CONFLICT を指定できる INSERT 文の生成関数を返す関数（SQLite・PostgreSQL）
+    :param db: データベースセッション
+    """
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Unsupported dialect for inventory summaries: {name}")
+
+def ensure_summaries(db: Session, item_codes):
+    """
+    集計が未作成の商品の在庫集計を在庫テーブルから集計して作成する関数
+    （INSERT ... SELECT ... ON CONFLICT DO NOTHING。同時に作成された場合は先に作成された行を残す）
+    :param db: データベースセッション
+    :param item_codes: 商品コードのリストまたはサブクエリ
+
+    在庫の無い商品の行は作成しない。入荷の場合は在庫の登録前に呼び出す（登録後では入荷数量が二重に加算される）。
+    """
+    aggregate = (
+        select(
+            Inventory.item_code,
+            func.sum(Inventory.quantity),
+            func.sum(Inventory.quantity * Inventory.unit_price),
+            func.sum(case((Inventory.quantity > 0, 1), else_=0)),
+        )
+        .where(Inventory.item_code.in_(item_codes), ~exists().where(InventorySummary.item_code == Inventory.item_code))
+        .group_by(Inventory.item_code)
+    )
+    db.execute(
+        dialect_insert(db)(SUMMARY_TABLE)
+        .from_select(["item_code", "total_quantity", "total_value", "lot_count"], aggregate)
+        .on_conflict_do_nothing(index_elements=["item_code"])
+    )
+
+def get_summary(db: Session, item_code: str) -> InventorySummary:
+    """
+    在庫集計を取得する関数（存在しない場合は在庫テーブルから集計して作成する）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :return: 在庫集計のスナップショット（セッションには追加しない。在庫の無い商品は空の集計）
+    """
+    ensure_summaries(db, [item_code])
+    return load_summaries(db, [item_code]).get(item_code) or build_summary(item_code, [])
+
+def load_summaries(db: Session, item_codes) -> dict[str, InventorySummary]:
+    """
+    複数商品の在庫集計を一括取得する関数
+    :param db: データベースセッション
+    :param item_codes: 商品コードのリストまたはサブクエリ
+    :return: 商品コードをキー、在庫集計のスナップショット（セッションには追加しない）を値とする辞書（集計の無い商品は含まない）
+    """
+    rows = db.execute(
+        select(SUMMARY_TABLE.c.item_code, SUMMARY_TABLE.c.total_quantity, SUMMARY_TABLE.c.total_value, SUMMARY_TABLE.c.lot_count)
+        .where(SUMMARY_TABLE.c.item_code.in_(item_codes))
+    ).all()
+    return {
+        item_code: InventorySummary(item_code=item_code, total_quantity=total_quantity, total_value=total_value, lot_count=lot_count)
+        for item_code, total_quantity, total_value, lot_count in rows
+    }
+
+def apply_receipt(db: Session, item_code: str, quantity: int, unit_price: float):
+    """
+    入荷（在庫登録）を在庫集計に反映する関数
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param quantity: 入荷数量
+    :param unit_price: 入荷単価
+    """
+    apply_receipts(db, {item_code: (quantity, quantity * unit_price, 1 if quantity > 0 else 0)})
+
+def apply_receipts(db: Session, receipts: dict[str, tuple[int, float, int]]):
+    """
+    複数商品の入荷を在庫集計に加算する関数（集計の無い商品は作成する。INSERT ... ON CONFLICT DO UPDATE）
+    :param db: データベースセッション
+    :param receipts: 商品コードをキー、(入荷数量, 入荷金額, 入荷ロット数) を値とする辞書
+
+    集計が未作成で在庫のある商品は、在庫の登録前に ensure_summaries で作成しておく。
+    """
+    if not receipts:
+        return
+    statement = dialect_insert(db)(SUMMARY_TABLE)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["item_code"],
+            set_={
+                "total_quantity": SUMMARY_TABLE.c.total_quantity + statement.excluded.total_quantity,
+                "total_value": SUMMARY_TABLE.c.total_value + statement.excluded.total_value,
+                "lot_count": SUMMARY_TABLE.c.lot_count + statement.excluded.lot_count,
+            },
+        ),
+        [
+            {"item_code": item_code, "total_quantity": quantity, "total_value": value, "lot_count": lots}
+            for item_code, (quantity, value, lots) in receipts.items()
+        ],
+    )
+
+def deplete_lot(inventory: Inventory, quantity: int, summary: InventorySummary = None):
+    """
+    在庫ロットから数量を引き当て、在庫集計に反映する関数
+    :param inventory: 引当対象の在庫
+    :param quantity: 引当数量
+    :param summary: 在庫集計（省略時は在庫のみ更新）
+    """
+    depleted = inventory.quantity > 0 and inventory.quantity <= quantity
+    inventory.quantity -= quantity
+    if depleted:
+        # 使い切ったロットは割当対象から外れ、アーカイブ処理の対象になる
+        inventory.depleted_at = datetime.utcnow()
+    if summary is None:
+        return
+    summary.total_quantity -= quantity
+    summary.total_value -= quantity * inventory.unit_price
+    if depleted:
+        summary.lot_count -= 1
+
+def apply_depletions(summary: InventorySummary, inventories: list[Inventory], quantities_before: list[int]):
+    """
+    複数ロットの引当をまとめて在庫集計に反映する関数
+    :param summary: 在庫集計
+    :param inventories: 引当後の在庫リスト
+    :param quantities_before: 引当前の各在庫の数量（inventories と同じ順序）
+    """
+    for inventory, before in zip(inventories, quantities_before):
+        consumed = before - inventory.quantity
+        if consumed == 0:
+            continue
+        summary.total_quantity -= consumed
+        summary.total_value -= consumed * inventory.unit_price
+        if before > 0 and inventory.quantity <= 0:
+            summary.lot_count -= 1
+
+def apply_consumption(db: Session, item_code: str, quantity: int, value: float, depleted_lots: int = 0):
+    """
+    引当を在庫集計に反映する関数（集計を読み込まずに加算のUPDATEを発行する）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    :param quantity: 引当数量
+    :param value: 引当金額（引当数量 × 在庫単価）
+    :param depleted_lots: 使い切ったロット数
+
+    集計が未作成の商品は更新しない（次回の get_summary で在庫テーブルから集計される）。
+    """
+    apply_consumptions(db, {item_code: (quantity, value, depleted_lots)})
+
+def apply_consumptions(db: Session, consumptions: dict[str, tuple[int, float, int]]):
+    """
+    複数商品の引当を在庫集計から減算する関数（1回の executemany で発行する）
+    :param db: データベースセッション
+    :param consumptions: 商品コードをキー、(引当数量, 引当金額, 使い切ったロット数) を値とする辞書
+    """
+    rows = [
+        {"b_item_code": item_code, "b_quantity": quantity, "b_value": value, "b_lots": lots}
+        for item_code, (quantity, value, lots) in consumptions.items()
+        if quantity or value or lots
+    ]
+    if not rows:
+        return
+    db.execute(
+        update(SUMMARY_TABLE)
+        .where(SUMMARY_TABLE.c.item_code == bindparam("b_item_code"))
+        .values(
+            total_quantity=SUMMARY_TABLE.c.total_quantity - bindparam("b_quantity"),
+            total_value=SUMMARY_TABLE.c.total_value - bindparam("b_value"),
+            lot_count=SUMMARY_TABLE.c.lot_count - bindparam("b_lots"),
+        ),
+        rows,
+    )
+
+def summary_values(summary: InventorySummary) -> tuple[int, float, int]:
+    """
+    在庫集計の (総数量, 総額, 残ロット数) を返す関数
+    """
+    return (summary.total_quantity, summary.total_value, summary.lot_count)
+
+def consumption(summary: InventorySummary, before: tuple[int, float, int]) -> tuple[int, float, int]:
+    """
+    在庫集計のスナップショットの割り当て前後の差分を返す関数
+    :param summary: 割り当て後の在庫集計のスナップショット
+    :param before: 割り当て前の (総数量, 総額, 残ロット数)
+    :return: (引当数量, 引当金額, 使い切ったロット数)
+    """
+    return (before[0] - summary.total_quantity, before[1] - summary.total_value, before[2] - summary.lot_count)
+
+def average_price(summary: InventorySummary) -> float:
+    """
+    在庫集計から平均単価を計算する関数
+    :param summary: 在庫集計
+    :return: 平均単価（在庫が無い場合は0）
+    """
+    return summary.total_value / summary.total_quantity if summary.total_quantity > 0 else 0
+
+def rebuild_summaries(db: Session):
+    """
+    在庫テーブルから全商品の在庫集計を再作成する関数（初期移行・整合性修復用）
+    :param db: データベースセッション
+    """
+    db.query(InventorySummary).delete()
+    rows = db.execute(
+        select(
+            Inventory.item_code,
+            func.sum(Inventory.quantity),
+            func.sum(Inventory.quantity * Inventory.unit_price),
+            func.sum(case((Inventory.quantity > 0, 1), else_=0)),
+        ).group_by(Inventory.item_code)
+    ).all()
+    db.add_all([
+        InventorySummary(item_code=item_code, total_quantity=total_quantity, total_value=total_value, lot_count=lot_count)
+        for item_code, total_quantity, total_value, lot_count in rows
+    ])
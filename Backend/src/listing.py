@@ -0,0 +1,118 @@
+import os
+from datetime import date
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from models import Order, Inventory, AllocationResult
+
+# 一覧API（GET /orders, /inventories, /allocation-results）のクエリを組み立てるヘルパー
+# 同期版（app.py）と非同期版（app_async.py）で共用するため、2.0形式の select 文を返す。
+# ページングはIDによるキーセット方式（WHERE id > :after_id ORDER BY id LIMIT :limit）のため、
+# テーブルの大きさに関わらず1ページの取得コストは一定になる。
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("LIST_DEFAULT_PAGE_SIZE", "100"))  # 1ページの既定件数
+MAX_PAGE_SIZE = int(os.environ.get("LIST_MAX_PAGE_SIZE", "1000"))  # 1ページの最大件数
+
+# 次のページの after_id を返すレスポンスヘッダ（最終ページでは付与しない）
+NEXT_CURSOR_HEADER = "X-Next-After-Id"
+
+# fields= で選択できるカラム
+LIST_FIELDS = {
+    Order: ("id", "item_code", "quantity", "allocated", "allocated_quantity", "backordered", "priority", "due_date", "customer_id"),
+    Inventory: ("id", "item_code", "quantity", "receipt_date", "unit_price", "created_at"),
+    AllocationResult: ("id", "order_id", "item_code", "allocated_quantity", "allocated_price", "allocation_date"),
+}
+
+# date_from / date_to で絞り込むカラム
+DATE_COLUMNS = {
+    Inventory: "receipt_date",
+    AllocationResult: "allocation_date",
+}
+
+def parse_fields(model, fields: str) -> list[str]:
+    """
+    fields= パラメータを選択するカラム名のリストに変換する関数
+    :param model: モデルクラス
+    :param fields: カンマ区切りのカラム名（省略時はNone）
+    :return: カラム名のリスト（ページングのためIDは常に含む）。省略時はNone
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in LIST_FIELDS[model]]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"指定できないフィールドです: {', '.join(unknown)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return list(dict.fromkeys(names))
+
+def select_fields(model, fields: str = None):
+    """
+    fields= パラメータに応じた select 文を返す関数
+    :param model: モデルクラス
+    :param fields: 選択するカラム（カンマ区切り。省略時はモデル全体）
+    :return: select 文
+    """
+    names = parse_fields(model, fields)
+    return select(*[getattr(model, name) for name in names]) if names else select(model)
+
+def apply_filters(query, model, item_code: str = None, allocated: bool = None, date_from: date = None, date_to: date = None):
+    """
+    一覧・エクスポートの絞り込み条件を select 文に追加する関数
+    :param query: select 文
+    :param model: モデルクラス（Order / Inventory / AllocationResult）
+    :param item_code: 商品コードで絞り込む
+    :param allocated: 割当済みかどうかで絞り込む（注文のみ）
+    :param date_from: 日付の下限（在庫は入荷日、割当結果は割当日。以上）
+    :param date_to: 日付の上限（以下）
+    :return: select 文
+    """
+    if item_code is not None:
+        query = query.where(model.item_code == item_code)
+    if allocated is not None:
+        if model is not Order:
+            raise HTTPException(status_code=400, detail="allocated は注文一覧でのみ指定できます")
+        query = query.where(model.allocated == allocated)
+    if date_from is not None or date_to is not None:
+        if model not in DATE_COLUMNS:
+            raise HTTPException(status_code=400, detail="日付範囲はこの一覧では指定できません")
+        date_column = getattr(model, DATE_COLUMNS[model])
+        if date_from is not None:
+            query = query.where(date_column >= date_from)
+        if date_to is not None:
+            query = query.where(date_column <= date_to)
+    return query
+
+def build_list_query(model, after_id: int = None, limit: int = DEFAULT_PAGE_SIZE, fields: str = None, **filters):
+    """
+    一覧APIのクエリを組み立てる関数
+    :param model: モデルクラス（Order / Inventory / AllocationResult）
+    :param after_id: このIDより大きいレコードを取得する（前のページの最後のID）
+    :param limit: 取得件数
+    :param fields: 選択するカラム（カンマ区切り。省略時はモデル全体）
+    :param filters: 絞り込み条件（apply_filters を参照）
+    :return: select 文
+
+    各絞り込み条件は (条件カラム, id) の複合インデックスで検索される。
+    """
+    query = apply_filters(select_fields(model, fields), model, **filters)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    return query.order_by(model.id).limit(limit)
+
+def page_response(response: Response, result, limit: int, fields: str = None):
+    """
+    一覧クエリの結果をレスポンスに変換する関数
+    :param response: レスポンス（次のページのカーソルをヘッダに設定する）
+    :param result: build_list_query の実行結果
+    :param limit: 取得件数
+    :param fields: 選択したカラム（指定時はPydanticモデルを経由せずにJSONを返す）
+    :return: モデルのリスト、またはJSONレスポンス
+    """
+    rows = result.all() if fields else result.scalars().all()
+    headers = {NEXT_CURSOR_HEADER: str(rows[-1].id)} if len(rows) == limit else {}
+    if fields:
+        return JSONResponse(jsonable_encoder([dict(row._mapping) for row in rows]), headers=headers)
+    response.headers.update(headers)
+    return rows
@@ -0,0 +1,83 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# ログ出力の設定
+# ハンドラ（コンソール等）への書き込みは QueueListener のスレッドで行い、ログを出力する側は
+# キューに追加するだけにする（割当処理やリクエスト処理がI/Oで停止しない）。
+# 一括割当は注文ごとの行をDEBUGで出力し、INFOでは ALLOCATION_LOG_INTERVAL 件ごとの進捗と実行結果の要約のみを出力する。
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()  # ログレベル
+LOG_QUEUE = os.environ.get("LOG_QUEUE", "1").lower() not in ("0", "false", "no")  # キュー経由で出力するかどうか
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+ALLOCATION_LOG_INTERVAL = int(os.environ.get("ALLOCATION_LOG_INTERVAL", "10000"))  # 一括割当の進捗を出力する注文数の間隔
+
+# 作成したキューハンドラごとの [キューハンドラ, 出力先のハンドラ, リスナー]
+_queues = []
+_configured = False
+
+def queue_handler(target: logging.Handler) -> logging.Handler:
+    """
+    ハンドラへの書き込みを別スレッドで行うキューハンドラを作成する関数
+    :param target: 出力先のハンドラ
+    :return: キューハンドラ（LOG_QUEUE=0 の場合は出力先のハンドラをそのまま返す）
+    """
+    if not LOG_QUEUE:
+        return target
+    handler = QueueHandler(queue.SimpleQueue())
+    listener = QueueListener(handler.queue, target, respect_handler_level=True)
+    listener.start()
+    _queues.append([handler, target, listener])
+    return handler
+
+def stop():
+    """
+    キューに残っているログを出力し、リスナーのスレッドを停止する関数（終了時に呼び出される）
+    """
+    for entry in _queues:
+        listener = entry[2]
+        if listener is not None:
+            listener.stop()
+            entry[2] = None
+
+def flush():
+    """
+    キューに残っているログを出力する関数（リスナーを停止してから再開する）
+
+    並列割当のワーカープロセスは終了時に atexit の処理を行わないため、シャードの処理ごとに呼び出す。
+    """
+    for _, _, listener in _queues:
+        if listener is not None:
+            listener.stop()
+            listener.start()
+
+def _restart_in_child():
+    """
+    fork したプロセス（並列割当のワーカー）ではリスナーのスレッドが存在しないため、新しいキューとリスナーを作成する
+    """
+    for entry in _queues:
+        handler, target, _ = entry
+        handler.queue = queue.SimpleQueue()
+        entry[2] = QueueListener(handler.queue, target, respect_handler_level=True)
+        entry[2].start()
+
+atexit.register(stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+def configure_logging(level: str = None):
+    """
+    ルートロガーにキュー経由のコンソール出力を設定する関数（コマンドラインの実行用。2回目以降は何もしない）
+    :param level: ログレベル（省略時は環境変数 LOG_LEVEL）
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    root.addHandler(queue_handler(console_handler))
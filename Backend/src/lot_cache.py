@@ -0,0 +1,319 @@
+import heapq
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import date
+from sqlalchemy.orm import Session
+from models import Inventory
+from lot_index import LotIndex
+
+# キャッシュ全体で保持するロット数の上限（超えた場合は最も古く使われた商品から破棄する）
+DEFAULT_MAX_LOTS = int(os.environ.get("INVENTORY_LOT_CACHE_MAX_LOTS", "100000"))
+
+# ロットの並び順
+ORDER_BY_ID = "id"  # ID順（FIFO/LIFO）。dequeの両端から取り出す
+ORDER_BY_RECEIPT_DATE = "receipt_date"  # 入荷日順。ヒープの先頭が最も古い入荷
+
+class LotRecord:
+    """
+    キャッシュに保持する在庫ロット（ORMオブジェクトより小さいスロットベースのレコード）
+    """
+    __slots__ = ("id", "quantity", "unit_price", "receipt_date")
+
+    def __init__(self, id: int, quantity: int, unit_price: float, receipt_date: date = None):
+        self.id = id
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.receipt_date = receipt_date
+
+    def receipt_key(self) -> tuple:
+        """
+        入荷日順の並び替えキー（入荷日が未設定のロットは最も古いものとして扱う）
+        """
+        return (self.receipt_date or date.min, self.id)
+
+def lot_id(record: LotRecord) -> int:
+    """
+    ID順の並び替えキー
+    """
+    return record.id
+
+class LotQueue:
+    """
+    1商品分の残数量のあるロットの並び
+
+    - ID順: dequeで保持し、first()/last() でFIFO/LIFOの先頭を取り出す
+    - 入荷日順: (入荷日, ID) をキーとするヒープで保持し、first() で最も古い入荷を取り出す
+    使い切ったロットはdequeでは即時に、ヒープでは先頭に来た時点で取り除く。
+    first_fit()/best_fit() は初回の検索時に並び順の残数量の索引（LotIndex）を作成し、以降は O(log n) で検索する。
+    並びはスレッドセーフではないため、共有キャッシュの並びは InventoryLotCache のロック内で操作する
+    （InventoryLotCache.first_fit / best_fit）。
+    """
+
+    def __init__(self, ordering: str, records: list[LotRecord] = ()):
+        """
+        :param ordering: 並び順（ORDER_BY_ID または ORDER_BY_RECEIPT_DATE）
+        :param records: ID順に整列済みのロット
+        """
+        if ordering not in (ORDER_BY_ID, ORDER_BY_RECEIPT_DATE):
+            raise ValueError(f"Unknown lot ordering: {ordering}")
+        self.ordering = ordering
+        self.by_id = {}
+        self.index = None
+        if ordering == ORDER_BY_ID:
+            self.lots = deque()
+            for record in records:
+                self.add(record)
+        else:
+            live = [record for record in records if record.quantity > 0]
+            self.by_id = {record.id: record for record in live}
+            self.lots = [(record.receipt_key(), record) for record in live]
+            heapq.heapify(self.lots)
+
+    def add(self, record: LotRecord):
+        """
+        ロットを追加する
+        """
+        if record.quantity <= 0:
+            return
+        self.by_id[record.id] = record
+        if self.index is not None:
+            self.index.add(record)
+        if self.ordering == ORDER_BY_RECEIPT_DATE:
+            heapq.heappush(self.lots, (record.receipt_key(), record))
+        elif not self.lots or self.lots[-1].id < record.id:
+            # IDは採番順のため、通常は末尾への追加になる
+            self.lots.append(record)
+        else:
+            position = next(i for i, lot in enumerate(self.lots) if lot.id > record.id)
+            self.lots.insert(position, record)
+
+    def first(self) -> LotRecord:
+        """
+        最も古いロット（ID順ではFIFOの先頭、入荷日順では最も古い入荷）を返す
+        """
+        self._prune()
+        if not self.lots:
+            return None
+        return self.lots[0] if self.ordering == ORDER_BY_ID else self.lots[0][1]
+
+    def last(self) -> LotRecord:
+        """
+        最も新しいロット（LIFOの先頭）を返す（ID順のみ）
+        """
+        if self.ordering != ORDER_BY_ID:
+            raise ValueError("last() is only supported for id ordering")
+        self._prune()
+        return self.lots[-1] if self.lots else None
+
+    def first_fit(self, quantity: int) -> LotRecord:
+        """
+        指定数量以上の残数量がある最も古いロットを返す
+        :param quantity: 必要数量
+        :return: ロット（該当なしの場合はNone）
+        """
+        return self._lot_index().first_fit(quantity)
+
+    def best_fit(self, quantity: int) -> LotRecord:
+        """
+        指定数量以上で残数量が最小のロットを返す（同じ残数量の場合は最も古いロット）
+        :param quantity: 必要数量
+        :return: ロット（該当なしの場合はNone）
+        """
+        return self._lot_index().best_fit(quantity)
+
+    def _lot_index(self) -> LotIndex:
+        """
+        並び順の残数量の索引を返す（初回のみ作成する）
+        """
+        if self.index is None:
+            key = LotRecord.receipt_key if self.ordering == ORDER_BY_RECEIPT_DATE else lot_id
+            self.index = LotIndex(list(self), key=key)
+        return self.index
+
+    def consume(self, lot_id: int, quantity: int) -> bool:
+        """
+        ロットから数量を引き当てる
+        :param lot_id: 在庫ID
+        :param quantity: 引当数量
+        :return: ロットを保持していた場合はTrue
+        """
+        record = self.by_id.get(lot_id)
+        if record is None:
+            return False
+        record.quantity -= quantity
+        if self.index is not None:
+            self.index.update(record)
+        if record.quantity <= 0:
+            del self.by_id[lot_id]
+            if self.ordering == ORDER_BY_ID:
+                self.lots.remove(record)
+            else:
+                self._prune()
+        return True
+
+    def _prune(self):
+        """
+        ヒープの先頭にある使い切ったロットを取り除く
+        """
+        if self.ordering == ORDER_BY_RECEIPT_DATE:
+            while self.lots and self.lots[0][1].quantity <= 0:
+                heapq.heappop(self.lots)
+
+    def __iter__(self):
+        if self.ordering == ORDER_BY_ID:
+            return iter(list(self.lots))
+        return iter([record for _, record in sorted(self.lots, key=lambda entry: entry[0]) if record.quantity > 0])
+
+    def __len__(self):
+        return len(self.by_id)
+
+class InventoryLotCache:
+    """
+    商品コードごとの残数量のあるロットを保持するLRUキャッシュ
+
+    割当APIが在庫を探すたびにデータベースを読まないよう、商品ごとのロットの並びを保持する。
+    在庫登録（add_lot）と引当（consume）で更新し、一括割当など他の経路で在庫が
+    変更された場合は invalidate() で破棄する。キャッシュはプロセス単位のため、
+    他のプロセスによる更新は引当時の条件付きUPDATEで検出し、破棄して再読込する。
+    """
+
+    def __init__(self, max_lots: int = None):
+        """
+        :param max_lots: 保持するロット数の上限（省略時は環境変数INVENTORY_LOT_CACHE_MAX_LOTS）
+        """
+        self.max_lots = max_lots if max_lots is not None else DEFAULT_MAX_LOTS
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, db: Session, item_code: str, ordering: str = ORDER_BY_RECEIPT_DATE) -> LotQueue:
+        """
+        商品のロットの並びを返す（キャッシュに無い場合はデータベースから読み込む）
+        :param db: データベースセッション
+        :param item_code: 商品コード
+        :param ordering: 並び順
+        :return: ロットの並び
+        """
+        key = (item_code, ordering)
+        with self.lock:
+            queue = self.entries.get(key)
+            if queue is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return queue
+            self.misses += 1
+
+        queue = LotQueue(ordering, load_lot_records(db, item_code))
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = queue
+            self.size += len(queue)
+            self._evict()
+        return queue
+
+    def first_fit(self, db: Session, item_code: str, quantity: int, ordering: str = ORDER_BY_RECEIPT_DATE) -> LotRecord:
+        """
+        指定数量以上の残数量がある最も古いロットを返す（索引の作成と検索はキャッシュのロック内で行う）
+        :param db: データベースセッション
+        :param item_code: 商品コード
+        :param quantity: 必要数量
+        :param ordering: 並び順
+        :return: ロット（該当なしの場合はNone）
+        """
+        queue = self.get(db, item_code, ordering)
+        with self.lock:
+            return queue.first_fit(quantity)
+
+    def best_fit(self, db: Session, item_code: str, quantity: int, ordering: str = ORDER_BY_RECEIPT_DATE) -> LotRecord:
+        """
+        指定数量以上で残数量が最小のロットを返す（索引の作成と検索はキャッシュのロック内で行う）
+        :param db: データベースセッション
+        :param item_code: 商品コード
+        :param quantity: 必要数量
+        :param ordering: 並び順
+        :return: ロット（該当なしの場合はNone）
+        """
+        queue = self.get(db, item_code, ordering)
+        with self.lock:
+            return queue.best_fit(quantity)
+
+    def add_lot(self, inventory: Inventory):
+        """
+        登録された在庫をキャッシュ済みの並びに追加する
+        :param inventory: 登録された在庫
+        """
+        with self.lock:
+            for ordering in (ORDER_BY_ID, ORDER_BY_RECEIPT_DATE):
+                queue = self.entries.get((inventory.item_code, ordering))
+                if queue is not None:
+                    before = len(queue)
+                    queue.add(LotRecord(inventory.id, inventory.quantity, inventory.unit_price, inventory.receipt_date))
+                    self.size += len(queue) - before
+            self._evict()
+
+    def consume(self, item_code: str, lot_id: int, quantity: int):
+        """
+        引当をキャッシュ済みの並びに反映する
+        :param item_code: 商品コード
+        :param lot_id: 在庫ID
+        :param quantity: 引当数量
+        """
+        with self.lock:
+            for ordering in (ORDER_BY_ID, ORDER_BY_RECEIPT_DATE):
+                queue = self.entries.get((item_code, ordering))
+                if queue is not None:
+                    before = len(queue)
+                    queue.consume(lot_id, quantity)
+                    self.size += len(queue) - before
+
+    def invalidate(self, item_code: str = None):
+        """
+        キャッシュを破棄する
+        :param item_code: 商品コード（省略時は全商品）
+        """
+        with self.lock:
+            if item_code is None:
+                self.entries.clear()
+                self.size = 0
+                return
+            for ordering in (ORDER_BY_ID, ORDER_BY_RECEIPT_DATE):
+                queue = self.entries.pop((item_code, ordering), None)
+                if queue is not None:
+                    self.size -= len(queue)
+
+    def _evict(self):
+        """
+        上限を超えた分を最も古く使われた商品から破棄する
+        """
+        while self.size > self.max_lots and self.entries:
+            _, queue = self.entries.popitem(last=False)
+            self.size -= len(queue)
+            self.evictions += 1
+
+def query_live_lots(db: Session, item_code: str):
+    """
+    商品の残数量のある在庫をID順に取得するクエリ（部分インデックス ix_inventories_open_lots を使用）
+    :param db: データベースセッション
+    :param item_code: 商品コード
+    """
+    return (
+        db.query(Inventory.id, Inventory.quantity, Inventory.unit_price, Inventory.receipt_date)
+        .filter(Inventory.item_code == item_code, Inventory.quantity > 0)
+        .order_by(Inventory.id)
+    )
+
+def load_lot_records(db: Session, item_code: str) -> list[LotRecord]:
+    """
+    商品の残数量のある在庫をロットレコードとしてID順に読み込む関数
+    （入荷日順の並びはメモリ上でヒープを構築する）
+    """
+    return [LotRecord(*row) for row in query_live_lots(db, item_code)]
+
+# プロセス全体で共有するキャッシュ（Lambdaのウォームスタート間で再利用される）
+lot_cache = InventoryLotCache()
@@ -0,0 +1,152 @@
+import bisect
+import os
+
+# 在庫ロットの残数量による索引（SPECIFIC戦略・割当APIのロット選択で使用）
+# - 最適適合（best fit）: 必要数量以上で残数量が最小のロット。(残数量, 位置) のソート済みリストを二分探索する
+# - 先頭適合（first fit）: 必要数量以上の残数量がある並び順で最初のロット。残数量の最大値のセグメント木を降りる
+# どちらも O(log n) で検索する。引当による残数量の変更は、セグメント木は O(log n)、ソート済みリストは
+# 位置の探索は O(log n) だが挿入・削除は配列のずらしを伴う O(n)（memmove のため、1万ロット程度では
+# 検索ごとの線形走査より十分小さい）。
+
+BEST_FIT = "best_fit"
+FIRST_FIT = "first_fit"
+
+# SPECIFIC戦略のロットの選び方（最適適合は大きいロットを残し、在庫の細分化を抑える）
+SPECIFIC_LOT_SELECTION = os.environ.get("SPECIFIC_LOT_SELECTION", BEST_FIT)
+
+class LotIndex:
+    """
+    1商品分のロットの残数量による索引
+
+    ロットは並び順（ID順・入荷日順など）で保持し、位置を固定したまま残数量の変更を反映する。
+    使い切ったロットは検索の対象から外れる。
+    """
+
+    def __init__(self, lots: list, key=None):
+        """
+        :param lots: ロットのリスト（id・quantity 属性を持つ。並び順に整列済み）
+        :param key: 並び順のキー関数（指定時は add で並び順の途中に追加されたロットを正しい位置に並べ直す）
+        """
+        self.key = key
+        self._build(list(lots))
+
+    def _build(self, lots: list):
+        """
+        索引を作成する（ロットの追加で容量が不足した場合・並び順の途中に追加された場合も作り直す）
+        """
+        self.lots = lots
+        self.positions = {lot.id: position for position, lot in enumerate(lots)}
+        self.quantities = [max(lot.quantity, 0) for lot in lots]
+        self.by_quantity = sorted((quantity, position) for position, quantity in enumerate(self.quantities) if quantity > 0)
+        self.capacity = 1
+        while self.capacity < max(len(lots), 1):
+            self.capacity *= 2
+        # セグメント木（葉は capacity 番目から。各節点は子の残数量の最大値）
+        self.tree = [0] * (2 * self.capacity)
+        self.tree[self.capacity:self.capacity + len(lots)] = self.quantities
+        for node in range(self.capacity - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def best_fit(self, quantity: int):
+        """
+        必要数量以上で残数量が最小のロットを返す（同じ残数量の場合は並び順で先のロット）
+        :param quantity: 必要数量
+        :return: ロット（該当なしの場合はNone）
+        """
+        index = bisect.bisect_left(self.by_quantity, (max(quantity, 1), -1))
+        if index == len(self.by_quantity):
+            return None
+        return self.lots[self.by_quantity[index][1]]
+
+    def first_fit(self, quantity: int):
+        """
+        必要数量以上の残数量がある並び順で最初のロットを返す
+        :param quantity: 必要数量
+        :return: ロット（該当なしの場合はNone）
+        """
+        quantity = max(quantity, 1)
+        if self.tree[1] < quantity:
+            return None
+        node = 1
+        while node < self.capacity:
+            node = 2 * node if self.tree[2 * node] >= quantity else 2 * node + 1
+        return self.lots[node - self.capacity]
+
+    def select(self, quantity: int, selection: str = BEST_FIT):
+        """
+        指定した選び方でロットを返す
+        :param quantity: 必要数量
+        :param selection: ロットの選び方（BEST_FIT / FIRST_FIT）
+        """
+        if selection == BEST_FIT:
+            return self.best_fit(quantity)
+        if selection == FIRST_FIT:
+            return self.first_fit(quantity)
+        raise ValueError(f"Unknown lot selection: {selection}")
+
+    def update(self, lot):
+        """
+        ロットの残数量の変更を索引に反映する（引当後に呼び出す）
+        :param lot: 残数量を変更したロット
+        """
+        position = self.positions.get(lot.id)
+        if position is None:
+            return
+        old = self.quantities[position]
+        new = max(lot.quantity, 0)
+        if old == new:
+            return
+        if old > 0:
+            del self.by_quantity[bisect.bisect_left(self.by_quantity, (old, position))]
+        if new > 0:
+            bisect.insort(self.by_quantity, (new, position))
+        self.quantities[position] = new
+        node = self.capacity + position
+        self.tree[node] = new
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def add(self, lot):
+        """
+        ロットを追加する（並び順の末尾への追加を想定し、途中への追加・容量の不足時は索引を作り直す）
+        :param lot: 追加するロット
+        """
+        if lot.id in self.positions:
+            self.update(lot)
+            return
+        in_order = self.key is None or not self.lots or self.key(self.lots[-1]) <= self.key(lot)
+        if not in_order or len(self.lots) >= self.capacity:
+            lots = self.lots + [lot]
+            if not in_order:
+                lots.sort(key=self.key)
+            self._build(lots)
+            return
+        position = len(self.lots)
+        self.lots.append(lot)
+        self.positions[lot.id] = position
+        self.quantities.append(0)
+        self.update(lot)
+
+    def __len__(self):
+        return len(self.by_quantity)
+
+def linear_select(lots: list, quantity: int, selection: str = BEST_FIT):
+    """
+    ロットを線形走査で選ぶ関数（索引を作成するほどではない1件の検索と、性能試験の比較対象に使用）
+    :param lots: ロットのリスト（並び順）
+    :param quantity: 必要数量
+    :param selection: ロットの選び方（BEST_FIT / FIRST_FIT）
+    :return: ロット（該当なしの場合はNone）
+    """
+    quantity = max(quantity, 1)
+    if selection == FIRST_FIT:
+        return next((lot for lot in lots if lot.quantity >= quantity), None)
+    if selection == BEST_FIT:
+        best = None
+        for lot in lots:
+            if lot.quantity >= quantity and (best is None or lot.quantity < best.quantity):
+                best = lot
+        return best
+    raise ValueError(f"Unknown lot selection: {selection}")
@@ -0,0 +1,290 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 一括割当とAPIの計測（Prometheusのテキスト形式で出力するカウンタ・ヒストグラム）
+# - 一括割当: 割当件数・引当したロット数・フェーズごとの所要時間・1回の実行のDBラウンドトリップ数
+# - API: エンドポイントごとの所要時間（http_middleware）
+# METRICS_ENABLED=0 の場合は計測せず、各関数は何もしない（フェーズの計測は共有の nullcontext を返す）。
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# 所要時間（秒）のヒストグラムの既定のバケット
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# 件数（DBラウンドトリップ数）のヒストグラムのバケット
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+_NULL_CONTEXT = nullcontext()
+
+def _escape(value) -> str:
+    """
+    ラベルの値をエスケープする（バックスラッシュ・ダブルクォート・改行）
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: tuple, values: tuple, extra: str = None) -> str:
+    """
+    ラベルをPrometheusのテキスト形式（{name="value",...}）に変換する
+    """
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """
+    単調増加するカウンタ
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        :param name: メトリクス名
+        :param documentation: 説明（HELP行）
+        :param labelnames: ラベル名
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        カウンタを加算する
+        """
+        if not ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] += amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+class Histogram:
+    """
+    観測値の分布（バケットごとの件数・合計・件数）
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        """
+        :param name: メトリクス名
+        :param documentation: 説明（HELP行）
+        :param labelnames: ラベル名
+        :param buckets: バケットの上限（昇順）
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # ラベルの値ごとに [バケットごとの件数..., +Infの件数, 合計]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        値を1件観測する
+        """
+        if not ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> int:
+        state = self.values.get(tuple(labels[name] for name in self.labelnames))
+        return sum(state[:-1]) if state else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, state in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+ALLOCATION_RUNS = Counter("inventory_allocation_runs_total", "Number of batch allocation runs.", ("strategy",))
+ALLOCATION_ORDERS = Counter("inventory_allocation_orders_total", "Number of orders allocated by batch allocation.", ("strategy",))
+ALLOCATION_LOTS_TOUCHED = Counter("inventory_allocation_lots_touched_total", "Number of inventory lots depleted by batch allocation.", ("strategy",))
+ALLOCATION_PHASE_SECONDS = Histogram("inventory_allocation_phase_seconds", "Time spent in each phase of batch allocation.", ("phase",))
+ALLOCATION_ROUND_TRIPS = Histogram("inventory_allocation_db_round_trips", "Database round-trips per batch allocation run.", ("strategy",), COUNT_BUCKETS)
+DB_ROUND_TRIPS = Counter("inventory_db_round_trips_total", "Number of statements sent to the database.")
+HTTP_REQUEST_SECONDS = Histogram("inventory_http_request_duration_seconds", "API request latency.", ("method", "route", "status"))
+
+METRICS = [ALLOCATION_RUNS, ALLOCATION_ORDERS, ALLOCATION_LOTS_TOUCHED, ALLOCATION_PHASE_SECONDS, ALLOCATION_ROUND_TRIPS, DB_ROUND_TRIPS, HTTP_REQUEST_SECONDS]
+
+def render() -> str:
+    """
+    全メトリクスをPrometheusのテキスト形式で返す関数（/metrics エンドポイントで使用）
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def clear():
+    """
+    全メトリクスを初期化する関数（テスト用）
+    """
+    for metric in METRICS:
+        metric.clear()
+
+class AllocationRun:
+    """
+    一括割当1回分の計測（フェーズごとの所要時間・件数・DBラウンドトリップ数）
+    """
+
+    def __init__(self, strategy: str):
+        self.strategy = strategy
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.round_trips = 0
+        self.orders = 0
+        self.items = 0
+        self.lots_touched = 0
+        self.backorders = 0
+        self.remaining_items = 0
+        self.commits = 0
+        self._nested = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        フェーズの所要時間を計測する（入れ子のフェーズの時間は外側のフェーズから除く）
+        """
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            exclusive = elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.phases[name] += exclusive
+            ALLOCATION_PHASE_SECONDS.observe(exclusive, phase=name)
+
+    def summary(self, allocation_results: int = None) -> dict:
+        """
+        実行結果の要約を返す（ログ出力用）
+        """
+        return {
+            "strategy": self.strategy,
+            "items": self.items,
+            "orders": self.orders,
+            "lots_touched": self.lots_touched,
+            "backorders": self.backorders,
+            "remaining_items": self.remaining_items,
+            "commits": self.commits,
+            "allocation_results": allocation_results,
+            "db_round_trips": self.round_trips if ENABLED else None,
+            "elapsed_seconds": round(time.perf_counter() - self.started, 6),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+        }
+
+_current_run = contextvars.ContextVar("allocation_run", default=None)
+
+@contextmanager
+def allocation_run(strategy: str):
+    """
+    一括割当1回分の計測を開始する（ブロック内のDBラウンドトリップとフェーズを集計する）
+    """
+    run = AllocationRun(strategy)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        ALLOCATION_RUNS.inc(strategy=strategy)
+        ALLOCATION_ORDERS.inc(run.orders, strategy=strategy)
+        ALLOCATION_LOTS_TOUCHED.inc(run.lots_touched, strategy=strategy)
+        ALLOCATION_ROUND_TRIPS.observe(run.round_trips, strategy=strategy)
+
+def phase(name: str):
+    """
+    実行中の一括割当のフェーズの所要時間を計測するコンテキストマネージャを返す関数
+    （計測が無効な場合や一括割当の外では何もしない）
+    """
+    run = _current_run.get()
+    if run is None or not ENABLED:
+        return _NULL_CONTEXT
+    return run.phase(name)
+
+def _count_round_trip(conn, cursor, statement, parameters, context, executemany):
+    """
+    SQL文の送信ごとにDBラウンドトリップ数を加算するイベントリスナ
+    """
+    DB_ROUND_TRIPS.inc()
+    run = _current_run.get()
+    if run is not None:
+        run.round_trips += 1
+
+def set_enabled(enabled: bool):
+    """
+    計測の有効・無効を切り替える関数（無効時はSQL文ごとのイベントリスナも解除する）
+    """
+    global ENABLED
+    ENABLED = enabled
+    listening = event.contains(Engine, "before_cursor_execute", _count_round_trip)
+    if enabled and not listening:
+        event.listen(Engine, "before_cursor_execute", _count_round_trip)
+    elif not enabled and listening:
+        event.remove(Engine, "before_cursor_execute", _count_round_trip)
+
+set_enabled(ENABLED)
+
+async def http_middleware(request, call_next):
+    """
+    エンドポイントごとの所要時間を計測するミドルウェア（ルートはパスのテンプレートで集計する）
+    """
+    if not ENABLED:
+        return await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
@@ -0,0 +1,78 @@
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from database import Base
+import models  # noqa: F401  全モデルをメタデータに登録する
+
+logger = logging.getLogger(__name__)
+
+# 既存のデータベースをモデル定義に追従させる簡易マイグレーション
+# - 存在しないテーブルを作成する
+# - 既存テーブルに存在しないカラムを追加する（ALTER TABLE ... ADD COLUMN）
+# - 存在しないインデックス（部分インデックスを含む）を作成する
+# - モデル定義から削除したインデックスを削除する
+# 何度実行しても同じ結果になるため、デプロイのたびに実行してよい。
+
+# モデル定義から削除したインデックス（テーブル名をキーとする）
+OBSOLETE_INDEXES = {
+    # 商品コード + ID順の検索はすべて残数量のあるロットのみを対象とするため、部分インデックス ix_inventories_open_lots を使用する
+    "inventories": ("ix_inventories_item_code_id",),
+}
+
+def upgrade(engine: Engine):
+    """
+    データベースをモデル定義の状態に更新する関数
+    :param engine: データベースエンジン
+    """
+    with engine.begin() as conn:
+        existing_tables = set(inspect(conn).get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                # 新規テーブルはインデックスも含めて作成される
+                table.create(conn)
+                logger.info("Created table %s", table.name)
+                continue
+            add_missing_columns(conn, table)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+            drop_obsolete_indexes(conn, table)
+
+def add_missing_columns(conn, table):
+    """
+    既存テーブルに存在しないカラムを追加する関数
+    :param conn: データベース接続
+    :param table: モデルのテーブル定義
+    """
+    existing_columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {conn.dialect.identifier_preparer.format_table(table)} ADD COLUMN {column_ddl}")
+        logger.info("Added column %s.%s", table.name, column.name)
+
+def drop_obsolete_indexes(conn, table):
+    """
+    既存テーブルからモデル定義で削除したインデックスを削除する関数
+    :param conn: データベース接続
+    :param table: モデルのテーブル定義
+    """
+    obsolete = OBSOLETE_INDEXES.get(table.name, ())
+    if not obsolete:
+        return
+    existing_indexes = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    for name in obsolete:
+        if name in existing_indexes:
+            conn.exec_driver_sql(f"DROP INDEX {conn.dialect.identifier_preparer.quote(name)}")
+            logger.info("Dropped index %s.%s", table.name, name)
+
+def main():
+    """
+    メイン関数
+    """
+    from database import engine
+    upgrade(engine)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Boolean, Index, false
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -9,10 +9,34 @@ class Order(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)  # 注文IDをプライマリキーに設定
     item_code = Column(String, index=True)  # 商品コード
     quantity = Column(Integer)  # 数量
-    allocated = Column(Boolean, default=False)  # 割当済みかどうかを示すフラグ
+    allocated = Column(Boolean, default=False)  # 割当済みかどうかを示すフラグ（注文数量をすべて引き当てた場合にTrue）
+    allocated_quantity = Column(Integer, nullable=False, default=0, server_default="0")  # 引当済みの数量
+    backordered = Column(Boolean, nullable=False, default=False, server_default=false())  # バックオーダー（入荷待ち）かどうか
+    priority = Column(Integer, nullable=False, default=0, server_default="0")  # 優先度（大きいほど先に割り当てる）
+    due_date = Column(Date, nullable=True)  # 納期（同じ優先度では納期の早い注文から割り当てる）
+    customer_id = Column(String, nullable=True)  # 顧客ID（顧客ごとの割当上限に使用）
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # 楽観的排他制御用のバージョン
 
     allocation_results = relationship("AllocationResult", back_populates="order")  # AllocationResultとのリレーションシップを定義
 
+    # ORMによる更新は WHERE version = :version 付きで発行され、競合時はStaleDataErrorとなる
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def remaining_quantity(self) -> int:
+        """
+        未引当の数量
+        """
+        return self.quantity - (self.allocated_quantity or 0)
+
+    __table_args__ = (
+        # 未割当の注文のみを対象とする部分インデックス（一括割当で商品コード・ID順に取得する）
+        Index("ix_orders_open", "item_code", "id", sqlite_where=allocated == False, postgresql_where=allocated == False),
+        # 一覧APIの絞り込み（条件 + ID順のキーセットページング）
+        Index("ix_orders_item_code_id", "item_code", "id"),
+        Index("ix_orders_allocated_id", "allocated", "id"),
+    )
+
 class Inventory(Base):
     __tablename__ = "inventories"  # テーブル名を "inventories" に設定
 
@@ -22,6 +46,34 @@ class Inventory(Base):
     receipt_date = Column(Date)  # 入荷日
     unit_price = Column(Float)  # 単価
     created_at = Column(DateTime, default=datetime.utcnow)  # 作成日時を現在の日時に設定
+    depleted_at = Column(DateTime, nullable=True)  # 残数量が0になった日時（割当処理で設定）
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # 楽観的排他制御用のバージョン
+
+    # 一括割当による更新と割当APIによる条件付きUPDATEが競合した場合は一括割当側がStaleDataErrorとなる
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # 割当APIの検索（商品コード + 入荷日順）
+        Index("ix_inventories_item_code_receipt_date_id", "item_code", "receipt_date", "id"),
+        # 残数量のあるロットのみを対象とする部分インデックス（一括割当・バックオーダー・ロットキャッシュの商品コード + ID順の検索）
+        Index("ix_inventories_open_lots", "item_code", "id", sqlite_where=quantity > 0, postgresql_where=quantity > 0),
+        # 使い切ったロットのみを対象とする部分インデックス（アーカイブ処理で使用）
+        Index("ix_inventories_depleted_lots", "id", sqlite_where=quantity <= 0, postgresql_where=quantity <= 0),
+        # 一覧APIの入荷日による絞り込み
+        Index("ix_inventories_receipt_date_id", "receipt_date", "id"),
+    )
+
+class InventoryArchive(Base):
+    __tablename__ = "inventory_archives"  # テーブル名を "inventory_archives" に設定
+
+    id = Column(Integer, primary_key=True)  # 元の在庫ID
+    item_code = Column(String, index=True)  # 商品コード
+    quantity = Column(Integer)  # 数量（アーカイブ時点の残数量）
+    receipt_date = Column(Date)  # 入荷日
+    unit_price = Column(Float)  # 単価
+    created_at = Column(DateTime)  # 作成日時
+    depleted_at = Column(DateTime, nullable=True)  # 残数量が0になった日時
+    archived_at = Column(DateTime, default=datetime.utcnow)  # アーカイブ日時
 
 class AllocationResult(Base):
     __tablename__ = "allocation_results"  # テーブル名を "allocation_results" に設定
@@ -34,3 +86,59 @@ class AllocationResult(Base):
     allocation_date = Column(Date)  # 割当日
 
     order = relationship("Order", back_populates="allocation_results")  # Orderとのリレーションシップを定義
+
+    __table_args__ = (
+        # 一覧APIの絞り込み（条件 + ID順のキーセットページング）
+        Index("ix_allocation_results_item_code_id", "item_code", "id"),
+        Index("ix_allocation_results_allocation_date_id", "allocation_date", "id"),
+    )
+
+class InventorySummary(Base):
+    __tablename__ = "inventory_summaries"  # テーブル名を "inventory_summaries" に設定
+
+    item_code = Column(String, primary_key=True)  # 商品コードをプライマリキーに設定
+    total_quantity = Column(Integer, default=0, nullable=False)  # 在庫総数量
+    total_value = Column(Float, default=0.0, nullable=False)  # 在庫総額（数量 × 単価の合計）
+    lot_count = Column(Integer, default=0, nullable=False)  # 残数量のあるロット数
+
+class AllocationOutbox(Base):
+    __tablename__ = "allocation_outbox"  # テーブル名を "allocation_outbox" に設定
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 連番（登録順に処理する）
+    event_type = Column(String, nullable=False)  # イベントの種類（注文の登録 / 在庫の入荷）
+    item_code = Column(String, nullable=False)  # 商品コード
+    entity_id = Column(Integer)  # 注文ID・在庫ID
+    created_at = Column(DateTime, default=datetime.utcnow)  # 作成日時
+
+class Backorder(Base):
+    __tablename__ = "backorders"  # テーブル名を "backorders" に設定
+
+    order_id = Column(Integer, ForeignKey("orders.id"), primary_key=True)  # 注文ID
+    item_code = Column(String, nullable=False)  # 商品コード
+    remaining_quantity = Column(Integer, nullable=False)  # 未引当の数量
+    priority = Column(Integer, nullable=False, default=0, server_default="0")  # 優先度（大きいほど先に引き当てる）
+    created_at = Column(DateTime, default=datetime.utcnow)  # 作成日時
+
+    __table_args__ = (
+        # 入荷時に商品コードごとに優先度順で取得する
+        Index("ix_backorders_item_code_priority", "item_code", "priority", "order_id"),
+    )
+
+class AllocationCheckpoint(Base):
+    __tablename__ = "allocation_checkpoints"  # テーブル名を "allocation_checkpoints" に設定
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 実行ID
+    strategy = Column(String, nullable=False)  # 割り当て戦略
+    partition = Column(String, nullable=False)  # 対象の商品の区分（全商品は "*"、シャード指定は商品コードのハッシュ）
+    max_order_id = Column(Integer, nullable=False)  # 対象の注文IDの上限（実行開始時点の未割当の注文の最大ID）
+    last_item_code = Column(String)  # 最後にコミットした商品コード
+    items = Column(Integer, nullable=False, default=0)  # コミット済みの商品数
+    orders = Column(Integer, nullable=False, default=0)  # コミット済みの注文数
+    status = Column(String, nullable=False, default="running")  # running / completed
+    started_at = Column(DateTime, default=datetime.utcnow)  # 開始日時
+    updated_at = Column(DateTime, default=datetime.utcnow)  # 最終コミット日時
+
+    __table_args__ = (
+        # 再開時に戦略・区分ごとの実行中のチェックポイントを取得する
+        Index("ix_allocation_checkpoints_strategy_partition", "strategy", "partition", "status", "id"),
+    )
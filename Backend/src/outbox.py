@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from models import AllocationOutbox
+
+# 差分割当（incremental_allocation.py）のためのアウトボックス
+# 注文・在庫の登録と同じトランザクションでイベントを追加し、割当ワーカーはイベントのある商品コードのみを割り当てる。
+
+ORDER_CREATED = "order_created"  # 注文の登録
+INVENTORY_RECEIVED = "inventory_received"  # 在庫の入荷
+
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "10000"))  # 割当ワーカーが1回に処理するイベント数
+
+def record_event(db: Session, event_type: str, item_code: str, entity_id: int = None):
+    """
+    イベントを1件追加する関数（コミットは呼び出し側で行う）
+    :param db: データベースセッション（非同期セッションも可）
+    :param event_type: イベントの種類（ORDER_CREATED / INVENTORY_RECEIVED）
+    :param item_code: 商品コード
+    :param entity_id: 注文ID・在庫ID
+    """
+    db.add(AllocationOutbox(event_type=event_type, item_code=item_code, entity_id=entity_id))
+
+def record_events(db: Session, event_type: str, rows: list[tuple[str, int]]):
+    """
+    イベントを複数行のINSERTでまとめて追加する関数（一括登録で使用。コミットは呼び出し側で行う）
+    :param db: データベースセッション
+    :param event_type: イベントの種類
+    :param rows: （商品コード, 注文ID・在庫ID）のリスト
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    db.execute(insert(AllocationOutbox), [
+        {"event_type": event_type, "item_code": item_code, "entity_id": entity_id, "created_at": now}
+        for item_code, entity_id in rows
+    ])
+
+def claim_events(db: Session, limit: int = OUTBOX_BATCH_SIZE) -> tuple[list[int], list[str]]:
+    """
+    未処理のイベントを登録順に取得して削除する関数（削除は呼び出し側のコミットで確定する）
+    :param db: データベースセッション
+    :param limit: 取得するイベント数の上限
+    :return: 取得したイベントのIDのリストと、対象の商品コードのリスト（重複なし・昇順）
+
+    PostgreSQLでは SELECT ... FOR UPDATE SKIP LOCKED により、複数のワーカーが同じイベントを処理しない。
+    同じ商品の別のイベントは別のワーカーが取得し得るため、商品の割り当ては lock_items で直列化する。
+    コミット前に失敗した場合はロールバックによりイベントが残り、次回に再処理される。
+    """
+    rows = db.execute(
+        select(AllocationOutbox.id, AllocationOutbox.item_code)
+        .order_by(AllocationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        return [], []
+    ids = [row.id for row in rows]
+    db.execute(delete(AllocationOutbox).where(AllocationOutbox.id.in_(ids)))
+    return ids, sorted({row.item_code for row in rows})
+
+def lock_items(db: Session, item_codes: list[str]):
+    """
+    商品コードごとのトランザクションロックを取得する関数（PostgreSQLの pg_advisory_xact_lock。コミット・ロールバックで解放される）
+    :param db: データベースセッション
+    :param item_codes: 商品コード（デッドロックを避けるため昇順に取得する）
+
+    複数のワーカーが同じ商品を同時に割り当てないようにする（後のワーカーは先のワーカーのコミットを待ち、
+    割り当て済みの注文を読み込まない）。SQLiteは書き込みがデータベース単位で直列化されるため何もしない。
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for item_code in sorted(item_codes):
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext(item_code))))
@@ -0,0 +1,109 @@
+import logging
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from allocation import allocate_in_slices, open_item_codes
+from lot_cache import lot_cache
+import log_config
+
+logger = logging.getLogger(__name__)
+
+# 商品コードごとの注文は在庫を共有しないため、商品コード単位で分割すれば
+# 各シャードを独立したプロセス・トランザクションで割り当てられる。
+
+def shard_of(item_code: str, shard_count: int) -> int:
+    """
+    商品コードのシャード番号を返す関数（プロセスや実行ごとに変わらないCRC32で分割する）
+    :param item_code: 商品コード
+    :param shard_count: シャード数
+    :return: シャード番号（0 〜 shard_count - 1）
+    """
+    return zlib.crc32(item_code.encode("utf-8")) % shard_count
+
+def shard_item_codes(item_codes: list[str], shard_count: int) -> list[list[str]]:
+    """
+    商品コードをシャードに分割する関数
+    :param item_codes: 商品コードのリスト
+    :param shard_count: シャード数
+    :return: シャードごとの商品コードのリスト（空のシャードは含まない）
+    """
+    if shard_count <= 0:
+        raise ValueError("shard_count must be positive")
+    shards = [[] for _ in range(shard_count)]
+    for item_code in sorted(item_codes):
+        shards[shard_of(item_code, shard_count)].append(item_code)
+    return [shard for shard in shards if shard]
+
+def allocate_shard(database_url: str, strategy: str, item_codes: list[str], chunk_size: int = None, time_slice: float = None,
+                   commit_orders: int = None, commit_seconds: float = None) -> int:
+    """
+    1シャード分の割り当てをワーカープロセスで実行する関数
+    :param database_url: データベースURL
+    :param strategy: 割り当て戦略
+    :param item_codes: シャードの商品コード
+    :param chunk_size: 割り当て結果を一括INSERTする行数
+    :param time_slice: 処理時間の目安の秒数（時間枠ごとにコミットし、シャードの残りの商品がなくなるまで繰り返す）
+    :param commit_orders: 1トランザクションで割り当てる注文数の目安
+    :param commit_seconds: 1トランザクションの処理時間の目安の秒数
+    :return: シャードの商品コード数
+
+    親プロセスの接続プールは共有せず、ワーカーごとにエンジンとセッションを作成する。
+    割り当てはシャード単位（時間枠・区切りコミットを指定した場合はその区切りごと）でコミットされる。
+    """
+    engine = create_engine(database_url)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        allocate_in_slices(db, strategy, chunk_size=chunk_size, item_codes=item_codes, time_slice=time_slice,
+                           commit_orders=commit_orders, commit_seconds=commit_seconds)
+    finally:
+        db.close()
+        engine.dispose()
+        log_config.flush()
+    return len(item_codes)
+
+def allocate_inventory_parallel(db: Session, strategy: str, workers: int, database_url: str = None, chunk_size: int = None, shard_count: int = None,
+                                time_slice: float = None, commit_orders: int = None, commit_seconds: float = None) -> int:
+    """
+    商品コード単位に分割した割り当てをプロセスプールで並列実行する関数
+    :param db: データベースセッション（対象商品コードの取得に使用）
+    :param strategy: 割り当て戦略
+    :param workers: ワーカープロセス数
+    :param database_url: ワーカーが接続するデータベースURL（省略時はセッションのエンジンのURL）
+    :param chunk_size: 割り当て結果を一括INSERTする行数
+    :param shard_count: シャード数（省略時はワーカープロセス数）
+    :param time_slice: ワーカーの処理時間の目安の秒数（省略時は環境変数 ALLOCATION_TIME_SLICE）
+    :param commit_orders: ワーカーの1トランザクションで割り当てる注文数の目安（省略時は環境変数 ALLOCATION_COMMIT_ORDERS）
+    :param commit_seconds: ワーカーの1トランザクションの処理時間の目安の秒数（省略時は環境変数 ALLOCATION_COMMIT_SECONDS）
+    :return: 割り当てた商品コード数
+
+    各商品の割り当て結果は直列実行（allocate_inventory）と同一になる。
+    ただしコミットはシャード単位（時間枠・区切りコミットを指定した場合はその区切りごと）のため、
+    途中で失敗した場合は完了したシャード・区切りのみ反映される。
+    """
+    if workers <= 0:
+        raise ValueError("workers must be positive")
+    if database_url is None:
+        url = db.get_bind().url
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            raise ValueError("Parallel allocation requires a database shared between processes")
+        database_url = url.render_as_string(hide_password=False)
+
+    item_codes = db.execute(open_item_codes()).scalars().all()
+    # 対象商品の取得で開始した読み取りトランザクションはワーカーの書き込みを妨げないよう終了する
+    db.rollback()
+    shards = shard_item_codes(item_codes, shard_count or workers)
+    logger.info("Allocating %d item codes in %d shards with %d workers (strategy: %s)", len(item_codes), len(shards), workers, strategy)
+
+    allocated = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(allocate_shard, database_url, strategy, shard, chunk_size, time_slice, commit_orders, commit_seconds) for shard in shards]
+        for future in futures:
+            allocated += future.result()
+
+    # 割当APIのロットキャッシュはワーカーによる在庫の変更を含まないため破棄する
+    for item_code in item_codes:
+        lot_cache.invalidate(item_code)
+    logger.info("Parallel inventory allocation completed")
+    return allocated
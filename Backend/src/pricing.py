@@ -0,0 +1,143 @@
+"""
+平均系の割り当て戦略（AVERAGE / TOTAL_AVERAGE / MOVING_AVERAGE）のNumPyカーネル
+
+1商品分の在庫をID順の数量配列・単価配列に展開し、同じ商品の全注文について
+累積引当（cumsum + searchsorted）・加重平均単価・移動平均単価をまとめて計算する。
+NumPyがインストールされていない場合はHAS_NUMPYがFalseとなり、
+allocation.py の各戦略関数は従来のPython実装で計算する。
+NumPy本体はカーネルの初回使用時に読み込む（APIのコールドスタートでは読み込まない）。
+"""
+import importlib.util
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None  # NumPyは任意の依存関係
+
+class _LazyNumPy:
+    """
+    属性の初回参照時にNumPyを読み込み、モジュール変数 np を置き換えるプロキシ
+    """
+
+    def __getattr__(self, name):
+        global np
+        import numpy
+        np = numpy
+        return getattr(numpy, name)
+
+np = _LazyNumPy() if HAS_NUMPY else None
+
+def is_supported(lot_quantities: list[int], lot_prices: list[float], demands: list[int]) -> bool:
+    """
+    NumPyカーネルで計算できるかどうかを判定する関数
+    :param lot_quantities: 在庫数量のリスト（ID順）
+    :param lot_prices: 在庫単価のリスト（ID順）
+    :param demands: 注文数量のリスト（処理順）
+    :return: NumPyが利用可能で、在庫が1件以上あり、数量と単価がすべて有効な場合にTrue
+    """
+    return (
+        HAS_NUMPY
+        and len(lot_quantities) > 0
+        and len(demands) > 0
+        and all(quantity is not None and quantity >= 0 for quantity in lot_quantities)
+        and all(price is not None for price in lot_prices)
+        and all(demand is not None and demand > 0 for demand in demands)
+    )
+
+def consume(quantities, demands):
+    """
+    在庫を先頭から順に引き当てた場合の累積引当を計算する関数
+    :param quantities: 在庫数量の配列（ID順）
+    :param demands: 注文数量の配列（処理順）
+    :return: (各注文の処理前の累積引当数量, 各注文の引当数量, 全注文処理後の在庫数量)
+
+    - 数式:
+      - 処理後累積引当 = min(注文数量の累積和, 在庫総数量)
+      - 在庫残数量 = 在庫数量 - clip(最終累積引当 - 前ロットまでの累積在庫数量, 0, 在庫数量)
+    """
+    cumulative_quantities = np.cumsum(quantities)
+    after = np.minimum(np.cumsum(demands), cumulative_quantities[-1])
+    before = np.concatenate(([0], after[:-1]))
+    previous_quantities = cumulative_quantities - quantities
+    remaining = quantities - np.clip(after[-1] - previous_quantities, 0, quantities)
+    return before, after - before, remaining
+
+def _remaining_average_prices(quantities, unit_prices, before):
+    """
+    各注文の処理時点で残っている在庫の加重平均単価を計算する関数
+    :param quantities: 在庫数量の配列（ID順）
+    :param unit_prices: 在庫単価の配列（ID順）
+    :param before: 各注文の処理前の累積引当数量
+    :return: 各注文の処理時点の平均単価（残数量が0の場合は0）
+    """
+    cumulative_quantities = np.concatenate(([0], np.cumsum(quantities)))
+    cumulative_values = np.concatenate(([0.0], np.cumsum(quantities * unit_prices)))
+    padded_prices = np.concatenate((unit_prices, [0.0]))
+
+    # 引当済み数量に対応する引当済み金額（途中のロットは按分）
+    lot_index = np.searchsorted(cumulative_quantities[1:], before, side="right")
+    consumed_values = cumulative_values[lot_index] + (before - cumulative_quantities[lot_index]) * padded_prices[lot_index]
+
+    remaining_quantities = cumulative_quantities[-1] - before
+    remaining_values = cumulative_values[-1] - consumed_values
+    average_prices = np.zeros(len(before), dtype=np.float64)
+    np.divide(remaining_values, remaining_quantities, out=average_prices, where=remaining_quantities > 0)
+    return average_prices
+
+def average_prices(lot_quantities: list[int], lot_prices: list[float], demands: list[int]):
+    """
+    AVERAGE戦略の引当価格を計算する関数
+    :return: (各注文の引当価格のリスト, 在庫残数量のリスト)
+
+    - 数式:
+      - 引当価格 = 引当数量 × 処理時点の在庫平均単価
+    """
+    quantities, unit_prices, demands = _as_arrays(lot_quantities, lot_prices, demands)
+    before, allocated, remaining = consume(quantities, demands)
+    prices = allocated * _remaining_average_prices(quantities, unit_prices, before)
+    return prices.tolist(), remaining.tolist()
+
+def total_average_prices(lot_quantities: list[int], lot_prices: list[float], demands: list[int]):
+    """
+    TOTAL_AVERAGE戦略の引当価格を計算する関数
+    :return: (各注文の引当価格のリスト, 在庫残数量のリスト)
+
+    - 数式:
+      - 引当価格 = 引当数量 × 処理時点の在庫全体平均単価
+    """
+    quantities, unit_prices, demands = _as_arrays(lot_quantities, lot_prices, demands)
+    before, allocated, remaining = consume(quantities, demands)
+    prices = allocated * _remaining_average_prices(quantities, unit_prices, before)
+    return prices.tolist(), remaining.tolist()
+
+def moving_average_prices(lot_quantities: list[int], lot_prices: list[float], demands: list[int], window_size: int = 3):
+    """
+    MOVING_AVERAGE戦略の引当価格を計算する関数
+    :return: (各注文の引当価格のリスト, 在庫残数量のリスト)
+
+    - 数式:
+      - 最終ロット = 累積在庫数量が (処理前累積引当 + 注文数量) に達する最初のロット（達しない場合は最後のロット）
+      - 移動平均単価 = 最終ロットまでの直近ウィンドウサイズ件の在庫単価の平均
+      - 引当価格 = 引当数量 × 移動平均単価
+    """
+    quantities, unit_prices, demands = _as_arrays(lot_quantities, lot_prices, demands)
+    before, allocated, remaining = consume(quantities, demands)
+
+    last_lot = np.searchsorted(np.cumsum(quantities), before + demands, side="left")
+    last_lot = np.minimum(last_lot, len(quantities) - 1)
+    first_lot = np.maximum(last_lot - (window_size - 1), 0)
+
+    # ウィンドウ内の単価を古い順に加算する（Python実装と同じ加算順序）
+    window_sums = np.zeros(len(demands), dtype=np.float64)
+    for offset in range(window_size - 1, -1, -1):
+        lot_index = last_lot - offset
+        window_sums += np.where(lot_index >= first_lot, unit_prices[np.maximum(lot_index, 0)], 0.0)
+    prices = allocated * (window_sums / (last_lot - first_lot + 1))
+    return prices.tolist(), remaining.tolist()
+
+def _as_arrays(lot_quantities, lot_prices, demands):
+    """
+    入力リストを連続したNumPy配列に変換する関数
+    """
+    return (
+        np.asarray(lot_quantities, dtype=np.int64),
+        np.asarray(lot_prices, dtype=np.float64),
+        np.asarray(demands, dtype=np.int64),
+    )
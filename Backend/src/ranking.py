@@ -0,0 +1,85 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import date
+
+# 一括割当の順位付け（RANKED戦略）の計算
+# 1商品分の注文と在庫ロットに順位を付け、上位の注文から上位の在庫を引き当てる（商品をまたぐ制約は扱わない）。
+# - 注文の順位: 緊急度の階級（scheduler.urgency_ranks。0が最も緊急）、数量の少ない順、処理順
+#   （緊急度の高い階級を優先し、同じ階級の中では全量を引き当てられる注文数を増やす）
+# - 在庫の順位: 費用（単価と入荷からの経過日数）の低い順、ID順
+
+RANKING_TIME_BUDGET = float(os.environ.get("RANKING_TIME_BUDGET", "300"))  # 1回の一括割当で順位付けに使う秒数
+RANKING_AGE_WEIGHT = float(os.environ.get("RANKING_AGE_WEIGHT", "0.01"))  # 入荷からの経過日数1日あたりの費用の割引
+
+def lot_costs(lots: list, today: date = None, age_weight: float = None) -> list[float]:
+    """
+    在庫ロットの1単位あたりの費用を計算する関数
+    :param lots: 在庫ロットのリスト（unit_price・receipt_date 属性を持つ）
+    :param today: 基準日（省略時は今日）
+    :param age_weight: 経過日数1日あたりの費用の割引（省略時は環境変数 RANKING_AGE_WEIGHT）
+    :return: 費用のリスト
+
+    - 数式:
+      - 費用 = 単価 - 経過日数の重み × 入荷からの経過日数（入荷日が未設定の場合は0日）
+    """
+    today = today or date.today()
+    age_weight = RANKING_AGE_WEIGHT if age_weight is None else age_weight
+    return [
+        lot.unit_price - age_weight * ((today - lot.receipt_date).days if lot.receipt_date is not None else 0)
+        for lot in lots
+    ]
+
+def rank_assignments(demands: list[int], supplies: list[int], costs: list[float], ranks: list[int] = None) -> list[tuple[int, int, int]]:
+    """
+    注文を階級順・数量の少ない順に、在庫を費用の低い順に並べて引き当てる関数
+    :param demands: 注文数量のリスト
+    :param supplies: 在庫数量のリスト
+    :param costs: 在庫の費用のリスト
+    :param ranks: 注文の緊急度の階級のリスト（省略時はすべて同じ階級）
+    :return: (注文の位置, 在庫の位置, 引当数量) のリスト（注文の位置順）
+    """
+    ranks = ranks or [0] * len(demands)
+    lot_ranks = sorted((index for index, supply in enumerate(supplies) if supply > 0), key=lambda index: (costs[index], index))
+    remaining = list(supplies)
+    assignments = []
+    cursor = 0
+    for order_index in sorted(range(len(demands)), key=lambda index: (ranks[index], demands[index], index)):
+        need = demands[order_index]
+        while need > 0 and cursor < len(lot_ranks):
+            lot_index = lot_ranks[cursor]
+            quantity = min(need, remaining[lot_index])
+            assignments.append((order_index, lot_index, quantity))
+            remaining[lot_index] -= quantity
+            need -= quantity
+            if remaining[lot_index] == 0:
+                cursor += 1
+        if cursor == len(lot_ranks):
+            break
+    assignments.sort()
+    return assignments
+
+# 実行中の一括割当の順位付けの期限（time.monotonic の値。一括割当の外ではNone）
+_deadline = None
+
+@contextmanager
+def time_budget(seconds: float = None):
+    """
+    一括割当1回分の順位付けの期限を設定する（AllocationStrategy.run_scope）
+    :param seconds: 順位付けに使う秒数（省略時は環境変数 RANKING_TIME_BUDGET）
+
+    期限を過ぎた後の商品は順位付けせず、注文ごとの割り当て（FIFO）で割り当てる。
+    """
+    global _deadline
+    previous = _deadline
+    _deadline = time.monotonic() + (RANKING_TIME_BUDGET if seconds is None else seconds)
+    try:
+        yield
+    finally:
+        _deadline = previous
+
+def budget_exhausted() -> bool:
+    """
+    順位付けの期限を過ぎたかどうかを返す関数（期限の設定がない場合はFalse）
+    """
+    return _deadline is not None and time.monotonic() > _deadline
@@ -0,0 +1,106 @@
+import csv
+import io
+import logging
+import os
+from datetime import date
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import AllocationResult
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 1回のINSERT（またはCOPY）でまとめて書き込む行数
+DEFAULT_CHUNK_SIZE = int(os.environ.get("ALLOCATION_RESULT_CHUNK_SIZE", "1000"))
+
+class AllocationResultWriter:
+    """
+    割り当て結果をバッファしてまとめて書き込むライタ
+
+    ORMオブジェクトを生成せずにタプルのままバッファし、チャンクサイズに達するごとに
+    SQLAlchemy Coreの複数行INSERT（PostgreSQLではCOPY）で書き込む。
+    書き込みはセッションと同じトランザクション内で行われるため、コミットは呼び出し側で行う。
+    """
+
+    columns = ("order_id", "item_code", "allocated_quantity", "allocated_price", "allocation_date")
+
+    def __init__(self, db: Session, chunk_size: int = None, use_copy: bool = None, allocation_date: date = None):
+        """
+        :param db: データベースセッション
+        :param chunk_size: 1回の書き込み行数（省略時は環境変数ALLOCATION_RESULT_CHUNK_SIZE）
+        :param use_copy: COPYを使用するかどうか（省略時はPostgreSQLの場合のみ使用）
+        :param allocation_date: 割当日（省略時は今日。ライタで書き込むすべての割り当て結果に設定する）
+        """
+        self.db = db
+        self.chunk_size = chunk_size if chunk_size is not None else DEFAULT_CHUNK_SIZE
+        if self.chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive: {self.chunk_size}")
+        if use_copy is None:
+            use_copy = db.get_bind().dialect.name == "postgresql"
+        self.use_copy = use_copy
+        self.allocation_date = allocation_date or date.today()
+        self.buffer = []
+        self.written = 0
+
+    def add(self, order_id: int, allocated_quantity: int, allocated_price: float, item_code: str = None):
+        """
+        割り当て結果を1行バッファに追加する
+        :param order_id: 注文ID
+        :param allocated_quantity: 割り当てた数量
+        :param allocated_price: 割り当てた価格
+        :param item_code: 商品コード
+        """
+        self.buffer.append((order_id, item_code, allocated_quantity, allocated_price, self.allocation_date))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        バッファ内の割り当て結果を書き込む
+        """
+        if not self.buffer:
+            return
+        rows = self.buffer
+        self.buffer = []
+        with metrics.phase("write_results"):
+            if self.use_copy:
+                self._copy(rows)
+            else:
+                self._insert(rows)
+        self.written += len(rows)
+        logger.debug("Flushed %d allocation results (%d total)", len(rows), self.written)
+
+    def discard(self):
+        """
+        バッファ内の未書き込みの割り当て結果を破棄する（セーブポイントまでロールバックした場合に使用）
+        """
+        self.buffer = []
+
+    def _insert(self, rows: list[tuple]):
+        """
+        複数行INSERTで書き込む
+        """
+        values = [dict(zip(self.columns, row)) for row in rows]
+        self.db.execute(insert(AllocationResult.__table__).values(values))
+
+    def _copy(self, rows: list[tuple]):
+        """
+        PostgreSQLのCOPY FROM STDINで書き込む
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = AllocationResult.__tablename__
+        statement = f"COPY {table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)"
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(statement, buffer)
+        finally:
+            cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
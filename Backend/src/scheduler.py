@@ -0,0 +1,88 @@
+import heapq
+import math
+import os
+from datetime import date
+
+# 一括割当の注文の処理順（スケジューラ）
+# - 商品内の注文は優先度の高い順、同じ優先度は納期の早い順（納期のない注文は後）、注文ID順に割り当てる。
+# - 商品は最も緊急度の高い注文の順に処理する（区切りコミットでは商品コード順に取得した区切り内で緊急度順に処理する）。時間枠（ALLOCATION_TIME_SLICE）を設定した一括割当は
+#   商品の区切りで中断してコミットし、次回の実行で残りの商品を処理する（次回は新しく登録された注文を含めて
+#   緊急度順に並べ直すため、優先度の高い注文は時間枠1回分の待ち時間で割り当てられる）。
+# - 顧客ごとの割当上限（ALLOCATION_FAIR_SHARE）を設定した場合、在庫不足の商品では1顧客の注文数量の合計が
+#   在庫の一定割合を超える注文を後回しにする（他の顧客の注文を割り当てた後の残りの在庫で割り当てる）。
+
+ALLOCATION_FAIR_SHARE = float(os.environ.get("ALLOCATION_FAIR_SHARE", "0"))  # 1顧客に割り当てる在庫の割合の上限（0は無効）
+ALLOCATION_TIME_SLICE = float(os.environ.get("ALLOCATION_TIME_SLICE", "0"))  # 一括割当1回の処理時間の目安（秒。0は無制限）
+
+def urgency_key(order) -> tuple:
+    """
+    注文の緊急度の並べ替えキーを返す関数（小さいほど先に割り当てる）
+    :param order: 注文（priority・due_date・id 属性を持つ）
+    :return: (優先度の符号反転, 納期, 注文ID)
+    """
+    return (-(order.priority or 0), order.due_date or date.max, order.id)
+
+def order_items(orders_by_item: dict[str, list]) -> list[str]:
+    """
+    商品コードを最も緊急度の高い注文の順に並べる関数（優先度・納期が同じ商品は商品コード順）
+    :param orders_by_item: 商品コードをキー、注文のリストを値とする辞書
+    :return: 商品コードのリスト
+    """
+    heap = [(min(urgency_key(order)[:2] for order in orders), item_code) for item_code, orders in orders_by_item.items()]
+    heapq.heapify(heap)
+    return [heapq.heappop(heap)[1] for _ in range(len(heap))]
+
+def schedule(orders: list, available: int = None, fair_share: float = None) -> list:
+    """
+    1商品分の注文を割り当てる順に並べる関数
+    :param orders: 注文のリスト（同一商品）
+    :param available: 在庫の残数量の合計（省略時は顧客ごとの割当上限を適用しない）
+    :param fair_share: 1顧客に割り当てる在庫の割合の上限（省略時は環境変数 ALLOCATION_FAIR_SHARE）
+    :return: 注文のリスト（緊急度順。上限を超えた注文は末尾に緊急度順）
+
+    - 数式:
+      - 顧客ごとの上限 = ceil(在庫の残数量の合計 × 割合)
+    上限は在庫不足（注文数量の合計 > 在庫の残数量の合計）の場合のみ適用し、顧客IDのない注文には適用しない。
+    """
+    fair_share = ALLOCATION_FAIR_SHARE if fair_share is None else fair_share
+    heap = [(urgency_key(order), position) for position, order in enumerate(orders)]
+    heapq.heapify(heap)
+    if not fair_share or available is None or sum(order.quantity for order in orders) <= available:
+        return [orders[heapq.heappop(heap)[1]] for _ in range(len(heap))]
+
+    cap = math.ceil(available * fair_share)
+    scheduled, deferred = [], []
+    demanded = {}
+    while heap:
+        order = orders[heapq.heappop(heap)[1]]
+        customer_id = getattr(order, "customer_id", None)
+        if customer_id is None:
+            scheduled.append(order)
+            continue
+        total = demanded.get(customer_id, 0) + order.quantity
+        if total > cap:
+            deferred.append(order)
+        else:
+            demanded[customer_id] = total
+            scheduled.append(order)
+    return scheduled + deferred
+
+def urgency_ranks(orders: list) -> list[int]:
+    """
+    処理順に並べた注文の緊急度の階級を返す関数（RANKED戦略の注文の順位付けに使用）
+    :param orders: schedule で並べた注文のリスト
+    :return: 注文ごとの階級（0が最も緊急。優先度・納期が同じ注文は同じ階級）
+
+    顧客ごとの割当上限で後回しにした注文（緊急度の並べ替えキーが前の注文より小さくなる位置以降）は、
+    上限内のすべての注文より後の階級とする。
+    """
+    ranks = []
+    rank = 0
+    previous = None
+    for order in orders:
+        key = urgency_key(order)
+        if previous is not None and (key[:2] != previous[:2] or key < previous):
+            rank += 1
+        ranks.append(rank)
+        previous = key
+    return ranks
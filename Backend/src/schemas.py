@@ -1,6 +1,6 @@
 from pydantic import BaseModel, validator
 from datetime import datetime, date
-from typing import List
+from typing import List, Optional
 
 class TokenPayload(BaseModel):
     sub: str
@@ -18,6 +18,15 @@ class TokenPayload(BaseModel):
 class OrderRequest(BaseModel):
     item_code: str  # 商品コード
     quantity: int  # 数量
+    priority: int = 0  # 優先度（大きいほど先に割り当てる）
+    due_date: Optional[str] = None  # 納期
+    customer_id: Optional[str] = None  # 顧客ID
+
+    @validator("due_date", pre=True)
+    def parse_due_date(cls, value):
+        if value is None:
+            return None
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
 
 class InventoryRequest(BaseModel):
     item_code: str  # 商品コード
@@ -40,10 +49,15 @@ class AllocationRequest(BaseModel):
         return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
 
 class OrderResponse(BaseModel):
-    order_id: int  # 注文ID
+    id: int  # 注文ID
     item_code: str  # 商品コード
     quantity: int  # 数量
     allocated: bool  # 割当済みかどうかを示すフラグ
+    allocated_quantity: int = 0  # 引当済みの数量
+    backordered: bool = False  # バックオーダー（入荷待ち）かどうか
+    priority: int = 0  # 優先度
+    due_date: Optional[date] = None  # 納期
+    customer_id: Optional[str] = None  # 顧客ID
 
     class Config:
         orm_mode = True
@@ -52,7 +66,7 @@ class InventoryResponse(BaseModel):
     id: int  # 在庫ID
     item_code: str  # 商品コード
     quantity: int  # 数量
-    receipt_date: str  # 入荷日
+    receipt_date: Optional[date] = None  # 入荷日
     unit_price: float  # 単価
     created_at: datetime  # 作成日時
 
@@ -68,9 +82,19 @@ class AllocationResultResponse(BaseModel):
     item_code: str  # 商品コード
     allocated_quantity: int  # 割当数量
     allocated_price: float  # 割当価格
-    allocation_date: str  # 割当日
+    allocation_date: Optional[date] = None  # 割当日
 
     class Config:
         orm_mode = True
 
 
+
+class BulkRowError(BaseModel):
+    index: int  # 入力の行番号（0始まり）
+    errors: List[str]  # 検証エラーの内容
+
+class BulkResponse(BaseModel):
+    ids: List[Optional[int]]  # 入力の行ごとの登録ID（エラーの行はnull）
+    errors: List[BulkRowError]  # エラーの行
+    inserted: int  # 登録件数
+    rows_per_second: float  # 検証と登録の処理速度（行/秒）
@@ -0,0 +1,103 @@
+import logging
+from contextlib import nullcontext
+from importlib.metadata import entry_points
+
+logger = logging.getLogger(__name__)
+
+# 割り当て戦略のレジストリ
+# 各戦略は在庫ロットの並び順（入荷の古い順・新しい順）と在庫集計を参照するかどうかを宣言し、
+# allocate_inventory はその宣言に従って商品ごとに1回だけ在庫を並べ替えて戦略に渡す。
+# 組み込みの戦略は allocation.py で登録する。独自の戦略はエントリーポイント
+# （グループ: inventory_allocation.strategies）に AllocationStrategy のインスタンス、
+# またはそれを返す関数を登録すれば、allocation.py を変更せずに追加できる。
+
+ENTRY_POINT_GROUP = "inventory_allocation.strategies"
+
+ASCENDING = "asc"  # 在庫ID順（入荷の古い順）
+DESCENDING = "desc"  # 在庫IDの逆順（入荷の新しい順）
+
+class AllocationStrategy:
+    """
+    割り当て戦略
+    """
+
+    def __init__(self, name: str, allocate, lot_order: str = ASCENDING, needs_aggregate: bool = False, allocate_item=None, run_scope=None):
+        """
+        :param name: 戦略名（--strategy で指定する名前）
+        :param allocate: 注文1件を割り当てる関数 allocate(db, order, lots, writer, summary)
+        :param lot_order: 戦略に渡す在庫の並び順（ASCENDING / DESCENDING）
+        :param needs_aggregate: 在庫集計を参照して価格を計算するかどうか
+            Trueの場合は allocate に在庫集計を渡し、戦略が引当のたびに集計を更新する。
+            Falseの場合は None を渡し、商品ごとの割り当て後にロットの引当数量から集計をまとめて更新する。
+        :param allocate_item: 商品単位で全注文をまとめて割り当てる関数（任意）
+            allocate_item(db, orders, lots, writer, summary) がFalseを返した場合は注文ごとに allocate を呼び出す。
+        :param run_scope: 一括割当1回分の割り当ての間有効なコンテキストマネージャを返す関数（任意。期限の設定などに使用）
+        """
+        if lot_order not in (ASCENDING, DESCENDING):
+            raise ValueError(f"lot_order must be {ASCENDING!r} or {DESCENDING!r}: {lot_order!r}")
+        self.name = name
+        self.allocate = allocate
+        self.lot_order = lot_order
+        self.needs_aggregate = needs_aggregate
+        self.allocate_item = allocate_item
+        self.run_scope = run_scope or nullcontext
+
+    def __repr__(self):
+        return f"AllocationStrategy({self.name!r}, lot_order={self.lot_order!r}, needs_aggregate={self.needs_aggregate!r})"
+
+# 戦略名をキーとする登録済みの戦略（登録順）
+STRATEGIES: dict[str, AllocationStrategy] = {}
+
+_entry_points_loaded = False
+
+def register_strategy(strategy: AllocationStrategy, replace: bool = False) -> AllocationStrategy:
+    """
+    戦略を登録する関数
+    :param strategy: 戦略
+    :param replace: 同名の戦略を置き換えるかどうか
+    :return: 登録した戦略
+    """
+    if strategy.name in STRATEGIES and not replace:
+        raise ValueError(f"Allocation strategy already registered: {strategy.name}")
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+def load_entry_points():
+    """
+    エントリーポイントに登録された戦略を読み込む関数（初回呼び出し時のみ読み込む）
+
+    読み込めない戦略は警告を出力して無視する（組み込みの戦略は引き続き使用できる）。
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            strategy = entry_point.load()
+            if not isinstance(strategy, AllocationStrategy):
+                strategy = strategy()
+            register_strategy(strategy)
+        except Exception as e:
+            logger.warning("Could not load allocation strategy %s: %s", entry_point.name, e)
+
+def get_strategy(name: str) -> AllocationStrategy:
+    """
+    戦略名から戦略を取得する関数
+    :param name: 戦略名
+    :return: 戦略
+    :raises ValueError: 登録されていない戦略名の場合
+    """
+    if name not in STRATEGIES:
+        load_entry_points()
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy: {name}") from None
+
+def strategy_names() -> list[str]:
+    """
+    登録済みの戦略名を登録順に返す関数（エントリーポイントの戦略を含む）
+    """
+    load_entry_points()
+    return list(STRATEGIES)
@@ -0,0 +1,236 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+sys.path.insert(0, current_dir)
+
+import argparse
+import json
+import logging
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import sqlalchemy
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import AllocationResult
+from allocation import allocate_inventory
+from strategies import strategy_names
+from lot_cache import lot_cache
+from database import Base, get_db
+import synthetic_data
+
+# 割り当て戦略とAPIエンドポイントの所要時間を計測する性能試験
+# 使用例:
+#   python bench_allocation.py --skus 1000 --orders 50000 --skew 1.2 --output current.json
+#   python bench_allocation.py --skus 1000 --orders 50000 --skew 1.2 --compare baseline.json
+# 合成データ（synthetic_data.py）をファイルとインメモリのSQLiteに登録し、
+# 戦略ごとに allocate_inventory を、エンドポイントごとに TestClient 経由のリクエストを計測して結果をJSONで出力する。
+# 同じ引数・シードでは同じデータとなるため、別のコミットで出力したJSONと --compare で比較できる。
+
+DATABASES = ("file", "memory")
+
+def create_bench_engine(kind: str, directory: str, name: str):
+    """
+    試験用のデータベースエンジンを作成する
+    （インメモリのSQLiteはAPIのスレッドプールから同じデータベースを参照できるよう StaticPool を使用する）
+    """
+    if kind == "memory":
+        return create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    return create_engine(f"sqlite:///{os.path.join(directory, name)}.db", connect_args={"check_same_thread": False})
+
+def prepare(kind: str, directory: str, name: str, data: tuple[list[dict], list[dict]]):
+    """
+    試験データを登録したデータベースエンジンとセッションファクトリを返す
+    """
+    engine = create_bench_engine(kind, directory, name)
+    Base.metadata.create_all(bind=engine)
+    synthetic_data.load(engine, *data)
+    lot_cache.invalidate()
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def bench_strategy(kind: str, directory: str, strategy: str, data, repeat: int) -> dict:
+    """
+    1つの戦略の一括割り当ての所要時間を計測する（repeat 回の最小値と中央値）
+    """
+    timings = []
+    for run in range(repeat):
+        engine, SessionLocal = prepare(kind, directory, f"{strategy}_{run}", data)
+        db = SessionLocal()
+        start = time.perf_counter()
+        allocate_inventory(db, strategy)
+        timings.append(time.perf_counter() - start)
+        results = db.scalar(select(func.count()).select_from(AllocationResult))
+        db.close()
+        engine.dispose()
+    orders = len(data[0])
+    return {
+        "database": kind,
+        "strategy": strategy,
+        "orders": orders,
+        "allocation_results": results,
+        "elapsed_min": min(timings),
+        "elapsed_median": statistics.median(timings),
+        "orders_per_second": orders / min(timings),
+    }
+
+def endpoint_requests(data, requests: int) -> list[tuple[str, str, callable]]:
+    """
+    計測するエンドポイントと、i 番目のリクエストの（URL, 引数）を返す関数の組を返す
+    """
+    order_rows, _ = data
+    item_codes = sorted({row["item_code"] for row in order_rows})
+
+    def allocate(i):
+        order = order_rows[i % len(order_rows)]
+        return f"/orders/{i % len(order_rows) + 1}/allocate", {"json": {"order_id": i % len(order_rows) + 1, "item_code": order["item_code"], "quantity": order["quantity"], "allocation_date": "2024-06-01"}}
+
+    bulk_body = "".join(json.dumps({"item_code": item_codes[i % len(item_codes)], "quantity": 1}) + "\n" for i in range(1000))
+    return [
+        ("POST /orders", "post", lambda i: ("/orders", {"json": {"item_code": item_codes[i % len(item_codes)], "quantity": 1}})),
+        ("POST /inventories", "post", lambda i: ("/inventories", {"json": {"item_code": item_codes[i % len(item_codes)], "quantity": 100, "receipt_date": "2024-06-01", "unit_price": 10.0}})),
+        ("POST /orders/{id}/allocate", "post", allocate),
+        ("GET /orders", "get", lambda i: ("/orders", {"params": {"fields": "id,item_code,quantity,allocated", "limit": 100, "after_id": i * 100 % len(order_rows)}})),
+        ("GET /inventories", "get", lambda i: ("/inventories", {"params": {"fields": "id,item_code,quantity,unit_price", "item_code": item_codes[i % len(item_codes)]}})),
+        ("GET /allocation-results", "get", lambda i: ("/allocation-results", {"params": {"fields": "id,order_id,allocated_quantity,allocated_price", "limit": 100}})),
+        ("GET /allocation-results/export", "get", lambda i: ("/allocation-results/export", {"params": {"format": "ndjson"}})),
+        ("POST /orders:bulk", "post", lambda i: ("/orders:bulk", {"content": bulk_body, "headers": {"Content-Type": "application/x-ndjson"}})),
+    ]
+
+def bench_endpoints(kind: str, directory: str, data, requests: int) -> list[dict]:
+    """
+    各エンドポイントを requests 回ずつ呼び出し、1リクエストの所要時間を計測する
+    （ステータスコードが400以上の応答は errors に数える）
+    """
+    from fastapi.testclient import TestClient
+    import app as app_module
+
+    engine, SessionLocal = prepare(kind, directory, "api", data)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # 認証はベンチマークの対象外のため無効化する
+    app_module.authenticate_token = lambda token: "bench"
+    app_module.app.dependency_overrides[get_db] = override_get_db
+    results = []
+    # 応答の検証エラー等はリクエストの失敗（errors）として数え、計測は継続する
+    with TestClient(app_module.app, headers={"Authorization": "Bearer bench"}, raise_server_exceptions=False) as client:
+        for name, method, build in endpoint_requests(data, requests):
+            timings, errors = [], 0
+            for i in range(requests):
+                url, kwargs = build(i)
+                start = time.perf_counter()
+                response = getattr(client, method)(url, **kwargs)
+                timings.append(time.perf_counter() - start)
+                errors += response.status_code >= 400
+            timings.sort()
+            results.append({
+                "database": kind,
+                "endpoint": name,
+                "requests": requests,
+                "errors": errors,
+                "mean_ms": statistics.mean(timings) * 1000,
+                "p50_ms": timings[len(timings) // 2] * 1000,
+                "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+                "requests_per_second": requests / sum(timings),
+            })
+    app_module.app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+    return results
+
+def git_commit() -> str:
+    """
+    計測したコミットのハッシュを返す（gitが使用できない場合はNone）
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=current_dir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: dict, baseline: dict):
+    """
+    基準の結果に対する所要時間の比率を出力する（1より大きい場合は遅くなっている）
+    """
+    def index(report, section, key, metric):
+        return {(row["database"], row[key]): row[metric] for row in report.get(section, [])}
+
+    print(f"\ncompared with {baseline['meta'].get('commit')} (ratio > 1.00 is slower)")
+    for section, key, metric in (("allocation", "strategy", "elapsed_min"), ("api", "endpoint", "p50_ms")):
+        before = index(baseline, section, key, metric)
+        for name, value in index(current, section, key, metric).items():
+            if name in before and before[name] > 0:
+                print(f"  {section:<10} {name[0]:<6} {name[1]:<30} {metric:<12} {before[name]:10.4f} -> {value:10.4f}  x{value / before[name]:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="割り当て戦略とAPIの性能試験")
+    parser.add_argument("--skus", type=int, default=1000, help="商品数")
+    parser.add_argument("--lots-per-sku", type=int, default=10, help="商品ごとの在庫ロット数")
+    parser.add_argument("--orders", type=int, default=20000, help="注文数")
+    parser.add_argument("--skew", type=float, default=1.0, help="商品ごとの注文数のZipf分布の偏り（0で一様）")
+    parser.add_argument("--order-size", choices=synthetic_data.ORDER_SIZE_DISTRIBUTIONS, default="geometric", help="注文数量の分布")
+    parser.add_argument("--order-size-mean", type=float, default=5.0)
+    parser.add_argument("--order-size-max", type=int, default=100)
+    parser.add_argument("--coverage", type=float, default=1.0, help="需要量に対する在庫量の比率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy", action="append", help="計測する戦略（複数指定可。省略時は全戦略）")
+    parser.add_argument("--database", choices=DATABASES, action="append", help="計測するデータベース（複数指定可。省略時は両方）")
+    parser.add_argument("--repeat", type=int, default=3, help="戦略ごとの計測回数")
+    parser.add_argument("--api-requests", type=int, default=200, help="エンドポイントごとのリクエスト数（0でAPIを計測しない）")
+    parser.add_argument("--output", help="結果を出力するJSONファイル（省略時は標準出力）")
+    parser.add_argument("--compare", help="比較する基準の結果（JSONファイル）")
+    args = parser.parse_args()
+
+    # 注文ごとのINFOログが所要時間の大半を占めないよう抑制する
+    logging.disable(logging.INFO)
+    data = synthetic_data.generate(
+        skus=args.skus, lots_per_sku=args.lots_per_sku, orders=args.orders, skew=args.skew,
+        order_size_distribution=args.order_size, order_size_mean=args.order_size_mean, order_size_max=args.order_size_max,
+        coverage=args.coverage, seed=args.seed,
+    )
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "allocation": [],
+        "api": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.database or DATABASES:
+            for strategy in args.strategy or strategy_names():
+                result = bench_strategy(kind, directory, strategy, data, args.repeat)
+                report["allocation"].append(result)
+                print(f"{kind:<6} {strategy:<15} elapsed={result['elapsed_min']:8.3f}s orders/s={result['orders_per_second']:10.1f}", file=sys.stderr)
+            if args.api_requests > 0:
+                for result in bench_endpoints(kind, directory, data, args.api_requests):
+                    report["api"].append(result)
+                    print(f"{kind:<6} {result['endpoint']:<30} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms errors={result['errors']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from models import Order, Inventory
+from lot_cache import lot_cache
+from async_database import create_engine_for_url, get_async_db
+from database import Base, get_db
+import app as app_sync
+import app_async
+
+# 同期版（app.py）と非同期版（app_async.py）のAPIの秒間リクエスト数を同時接続数ごとに比較する性能試験
+# 使用例: python bench_async_api.py --requests 2000 --concurrency 1 10 50
+# 認証はベンチマークの対象外のため無効化する。
+
+def create_database(path: str, orders: int):
+    """
+    ファイルのSQLiteデータベースに試験データを登録する
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [{"id": i, "item_code": f"ITEM{i % 100}", "quantity": 1, "allocated": False} for i in range(1, orders + 1)])
+        conn.execute(insert(Inventory), [{"item_code": f"ITEM{i}", "quantity": orders, "unit_price": 10.0} for i in range(100)])
+    engine.dispose()
+
+def configure(path: str):
+    """
+    同期版・非同期版のアプリケーションを試験用データベースに接続する
+    """
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    async_engine = create_engine_for_url(f"sqlite+aiosqlite:///{path}")
+    AsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def override_get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app_sync.app.dependency_overrides[get_db] = override_get_db
+    app_async.app.dependency_overrides[get_async_db] = override_get_async_db
+    return sync_engine, async_engine
+
+def disable_authentication():
+    """
+    認証ミドルウェアと認証の依存関係を無効化する
+    """
+    # ミドルウェアはモジュールの authenticate_token を呼び出し、結果を get_token_payload が参照する
+    app_sync.authenticate_token = lambda token: "bench"
+
+async def run(app, order_ids: list[int], concurrency: int) -> float:
+    """
+    割当APIと一覧APIを同時接続数 concurrency で呼び出し、秒間リクエスト数を返す
+    """
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Authorization": "Bearer bench"}) as client:
+        async def request(order_id):
+            async with semaphore:
+                body = {"order_id": order_id, "item_code": f"ITEM{order_id % 100}", "quantity": 1, "allocation_date": "2024-02-01"}
+                response = await client.post(f"/orders/{order_id}/allocate", json=body)
+                response.raise_for_status()
+                response = await client.get("/inventories")
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(order_id) for order_id in order_ids))
+        return len(order_ids) * 2 / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="同期版・非同期版APIの性能試験")
+    parser.add_argument("--requests", type=int, default=1000, help="割り当てる注文数（1注文につき2リクエスト）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    disable_authentication()
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in args.concurrency:
+            for name, app in (("sync", app_sync.app), ("async", app_async.app)):
+                path = os.path.join(directory, f"bench_{name}_{concurrency}.db")
+                create_database(path, args.requests)
+                sync_engine, async_engine = configure(path)
+                lot_cache.invalidate()
+                rps = asyncio.run(run(app, list(range(1, args.requests + 1)), concurrency))
+                print(f"app={name:<5} concurrency={concurrency:<4} requests_per_second={rps:9.1f}")
+                sync_engine.dispose()
+                asyncio.run(async_engine.dispose())
+
+if __name__ == "__main__":
+    main()
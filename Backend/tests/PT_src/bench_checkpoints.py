@@ -0,0 +1,78 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+sys.path.insert(0, current_dir)
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from allocation import allocate_inventory
+from database import Base
+from lot_cache import lot_cache
+import synthetic_data
+
+# 一括割当の単一トランザクションと区切りコミット（チェックポイント付き）を比較する性能試験
+# 使用例: python bench_checkpoints.py --orders 200000 --commit-orders 10000 20000
+# 区切りの注文数ごとに同じデータを登録した一時ファイルのSQLiteで一括割当を実行し、
+# 所要時間・コミット数・Pythonのメモリ使用量のピーク（tracemalloc）を出力する（0は単一トランザクション）。
+
+def run(commit_orders: int, strategy: str, directory: str, data) -> dict:
+    """
+    1つの区切りの注文数で一括割当を実行し、結果の指標を返す
+    """
+    engine = create_engine(f"sqlite:///{os.path.join(directory, str(commit_orders))}.db")
+    Base.metadata.create_all(bind=engine)
+    synthetic_data.load(engine, *data)
+    lot_cache.invalidate()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        summary = allocate_inventory(db, strategy, commit_orders=commit_orders, commit_seconds=0)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+        engine.dispose()
+    return {
+        "commit_orders": commit_orders,
+        "elapsed_seconds": round(elapsed, 3),
+        "commits": summary["commits"],
+        "orders": summary["orders"],
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="一括割当の単一トランザクションと区切りコミットの比較")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--lots-per-sku", type=int, default=10)
+    parser.add_argument("--coverage", type=float, default=1.2, help="需要量に対する在庫量の比率")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--strategy", default="FIFO")
+    parser.add_argument("--commit-orders", type=int, nargs="+", default=[0, 10000], help="区切りの注文数（0は単一トランザクション）")
+    parser.add_argument("--output", help="結果をJSONで出力するファイル")
+    args = parser.parse_args()
+
+    data = synthetic_data.generate(skus=args.skus, lots_per_sku=args.lots_per_sku, orders=args.orders, coverage=args.coverage, seed=args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for commit_orders in args.commit_orders:
+            result = run(commit_orders, args.strategy, directory, data)
+            results.append(result)
+            print(f"commit_orders={commit_orders:<8} elapsed={result['elapsed_seconds']:8.3f}s commits={result['commits']:<5} "
+                  f"orders={result['orders']} peak_memory={result['peak_memory_mb']:.1f}MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
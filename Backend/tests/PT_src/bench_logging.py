@@ -0,0 +1,108 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+sys.path.insert(0, current_dir)
+
+import argparse
+import logging
+import tempfile
+import time
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from allocation import allocate_inventory
+from database import Base
+import log_config
+import synthetic_data
+
+# 注文ごとのログ出力の方式による所要時間の差を計測する性能試験
+# 使用例: python bench_logging.py --orders 200000
+# 1. ログ出力のみのループ（従来の f-string + INFO と、レベル判定・遅延フォーマット・キュー経由の出力の比較）
+# 2. allocate_inventory 全体（INFOの要約のみ / DEBUGの注文ごとの行を直接出力 / DEBUGの注文ごとの行をキュー経由で出力）
+# ログはすべて一時ファイルに出力する。
+
+def file_handler(path: str) -> logging.Handler:
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(log_config.LOG_FORMAT))
+    return handler
+
+def bench_loop(mode: str, orders: list, path: str) -> float:
+    """
+    注文ごとにログを出力するループの所要時間（秒）を返す
+    """
+    logger = logging.getLogger(f"bench_logging.{mode}")
+    logger.propagate = False
+    target = file_handler(path)
+    handler = log_config.queue_handler(target) if mode.startswith("queue") else target
+    logger.addHandler(handler)
+    # 従来の出力（INFO）と、注文ごとの行をDEBUGに下げてINFOで実行する場合・DEBUGで実行する場合
+    logger.setLevel(logging.INFO if mode in ("fstring_info", "lazy_guarded_info") else logging.WARNING if mode == "fstring_filtered" else logging.DEBUG)
+
+    start = time.perf_counter()
+    if mode in ("fstring_info", "fstring_filtered"):
+        for order in orders:
+            logger.info(f"Processing order {order.id} with item code {order.item_code} and quantity {order.quantity}")
+            logger.info(f"Allocation completed for order {order.id}")
+    else:
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for order in orders:
+            if debug:
+                logger.debug("Processing order %d with item code %s and quantity %d", order.id, order.item_code, order.quantity)
+    elapsed = time.perf_counter() - start
+
+    log_config.flush()
+    logger.removeHandler(handler)
+    target.close()
+    return elapsed
+
+def bench_allocation(mode: str, data, path: str) -> float:
+    """
+    allocate_inventory の所要時間（秒）を返す
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    synthetic_data.load(engine, *data)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    logger = logging.getLogger("allocation")
+    target = file_handler(path)
+    handler = log_config.queue_handler(target) if mode == "debug_queue" else target
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO if mode == "info_summary" else logging.DEBUG)
+
+    start = time.perf_counter()
+    allocate_inventory(db, "FIFO")
+    elapsed = time.perf_counter() - start
+
+    log_config.flush()
+    logger.removeHandler(handler)
+    target.close()
+    db.close()
+    engine.dispose()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="ログ出力の方式の性能試験")
+    parser.add_argument("--orders", type=int, default=200000, help="ログ出力のみのループの注文数")
+    parser.add_argument("--allocation-orders", type=int, default=20000, help="allocate_inventory の注文数（0で計測しない）")
+    parser.add_argument("--skus", type=int, default=500)
+    args = parser.parse_args()
+
+    orders = [SimpleNamespace(id=i, item_code=f"SKU{i % 1000:06d}", quantity=1 + i % 7, allocated_quantity=0) for i in range(args.orders)]
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"per-order logging loop ({args.orders} orders)")
+        for mode in ("fstring_info", "fstring_filtered", "lazy_guarded_info", "direct_debug", "queue_debug"):
+            elapsed = bench_loop(mode, orders, os.path.join(directory, f"{mode}.log"))
+            print(f"  {mode:<18} elapsed={elapsed:8.3f}s per_order={elapsed / args.orders * 1e6:8.2f}us")
+
+        if args.allocation_orders > 0:
+            data = synthetic_data.generate(skus=args.skus, orders=args.allocation_orders)
+            print(f"allocate_inventory FIFO ({args.allocation_orders} orders)")
+            for mode in ("info_summary", "debug_direct", "debug_queue"):
+                elapsed = bench_allocation(mode, data, os.path.join(directory, f"allocation_{mode}.log"))
+                print(f"  {mode:<18} elapsed={elapsed:8.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import argparse
+import json
+import random
+import time
+from lot_cache import LotRecord
+from lot_index import LotIndex, BEST_FIT, FIRST_FIT, linear_select
+
+# ロット選択（SPECIFIC戦略・割当API）の線形走査と残数量の索引（LotIndex）を比較する性能試験
+# 使用例: python bench_lot_index.py --lots 10000 --orders 20000
+# 1商品に --lots 件のロットを作成し、同じ注文列を線形走査・索引でそれぞれ引き当てる。
+# 所要時間に加え、引き当てられた注文数と引当後に残った端数のロット数（在庫の細分化）を出力する。
+
+def make_lots(count: int, rng: random.Random, max_quantity: int) -> list[LotRecord]:
+    return [LotRecord(i + 1, rng.randint(1, max_quantity), 10.0) for i in range(count)]
+
+def run(lots: list[LotRecord], demands: list[int], selection: str, use_index: bool, fragment_threshold: int) -> dict:
+    """
+    注文列を引き当て、所要時間・引当件数・端数のロット数を返す
+    """
+    lots = [LotRecord(lot.id, lot.quantity, lot.unit_price) for lot in lots]
+    started = time.perf_counter()
+    index = LotIndex(lots) if use_index else None
+    filled = 0
+    for demand in demands:
+        lot = index.select(demand, selection) if use_index else linear_select(lots, demand, selection)
+        if lot is None:
+            continue
+        lot.quantity -= demand
+        if use_index:
+            index.update(lot)
+        filled += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "selection": selection,
+        "method": "index" if use_index else "linear",
+        "elapsed_seconds": round(elapsed, 6),
+        "per_order_us": round(elapsed / len(demands) * 1e6, 3),
+        "filled_orders": filled,
+        "fragment_lots": sum(1 for lot in lots if 0 < lot.quantity < fragment_threshold),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="ロット選択の線形走査と索引の比較")
+    parser.add_argument("--lots", type=int, default=10000, help="1商品のロット数")
+    parser.add_argument("--orders", type=int, default=20000, help="注文数")
+    parser.add_argument("--max-lot-quantity", type=int, default=100, help="ロットの最大数量")
+    parser.add_argument("--max-order-quantity", type=int, default=60, help="注文の最大数量")
+    parser.add_argument("--fragment-threshold", type=int, default=5, help="端数とみなす残数量（未満）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="結果をJSONで出力するファイル")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lots = make_lots(args.lots, rng, args.max_lot_quantity)
+    demands = [rng.randint(1, args.max_order_quantity) for _ in range(args.orders)]
+
+    results = []
+    for selection in (FIRST_FIT, BEST_FIT):
+        for use_index in (False, True):
+            result = run(lots, demands, selection, use_index, args.fragment_threshold)
+            results.append(result)
+            print(f"{selection:<10} {result['method']:<7} elapsed={result['elapsed_seconds']:9.4f}s per_order={result['per_order_us']:9.2f}us "
+                  f"filled={result['filled_orders']} fragments={result['fragment_lots']}")
+        linear, indexed = results[-2], results[-1]
+        if indexed["elapsed_seconds"] > 0:
+            print(f"{selection:<10} speedup x{linear['elapsed_seconds'] / indexed['elapsed_seconds']:.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
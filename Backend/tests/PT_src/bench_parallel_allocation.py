@@ -0,0 +1,77 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import argparse
+import logging
+import tempfile
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from models import Order, Inventory
+from allocation import allocate_inventory
+from parallel_allocation import allocate_inventory_parallel
+from database import Base
+
+# 直列実行と並列実行（--workers）の所要時間を比較する性能試験
+# 使用例: python bench_parallel_allocation.py --items 2000 --orders-per-item 50 --workers 1 2 4 8
+
+def create_database(path: str, items: int, orders_per_item: int, lots_per_item: int):
+    """
+    ファイルのSQLiteデータベースに試験データを登録し、データベースURLを返す
+    """
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [
+            {"item_code": f"ITEM{i}", "quantity": 1 + (i + j) % 5, "allocated": False}
+            for i in range(items) for j in range(orders_per_item)
+        ])
+        conn.execute(insert(Inventory), [
+            {"item_code": f"ITEM{i}", "quantity": 10 + (i * j) % 20, "unit_price": 10.0 + (i + j) % 7}
+            for i in range(items) for j in range(lots_per_item)
+        ])
+    engine.dispose()
+    return url
+
+def run(url: str, strategy: str, workers: int) -> float:
+    """
+    割り当てを実行し、所要時間（秒）を返す
+    """
+    engine = create_engine(url)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    start = time.perf_counter()
+    if workers > 1:
+        allocate_inventory_parallel(db, strategy, workers=workers)
+    else:
+        allocate_inventory(db, strategy)
+    elapsed = time.perf_counter() - start
+    db.close()
+    engine.dispose()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="並列割り当ての性能試験")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--orders-per-item", type=int, default=50)
+    parser.add_argument("--lots-per-item", type=int, default=20)
+    parser.add_argument("--strategy", default="FIFO")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    # 注文ごとのINFOログが所要時間の大半を占めないよう抑制する
+    logging.disable(logging.INFO)
+    print(f"cpu_count={os.cpu_count()} items={args.items} orders={args.items * args.orders_per_item} strategy={args.strategy}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            url = create_database(os.path.join(directory, f"bench_{workers}.db"), args.items, args.orders_per_item, args.lots_per_item)
+            elapsed = run(url, args.strategy, workers)
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} elapsed={elapsed:8.3f}s speedup={baseline / elapsed:5.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+sys.path.insert(0, current_dir)
+
+import argparse
+import json
+import tempfile
+import time
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from allocation import allocate_inventory
+from database import Base
+from models import Order, AllocationResult
+from lot_cache import lot_cache
+import synthetic_data
+
+# 注文の処理順に引き当てる一括割当（FIFO）と、商品ごとに注文・在庫を順位付けして引き当てる一括割当（RANKED）を
+# 在庫不足の合成データで比較する性能試験（順位付けで増える全量引当の注文数と、そのための所要時間を測る）
+# 使用例: python bench_ranking.py --orders 100000 --coverage 0.8
+# 戦略ごとに同じデータを登録した一時ファイルのSQLiteで一括割当を実行し、所要時間・全量を引き当てた注文数・
+# 引当数量・引当金額・バックオーダー数を出力する。
+
+def run(strategy: str, directory: str, data) -> dict:
+    """
+    1つの戦略で一括割当を実行し、結果の指標を返す
+    """
+    engine = create_engine(f"sqlite:///{os.path.join(directory, strategy)}.db")
+    Base.metadata.create_all(bind=engine)
+    synthetic_data.load(engine, *data)
+    lot_cache.invalidate()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        started = time.perf_counter()
+        summary = allocate_inventory(db, strategy)
+        elapsed = time.perf_counter() - started
+        filled_quantity, value = db.execute(
+            select(func.coalesce(func.sum(AllocationResult.allocated_quantity), 0), func.coalesce(func.sum(AllocationResult.allocated_price), 0.0))
+        ).one()
+        filled_orders = db.scalar(select(func.count()).select_from(Order).where(Order.allocated == True))
+    finally:
+        db.close()
+        engine.dispose()
+    orders = len(data[0])
+    demand = sum(row["quantity"] for row in data[0])
+    return {
+        "strategy": strategy,
+        "orders": orders,
+        "elapsed_seconds": round(elapsed, 3),
+        "filled_orders": filled_orders,
+        "order_fill_rate": round(filled_orders / orders, 4),
+        "filled_quantity": filled_quantity,
+        "quantity_fill_rate": round(filled_quantity / demand, 4),
+        "allocated_value": round(value, 2),
+        "backorders": summary["backorders"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="処理順と順位付けの一括割当の比較")
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--lots-per-sku", type=int, default=10)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--order-size", choices=synthetic_data.ORDER_SIZE_DISTRIBUTIONS, default="lognormal", help="注文数量の分布")
+    parser.add_argument("--order-size-mean", type=float, default=5.0)
+    parser.add_argument("--coverage", type=float, default=0.8, help="需要量に対する在庫量の比率")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--strategies", nargs="+", default=["FIFO", "RANKED"])
+    parser.add_argument("--output", help="結果をJSONで出力するファイル")
+    args = parser.parse_args()
+
+    data = synthetic_data.generate(
+        skus=args.skus, lots_per_sku=args.lots_per_sku, orders=args.orders, skew=args.skew,
+        order_size_distribution=args.order_size, order_size_mean=args.order_size_mean,
+        coverage=args.coverage, seed=args.seed,
+    )
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for strategy in args.strategies:
+            result = run(strategy, directory, data)
+            results.append(result)
+            print(f"{strategy:<10} elapsed={result['elapsed_seconds']:8.3f}s filled_orders={result['filled_orders']} "
+                  f"({result['order_fill_rate']:.2%}) filled_quantity={result['filled_quantity']} ({result['quantity_fill_rate']:.2%}) "
+                  f"value={result['allocated_value']:.2f} backorders={result['backorders']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
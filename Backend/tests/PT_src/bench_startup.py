@@ -0,0 +1,103 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+src_dir = os.path.join(grandparent_dir, 'Backend', 'src')
+
+import argparse
+import json
+import statistics
+import subprocess
+
+# Lambda関数のコールドスタート（app.py の読み込みと最初のリクエスト）の時間を計測する性能試験
+# 使用例: python bench_startup.py --runs 5 --max-import-ms 1500 --max-first-request-ms 300
+# 計測ごとに新しいPythonプロセスを python -X importtime で起動し、
+# モジュールの読み込み時間・最初のリクエスト（Mangumのハンドラ経由）・2回目のリクエストの時間を出力する。
+# 閾値を超えた場合は終了コード1で終了するため、CIで起動時間の劣化を検出できる。
+
+# 子プロセスで実行するスクリプト（認証はベンチマークの対象外のため無効化する）
+CHILD_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+import os, tempfile
+import database
+from sqlalchemy import create_engine
+# インメモリのSQLiteはスレッドごとに別のデータベースとなるため、一時ファイルのSQLiteを使用する
+database._engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"), connect_args={"check_same_thread": False})
+database.Base.metadata.create_all(bind=database.get_engine())
+app.authenticate_token = lambda token: "bench"
+
+event = {
+    "version": "2.0",
+    "routeKey": "GET /orders",
+    "rawPath": "/orders",
+    "rawQueryString": "limit=10",
+    "headers": {"authorization": "Bearer bench", "host": "localhost"},
+    "requestContext": {"http": {"method": "GET", "path": "/orders", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"}, "stage": "$default"},
+    "isBase64Encoded": False,
+}
+timings = {"import_ms": (imported - started) * 1000}
+for name in ("first_request_ms", "warm_request_ms"):
+    request_started = time.perf_counter()
+    response = app.handler(event, None)
+    timings[name] = (time.perf_counter() - request_started) * 1000
+    assert response["statusCode"] == 200, response
+print(json.dumps(timings))
+"""
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """
+    -X importtime の出力をモジュールごとの（モジュール名, 単独の時間, 累積の時間）のリストに変換する（単位はマイクロ秒）
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def measure() -> tuple[dict, list[tuple[str, int, int]]]:
+    """
+    新しいプロセスで起動時間を1回計測する
+    """
+    env = dict(os.environ, PYTHONPATH=src_dir, PYTHONDONTWRITEBYTECODE="0")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT], cwd=src_dir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(completed.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="コールドスタートの性能試験")
+    parser.add_argument("--runs", type=int, default=5, help="計測回数（中央値を出力する）")
+    parser.add_argument("--top", type=int, default=15, help="単独の読み込み時間が長いモジュールの出力件数")
+    parser.add_argument("--max-import-ms", type=float, help="app.py の読み込み時間の上限（超えた場合は終了コード1）")
+    parser.add_argument("--max-first-request-ms", type=float, help="最初のリクエストの時間の上限（超えた場合は終了コード1）")
+    args = parser.parse_args()
+
+    # 1回目は .pyc の作成を含むため計測から除外する
+    measure()
+    results = [measure() for _ in range(args.runs)]
+
+    summary = {name: statistics.median(timings[name] for timings, _ in results) for name in results[0][0]}
+    for name, value in summary.items():
+        print(f"{name:>18}: {value:8.1f} ms")
+
+    print("\nslowest modules (self time, last run):")
+    for name, self_us, cumulative_us in sorted(results[-1][1], key=lambda module: module[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    failed = False
+    if args.max_import_ms is not None and summary["import_ms"] > args.max_import_ms:
+        print(f"import time {summary['import_ms']:.1f} ms exceeds {args.max_import_ms} ms")
+        failed = True
+    if args.max_first_request_ms is not None and summary["first_request_ms"] > args.max_first_request_ms:
+        print(f"first request time {summary['first_request_ms']:.1f} ms exceeds {args.max_first_request_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
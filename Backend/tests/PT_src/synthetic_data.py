@@ -0,0 +1,101 @@
+import math
+import random
+from datetime import date, timedelta
+from sqlalchemy import insert
+from models import Order, Inventory
+
+# 性能試験用の合成データ（注文・在庫ロット）の生成
+# 商品（SKU）ごとの注文数はZipf分布（skew=0で一様、大きいほど一部の人気商品に集中）に従い、
+# 注文数量は指定した分布から生成する。在庫は商品ごとの需要量 × coverage を lots_per_sku 個のロットに分割する。
+# 同じ seed からは常に同じデータを生成するため、コミット間の結果を比較できる。
+
+ORDER_SIZE_DISTRIBUTIONS = ("constant", "uniform", "geometric", "lognormal")
+
+def sku_code(index: int) -> str:
+    """
+    SKUの番号から商品コードを作成する
+    """
+    return f"SKU{index:06d}"
+
+def zipf_weights(count: int, skew: float) -> list[float]:
+    """
+    Zipf分布の重み（順位 k の重みは 1 / k^skew）を返す
+    """
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+def order_size(rng: random.Random, distribution: str, mean: float, maximum: int) -> int:
+    """
+    注文数量を1件生成する
+    :param rng: 乱数生成器
+    :param distribution: 分布（constant / uniform / geometric / lognormal）
+    :param mean: 平均値
+    :param maximum: 最大値
+    """
+    if distribution == "constant":
+        size = round(mean)
+    elif distribution == "uniform":
+        size = rng.randint(1, max(1, round(2 * mean - 1)))
+    elif distribution == "geometric":
+        # 平均 mean の幾何分布（1以上）
+        p = 1.0 / max(mean, 1.0)
+        size = 1 if p >= 1.0 else 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - p))
+    elif distribution == "lognormal":
+        # 平均が mean となる対数正規分布（sigma=1）
+        size = round(rng.lognormvariate(math.log(max(mean, 1.0)) - 0.5, 1.0))
+    else:
+        raise ValueError(f"Unknown order size distribution: {distribution}")
+    return min(max(size, 1), maximum)
+
+def generate(skus: int = 1000, lots_per_sku: int = 10, orders: int = 50000, skew: float = 1.0,
+             order_size_distribution: str = "geometric", order_size_mean: float = 5.0, order_size_max: int = 100,
+             coverage: float = 1.0, seed: int = 0) -> tuple[list[dict], list[dict]]:
+    """
+    注文と在庫ロットの行を生成する
+    :param skus: 商品数
+    :param lots_per_sku: 商品ごとの在庫ロット数
+    :param orders: 注文数
+    :param skew: 商品ごとの注文数のZipf分布の偏り（0で一様）
+    :param order_size_distribution: 注文数量の分布
+    :param order_size_mean: 注文数量の平均
+    :param order_size_max: 注文数量の最大値
+    :param coverage: 需要量に対する在庫量の比率（1未満で在庫不足の商品が生じる）
+    :param seed: 乱数のシード
+    :return: 注文の行のリストと在庫の行のリスト（insert にそのまま渡せる辞書）
+    """
+    rng = random.Random(seed)
+    # 人気順位と商品番号が一致しないよう、順位を商品に無作為に割り当てる
+    ranked_skus = list(range(skus))
+    rng.shuffle(ranked_skus)
+    chosen = rng.choices(ranked_skus, weights=zipf_weights(skus, skew), k=orders)
+
+    order_rows = []
+    demand = [0] * skus
+    for sku in chosen:
+        quantity = order_size(rng, order_size_distribution, order_size_mean, order_size_max)
+        demand[sku] += quantity
+        order_rows.append({"item_code": sku_code(sku), "quantity": quantity, "allocated": False})
+
+    inventory_rows = []
+    first_receipt = date(2024, 1, 1)
+    for sku in range(skus):
+        # 注文の無い商品にも最低限の在庫を置く
+        stock = max(lots_per_sku, round(demand[sku] * coverage))
+        cuts = sorted(rng.randint(0, stock) for _ in range(lots_per_sku - 1))
+        base_price = rng.uniform(5.0, 100.0)
+        for lot, (start, end) in enumerate(zip([0] + cuts, cuts + [stock])):
+            inventory_rows.append({
+                "item_code": sku_code(sku),
+                "quantity": end - start,
+                "receipt_date": first_receipt + timedelta(days=lot),
+                "unit_price": round(base_price * rng.uniform(0.9, 1.1), 2),
+            })
+    return order_rows, inventory_rows
+
+def load(engine, order_rows: list[dict], inventory_rows: list[dict], chunk_size: int = 10000):
+    """
+    生成した行をデータベースに登録する
+    """
+    with engine.begin() as conn:
+        for model, rows in ((Order, order_rows), (Inventory, inventory_rows)):
+            for start in range(0, len(rows), chunk_size):
+                conn.execute(insert(model), rows[start:start + chunk_size])
@@ -5,8 +5,9 @@ grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
 sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
 
 import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from models import Order, Inventory, AllocationResult
+from models import Order, Inventory, AllocationResult, Backorder
 from allocation import allocate_inventory
 from database import Base, TestingSessionLocal, engine
 
@@ -17,6 +18,7 @@ def test_allocate_inventory_fifo():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -57,6 +59,7 @@ def test_allocate_inventory_lifo():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -97,6 +100,7 @@ def test_allocate_inventory_average():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -130,6 +134,7 @@ def test_allocate_inventory_specific():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -163,6 +168,7 @@ def test_allocate_inventory_total_average():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -196,6 +202,7 @@ def test_allocate_inventory_moving_average():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -229,6 +236,7 @@ def test_allocate_inventory_insufficient_inventory():
     db = TestingSessionLocal()
 
     # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
     db.query(Order).delete()
     db.query(Inventory).delete()
     db.query(AllocationResult).delete()
@@ -255,3 +263,83 @@ def test_allocate_inventory_insufficient_inventory():
     # 在庫の検証
     updated_inventory = db.query(Inventory).first()
     assert updated_inventory.quantity == 0
+
+def test_allocate_inventory_multiple_items():
+    db = TestingSessionLocal()
+
+    # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.commit()
+
+    # 複数商品の注文を交互に作成
+    db.add_all([
+        Order(id=1, item_code="AAA111", quantity=3, allocated=False),
+        Order(id=2, item_code="BBB222", quantity=4, allocated=False),
+        Order(id=3, item_code="AAA111", quantity=2, allocated=False),
+        Order(id=4, item_code="CCC333", quantity=1, allocated=False),
+    ])
+    db.add_all([
+        Inventory(item_code="AAA111", quantity=4, unit_price=10),
+        Inventory(item_code="BBB222", quantity=10, unit_price=30),
+        Inventory(item_code="AAA111", quantity=5, unit_price=11),
+    ])
+    db.commit()
+
+    allocate_inventory(db, "FIFO")
+
+    # 注文ごとの割り当て結果の検証（在庫の無い商品は結果なし）
+    results = db.query(AllocationResult).order_by(AllocationResult.order_id, AllocationResult.id).all()
+    assert [(r.order_id, r.allocated_quantity, r.allocated_price) for r in results] == [
+        (1, 3, 30),
+        (2, 4, 120),
+        (3, 1, 10),
+        (3, 1, 11),
+    ]
+
+    # 在庫の検証
+    updated_inventories = db.query(Inventory).order_by(Inventory.id).all()
+    assert [inventory.quantity for inventory in updated_inventories] == [0, 6, 4]
+    # 在庫の無い商品の注文は割当済みにせず、バックオーダーに登録する
+    assert [(order.id, order.allocated, order.allocated_quantity, order.backordered) for order in db.query(Order).order_by(Order.id)] == [
+        (1, True, 3, False),
+        (2, True, 4, False),
+        (3, True, 2, False),
+        (4, False, 0, True),
+    ]
+    assert [(b.order_id, b.item_code, b.remaining_quantity) for b in db.query(Backorder)] == [(4, "CCC333", 1)]
+
+def test_allocate_inventory_query_count_is_constant():
+    db = TestingSessionLocal()
+
+    # テスト前にデータベースをクリーンアップ
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.commit()
+
+    # 多数の注文と在庫を作成
+    for i in range(50):
+        item_code = f"ITEM{i % 5}"
+        db.add(Order(item_code=item_code, quantity=1, allocated=False))
+        db.add(Inventory(item_code=item_code, quantity=2, unit_price=10))
+    db.commit()
+
+    # 発行されたSELECT文の数を計測
+    selects = []
+
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_selects)
+    try:
+        allocate_inventory(db, "FIFO")
+    finally:
+        event.remove(engine, "before_cursor_execute", count_selects)
+
+    # 注文数に関係なく、注文・在庫・在庫集計の一括取得のみ
+    assert len(selects) == 3
@@ -0,0 +1,152 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from models import Order, Inventory, AllocationResult
+from lot_cache import lot_cache
+from schemas import AllocationRequest
+from app import allocate_inventory as allocate_endpoint
+import allocation
+from allocation import allocate_inventory, reserve_lot
+from database import Base
+
+@pytest.fixture
+def file_sessionmaker(tmp_path):
+    """
+    複数の接続から同時に更新できるファイルのSQLiteデータベースのセッションファクトリを返す
+    """
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'concurrency.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=file_engine)
+    lot_cache.invalidate()
+    yield sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+    lot_cache.invalidate()
+    file_engine.dispose()
+
+def allocate(SessionLocal, order_id, item_code, quantity):
+    """
+    割当APIを独立したセッションで呼び出し、成功した場合は割当数量、失敗した場合はステータスコードを返す
+    """
+    db = SessionLocal()
+    try:
+        request = AllocationRequest(order_id=order_id, item_code=item_code, quantity=quantity, allocation_date="2024-02-01")
+        return allocate_endpoint(order_id, request, db=db, token_payload=None).allocated_quantity
+    except HTTPException as error:
+        return -error.status_code
+    finally:
+        db.close()
+
+def test_concurrent_allocations_never_oversell(file_sessionmaker):
+    db = file_sessionmaker()
+    db.add_all([Order(id=i, item_code="STRESS1", quantity=1, allocated=False) for i in range(1, 121)])
+    db.add_all([Inventory(item_code="STRESS1", quantity=10, unit_price=10 + i, receipt_date=date(2024, 1, 1 + i)) for i in range(5)])
+    db.commit()
+
+    # 在庫50に対して120件の注文を8スレッドから同時に割り当てる
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outcomes = list(executor.map(lambda order_id: allocate(file_sessionmaker, order_id, "STRESS1", 1), range(1, 121)))
+
+    remaining = [quantity for (quantity,) in db.query(Inventory.quantity)]
+    allocated_total = db.query(func.sum(AllocationResult.allocated_quantity)).scalar()
+    assert all(quantity >= 0 for quantity in remaining)
+    assert allocated_total == 50 - sum(remaining)
+    assert sum(1 for outcome in outcomes if outcome > 0) == allocated_total
+    assert db.query(Order).filter(Order.allocated == True).count() == allocated_total
+    assert set(outcome for outcome in outcomes if outcome < 0) <= {-404, -409}
+    # 競合は再試行で解消されるため、在庫はすべて引き当てられる
+    assert sum(remaining) == 0
+
+def test_concurrent_allocation_of_same_order_succeeds_once(file_sessionmaker):
+    db = file_sessionmaker()
+    db.add(Order(id=1, item_code="STRESS1", quantity=1, allocated=False))
+    db.add(Inventory(item_code="STRESS1", quantity=10, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+
+    # 別のリクエストが割当前の注文を読み込んだ状態で、先に割り当てが完了する
+    stale = file_sessionmaker()
+    stale.query(Order).filter(Order.id == 1).one()
+    assert allocate(file_sessionmaker, 1, "STRESS1", 1) == 1
+
+    request = AllocationRequest(order_id=1, item_code="STRESS1", quantity=1, allocation_date="2024-02-01")
+    with pytest.raises(HTTPException) as error:
+        allocate_endpoint(1, request, db=stale, token_payload=None)
+    assert error.value.status_code == 409
+    assert db.query(Inventory.quantity).scalar() == 9
+    assert db.query(AllocationResult).count() == 1
+
+def test_reserve_lot_bumps_version_and_rejects_insufficient_quantity(file_sessionmaker):
+    db = file_sessionmaker()
+    inventory = Inventory(item_code="STRESS1", quantity=3, unit_price=10)
+    db.add(inventory)
+    db.commit()
+
+    assert reserve_lot(db, "STRESS1", inventory.id, 2, 10)
+    assert not reserve_lot(db, "STRESS1", inventory.id, 2, 10)
+    db.commit()
+    db.refresh(inventory)
+    assert (inventory.quantity, inventory.version) == (1, 2)
+
+def test_batch_allocation_retries_item_after_concurrent_reservation(file_sessionmaker, monkeypatch):
+    db = file_sessionmaker()
+    db.add_all([
+        Order(id=1, item_code="STRESS1", quantity=2, allocated=False),
+        Order(id=2, item_code="STRESS1", quantity=2, allocated=False),
+        Order(id=3, item_code="STRESS2", quantity=1, allocated=False),
+    ])
+    inventory = Inventory(item_code="STRESS1", quantity=4, unit_price=10)
+    db.add_all([inventory, Inventory(item_code="STRESS2", quantity=1, unit_price=20)])
+    db.commit()
+
+    # 一括割当が在庫を読み込んだ直後に、割当APIが同じロットを引き当てる（在庫のバージョンが加算される）
+    load = allocation.load_inventories_by_item
+    reservations = []
+    def load_then_reserve(*args, **kwargs):
+        inventories = load(*args, **kwargs)
+        if not reservations:
+            other = file_sessionmaker()
+            reservations.append(reserve_lot(other, "STRESS1", inventory.id, 1, 10))
+            other.commit()
+            other.close()
+        return inventories
+    monkeypatch.setattr(allocation, "load_inventories_by_item", load_then_reserve)
+
+    # 読み込み時点のバージョンでは更新せず（売り越さず）、商品ごとに読み込み直して割り当てる
+    summary = allocate_inventory(db, "FIFO")
+
+    assert reservations == [True]
+    assert (summary["items"], summary["orders"], summary["backorders"], summary["allocation_results"]) == (2, 3, 1, 3)
+    states = [(order.id, order.allocated, order.allocated_quantity) for order in db.query(Order).order_by(Order.id)]
+    assert states == [(1, True, 2), (2, False, 1), (3, True, 1)]
+    assert [quantity for quantity, in db.query(Inventory.quantity).order_by(Inventory.id)] == [0, 0]
+    assert db.query(func.sum(AllocationResult.allocated_quantity)).scalar() == 4
+
+def test_batch_allocation_gives_up_after_repeated_conflicts(file_sessionmaker, monkeypatch):
+    db = file_sessionmaker()
+    db.add(Order(id=1, item_code="STRESS1", quantity=1, allocated=False))
+    db.add(Inventory(item_code="STRESS1", quantity=10, unit_price=10))
+    db.commit()
+
+    # 割り当てのたびに同じセッションでロットのバージョンを加算する（セーブポイントのロールバックで取り消される）
+    allocate_orders = allocation.allocate_orders
+    attempts = []
+    def reserve_then_allocate(session, allocation_strategy, orders, lots, *args):
+        attempts.append(reserve_lot(session, "STRESS1", lots[0].id, 1, 10))
+        return allocate_orders(session, allocation_strategy, orders, lots, *args)
+    monkeypatch.setattr(allocation, "allocate_orders", reserve_then_allocate)
+    monkeypatch.setattr(allocation, "ALLOCATION_MAX_ATTEMPTS", 2)
+
+    # 区切りの割り当て1回と商品ごとの再試行2回で失敗し、例外を送出する
+    with pytest.raises(StaleDataError):
+        allocate_inventory(db, "FIFO")
+    db.rollback()
+    assert len(attempts) == 3
+    assert db.query(Inventory.quantity).scalar() == 10
+    assert db.query(AllocationResult).count() == 0
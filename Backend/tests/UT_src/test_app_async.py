@@ -0,0 +1,61 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import asyncio
+import json
+import pytest
+
+# 非同期ドライバが無い環境ではスキップする
+pytest.importorskip("greenlet")
+pytest.importorskip("aiosqlite")
+
+from fastapi import HTTPException, Response
+from lot_cache import lot_cache
+from schemas import OrderRequest, InventoryRequest, AllocationRequest
+from async_database import create_engine_for_url
+from database import Base
+import app_async
+
+async def open_session(path):
+    """
+    ファイルのSQLiteデータベースに接続した非同期セッションを返す
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    engine = create_engine_for_url(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(bind=engine, expire_on_commit=False)()
+
+def test_async_endpoints(tmp_path):
+    async def scenario():
+        engine, db = await open_session(tmp_path / "async.db")
+        try:
+            await app_async.create_order(OrderRequest(item_code="ABC123", quantity=3), db=db, token_payload=None)
+            await app_async.create_inventory(InventoryRequest(item_code="ABC123", quantity=5, receipt_date="2024-01-01", unit_price=10), db=db, token_payload=None)
+
+            orders = await app_async.read_orders(Response(), after_id=None, limit=100, fields=None, item_code=None, allocated=None, db=db, token_payload=None)
+            assert [(order.item_code, order.quantity) for order in orders] == [("ABC123", 3)]
+
+            request = AllocationRequest(order_id=orders[0].id, item_code="ABC123", quantity=3, allocation_date="2024-02-01")
+            result = await app_async.allocate_inventory(orders[0].id, request, db=db, token_payload=None)
+            assert (result.allocated_quantity, result.allocated_price) == (3, 10)
+
+            inventories = await app_async.read_inventories(Response(), after_id=None, limit=100, fields=None, item_code=None, date_from=None, date_to=None, db=db, token_payload=None)
+            assert [inventory.quantity for inventory in inventories] == [2]
+            results = await app_async.read_allocation_results(Response(), after_id=None, limit=100, fields="allocated_quantity", item_code="ABC123", date_from=None, date_to=None, db=db, token_payload=None)
+            assert json.loads(results.body) == [{"id": 1, "allocated_quantity": 3}]
+
+            with pytest.raises(HTTPException) as error:
+                await app_async.allocate_inventory(orders[0].id, request, db=db, token_payload=None)
+            assert error.value.status_code == 409
+        finally:
+            await db.close()
+            await engine.dispose()
+
+    lot_cache.invalidate()
+    asyncio.run(scenario())
+    lot_cache.invalidate()
@@ -0,0 +1,30 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import pytest
+from sqlalchemy.engine import make_url
+from async_database import async_database_url
+from database import pool_options
+
+def test_async_database_url_uses_async_drivers():
+    assert make_url(async_database_url("sqlite:///:memory:")).drivername == "sqlite+aiosqlite"
+    assert make_url(async_database_url("sqlite:///:memory:")).database == ":memory:"
+
+    url = make_url(async_database_url("postgresql://user:secret@db:5432/inventory"))
+    assert url.drivername == "postgresql+asyncpg"
+    assert (url.username, url.password, url.host, url.port, url.database) == ("user", "secret", "db", 5432, "inventory")
+
+    with pytest.raises(ValueError):
+        async_database_url("mysql://user@db/inventory")
+
+def test_pool_options_from_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "300")
+
+    options = pool_options()
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (20, 0, 300)
+    assert options["pool_pre_ping"] is True
@@ -0,0 +1,150 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import base64
+import json
+import time
+import jwt
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from jwt.exceptions import InvalidTokenError
+from auth import JWKSKeyProvider, VerifiedTokenCache, TokenVerifier
+import app as app_module
+
+SECRET = b"0123456789abcdef0123456789abcdef"
+
+def claims(**overrides):
+    now = int(time.time())
+    payload = {
+        "sub": "user-1", "cognito_username": "user1", "email": "user1@example.com", "email_verified": True,
+        "given_name": "Taro", "family_name": "Yamada", "roles": ["admin"],
+        "iss": "https://issuer.example.com", "aud": "client-1", "iat": now, "exp": now + 3600,
+    }
+    payload.update(overrides)
+    return payload
+
+def write_jwks(path, *kids):
+    # 署名の検証方法に依存しないキャッシュの動作を確認するため、共通鍵（oct）のJWKを使用する
+    key = base64.urlsafe_b64encode(SECRET).rstrip(b"=").decode()
+    path.write_text(json.dumps({"keys": [{"kty": "oct", "kid": kid, "alg": "HS256", "k": key} for kid in kids]}))
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_verifier(tmp_path, clock=None):
+    write_jwks(tmp_path / "jwks.json", "key-1")
+    provider = JWKSKeyProvider(str(tmp_path / "jwks.json"), ttl=3600, min_refresh_interval=60, clock=clock or time.monotonic)
+    return TokenVerifier(provider, "client-1", "https://issuer.example.com", algorithms=("HS256",))
+
+def test_provider_caches_parsed_keys_until_ttl(tmp_path):
+    write_jwks(tmp_path / "jwks.json", "key-1")
+    clock = FakeClock()
+    provider = JWKSKeyProvider(str(tmp_path / "jwks.json"), ttl=3600, min_refresh_interval=60, clock=clock)
+
+    key = provider.get_key("key-1")
+    assert isinstance(key, jwt.PyJWK)
+    assert provider.get_key("key-1") is key
+    assert provider.refreshes == 1
+
+    # 未知のkidは最短間隔の経過後にのみ再取得する
+    write_jwks(tmp_path / "jwks.json", "key-1", "key-2")
+    assert provider.get_key("key-2") is None
+    clock.now = 61
+    assert provider.get_key("key-2") is not None
+    assert provider.refreshes == 2
+
+    clock.now = 61 + 3600
+    provider.get_key("key-1")
+    assert provider.refreshes == 3
+
+def test_provider_keeps_keys_when_refresh_fails(tmp_path):
+    write_jwks(tmp_path / "jwks.json", "key-1")
+    clock = FakeClock()
+    provider = JWKSKeyProvider(str(tmp_path / "jwks.json"), ttl=10, min_refresh_interval=5, clock=clock)
+    provider.get_key("key-1")
+
+    (tmp_path / "jwks.json").unlink()
+    clock.now = 20
+    assert provider.get_key("key-1") is not None
+
+    with pytest.raises(InvalidTokenError):
+        JWKSKeyProvider(str(tmp_path / "missing.json")).get_key("key-1")
+
+def test_token_cache_is_bounded_and_honors_exp():
+    clock = FakeClock(1000)
+    cache = VerifiedTokenCache(max_size=2, clock=clock)
+    cache.put("a", "payload-a", 2000)
+    cache.put("b", "payload-b", 1500)
+    assert cache.get("a") == "payload-a"
+    cache.put("c", "payload-c", 2000)
+
+    # 最も古く使われた b が破棄される
+    assert cache.get("b") is None
+    assert cache.get("a") == "payload-a"
+
+    clock.now = 2000
+    assert cache.get("a") is None
+    assert len(cache.entries) == 1
+
+def test_verifier_verifies_signature_once(tmp_path):
+    verifier = make_verifier(tmp_path)
+    token = jwt.encode(claims(), SECRET, algorithm="HS256", headers={"kid": "key-1"})
+
+    payload = verifier.verify(token)
+    assert payload.cognito_username == "user1"
+    assert verifier.verify(token) is payload
+    assert verifier.verifications == 1
+
+@pytest.mark.parametrize("token", [
+    jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm="HS256", headers={"kid": "key-1"}),
+    jwt.encode(claims(aud="other-client"), SECRET, algorithm="HS256", headers={"kid": "key-1"}),
+    jwt.encode(claims(), b"wrong-secret-wrong-secret-wrong!", algorithm="HS256", headers={"kid": "key-1"}),
+    jwt.encode(claims(), SECRET, algorithm="HS256", headers={"kid": "key-9"}),
+    jwt.encode(claims(), SECRET, algorithm="HS256"),
+    jwt.encode({"exp": int(time.time()) + 60, "aud": "client-1", "iss": "https://issuer.example.com"}, SECRET, algorithm="HS256", headers={"kid": "key-1"}),
+])
+def test_verifier_rejects_invalid_tokens(tmp_path, token):
+    verifier = make_verifier(tmp_path)
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(token)
+    assert len(verifier.cache.entries) == 0
+
+def test_verifier_rs256(tmp_path):
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": "rsa-1", "alg": "RS256", "use": "sig"})
+    (tmp_path / "jwks.json").write_text(json.dumps({"keys": [jwk]}))
+
+    verifier = TokenVerifier(JWKSKeyProvider(str(tmp_path / "jwks.json")), "client-1", "https://issuer.example.com")
+    token = jwt.encode(claims(), private_key, algorithm="RS256", headers={"kid": "rsa-1"})
+    assert verifier.verify(token).sub == "user-1"
+    # 共通鍵での署名（アルゴリズムのすり替え）は受け付けない
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(jwt.encode(claims(), SECRET, algorithm="HS256", headers={"kid": "rsa-1"}))
+
+def test_authenticate_token_and_dependency_share_result(tmp_path, monkeypatch):
+    verifier = make_verifier(tmp_path)
+    monkeypatch.setattr(app_module, "get_verifier", lambda: verifier)
+    token = jwt.encode(claims(), SECRET, algorithm="HS256", headers={"kid": "key-1"})
+
+    request = Request({"type": "http", "headers": [], "state": {}})
+    request.state.user = app_module.authenticate_token(token)
+    assert app_module.get_token_payload(request).sub == "user-1"
+    assert verifier.verifications == 1
+
+    with pytest.raises(HTTPException) as error:
+        app_module.authenticate_token("not-a-token")
+    assert error.value.status_code == 401
+    with pytest.raises(HTTPException):
+        app_module.get_token_payload(Request({"type": "http", "headers": [], "state": {}}))
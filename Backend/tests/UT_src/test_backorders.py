@@ -0,0 +1,226 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import json
+import pytest
+from fastapi import HTTPException
+from models import Order, Inventory, AllocationResult, InventorySummary, AllocationOutbox, Backorder
+from schemas import InventoryRequest, AllocationRequest
+import allocation
+import app
+from allocation import allocate_inventory, allocate_backorders, reserve_lot
+from app import register_inventory, allocate_order
+from incremental_allocation import run_worker
+from bulk import ingest_inventories
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.query(AllocationOutbox).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def order_states(db):
+    return [(order.id, order.allocated, order.allocated_quantity, order.backordered) for order in db.query(Order).order_by(Order.id)]
+
+def test_short_order_is_backordered_and_not_rescanned():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=3, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=4, allocated=False),
+    ])
+    db.add(Inventory(item_code="ABC123", quantity=5, unit_price=10))
+    db.commit()
+
+    summary = allocate_inventory(db, "FIFO")
+    assert summary["backorders"] == 1
+    assert order_states(db) == [(1, True, 3, False), (2, False, 2, True)]
+    assert [(b.order_id, b.remaining_quantity) for b in db.query(Backorder)] == [(2, 2)]
+
+    # バックオーダーの注文は次回の一括割当で読み込まない
+    assert allocate_inventory(db, "FIFO")["orders"] == 0
+    cleanup(db)
+    db.close()
+
+def test_specific_without_fitting_lot_is_backordered():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add(Order(id=1, item_code="ABC123", quantity=6, allocated=False))
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(item_code="ABC123", quantity=5, unit_price=12),
+    ])
+    db.commit()
+
+    allocate_inventory(db, "SPECIFIC")
+
+    # 1ロットで引き当てられない注文は割当済みにしない
+    assert order_states(db) == [(1, False, 0, True)]
+    assert db.query(AllocationResult).count() == 0
+    cleanup(db)
+    db.close()
+
+def test_receipt_wakes_backorders_for_item_in_priority_order():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=4, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=3, allocated=False),
+        Order(id=3, item_code="XYZ789", quantity=2, allocated=False),
+    ])
+    db.commit()
+    allocate_inventory(db, "FIFO")
+    assert all(backordered for _, _, _, backordered in order_states(db))
+    # 優先度の高いバックオーダーから引き当てる
+    db.get(Backorder, 2).priority = 1
+    db.commit()
+
+    register_inventory(db, InventoryRequest(item_code="ABC123", quantity=5, receipt_date="2023-06-01", unit_price=10))
+
+    assert order_states(db) == [(1, False, 2, True), (2, True, 3, False), (3, False, 0, True)]
+    assert [(b.order_id, b.remaining_quantity) for b in db.query(Backorder).order_by(Backorder.order_id)] == [(1, 2), (3, 2)]
+    results = db.query(AllocationResult).order_by(AllocationResult.id).all()
+    assert [(r.order_id, r.allocated_quantity, r.allocated_price) for r in results] == [(2, 3, 30), (1, 2, 20)]
+    assert db.query(Inventory).one().quantity == 0
+    summary = db.get(InventorySummary, "ABC123")
+    assert (summary.total_quantity, summary.lot_count) == (0, 0)
+    # 割当APIのロットキャッシュは引当後の在庫から再取得される
+    assert len(lot_cache.get(db, "ABC123")) == 0
+
+    # 入荷の無い商品・バックオーダーの無い商品は何もしない
+    assert allocate_backorders(db, "XYZ789") == 0
+    assert allocate_backorders(db, "DEF456") == 0
+    cleanup(db)
+    db.close()
+
+def test_bulk_receipt_wakes_backorders():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add(Order(id=1, item_code="ABC123", quantity=3, allocated=False))
+    db.commit()
+    allocate_inventory(db, "FIFO")
+
+    body = json.dumps([
+        {"item_code": "ABC123", "quantity": 2, "receipt_date": "2023-06-01", "unit_price": 10},
+        {"item_code": "ABC123", "quantity": 2, "receipt_date": "2023-06-02", "unit_price": 11},
+        {"item_code": "XYZ789", "quantity": 5, "receipt_date": "2023-06-01", "unit_price": 12},
+    ]).encode()
+    ingest_inventories(db, body, "application/json")
+
+    assert order_states(db) == [(1, True, 3, False)]
+    assert db.query(Backorder).count() == 0
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [0, 1, 5]
+    cleanup(db)
+    db.close()
+
+def test_partial_api_allocation_keeps_remaining_as_backorder():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add(Order(id=1, item_code="ABC123", quantity=10, allocated=False))
+    db.add(Inventory(id=1, item_code="ABC123", quantity=20, unit_price=10))
+    db.commit()
+
+    def allocate(quantity):
+        return allocate_order(db, 1, AllocationRequest(order_id=1, item_code="ABC123", quantity=quantity, allocation_date="2024-02-01"))
+
+    # 一部のみ割り当てた注文は割当済みにせず、残りの数量をバックオーダーに登録する
+    allocate(3)
+    order = db.get(Order, 1)
+    assert (order.allocated, order.allocated_quantity, order.backordered) == (False, 3, True)
+    assert db.get(Backorder, 1).remaining_quantity == 7
+
+    # 未引当の数量を超える割当は拒否する
+    with pytest.raises(HTTPException) as error:
+        allocate(8)
+    assert error.value.status_code == 400
+
+    # バックオーダーの注文の一部割当は残りの数量を減らす
+    allocate(4)
+    assert db.get(Backorder, 1).remaining_quantity == 3
+    assert (order.allocated, order.allocated_quantity) == (False, 7)
+
+    allocate(3)
+    assert (order.allocated, order.allocated_quantity, order.backordered) == (True, 10, False)
+    assert db.query(Backorder).count() == 0
+    cleanup(db)
+    db.close()
+
+def backorder_one(db, quantity=3):
+    db.add(Order(id=1, item_code="ABC123", quantity=quantity, allocated=False))
+    db.commit()
+    allocate_inventory(db, "FIFO")
+
+def test_receipt_retries_backorder_fill_after_conflict(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    backorder_one(db)
+    get_summary = allocation.get_summary
+    collisions = []
+
+    def reserve_after_load(session, item_code):
+        # バックオーダーの引当が在庫を読み込んだ後に、割当APIが同じロットを引き当てる（在庫のバージョンが加算される）
+        if not collisions:
+            lot = session.query(Inventory).one()
+            collisions.append(reserve_lot(session, item_code, lot.id, 1, lot.unit_price))
+        return get_summary(session, item_code)
+
+    monkeypatch.setattr(allocation, "get_summary", reserve_after_load)
+    inventory = register_inventory(db, InventoryRequest(item_code="ABC123", quantity=5, receipt_date="2023-06-01", unit_price=10))
+
+    # 1回目は StaleDataError でロールバックされ、読み込み直して引き当てる
+    assert collisions == [True]
+    assert order_states(db) == [(1, True, 3, False)]
+    assert inventory.quantity == 2
+    assert db.get(InventorySummary, "ABC123").total_quantity == 2
+    cleanup(db)
+    db.close()
+
+def test_receipt_is_kept_when_backorder_fill_keeps_conflicting(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    backorder_one(db)
+
+    def conflict(*args, **kwargs):
+        raise allocation.StaleDataError("conflict")
+
+    monkeypatch.setattr(allocation, "allocate_backorders", conflict)
+    inventory = register_inventory(db, InventoryRequest(item_code="ABC123", quantity=5, receipt_date="2023-06-01", unit_price=10))
+
+    # 入荷はコミット済みで、バックオーダーは差分割当のワーカーが引き当てる
+    assert inventory.quantity == 5
+    assert order_states(db) == [(1, False, 0, True)]
+    assert db.query(AllocationOutbox).count() == 1
+    monkeypatch.undo()
+    assert run_worker(TestingSessionLocal, "FIFO", once=True) == 1
+    assert order_states(db) == [(1, True, 3, False)]
+    cleanup(db)
+    db.close()
+
+def test_receipt_fills_backorders_up_to_limit(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Order(id=i, item_code="ABC123", quantity=1, allocated=False) for i in (1, 2, 3)])
+    db.commit()
+    allocate_inventory(db, "FIFO")
+    monkeypatch.setattr(app, "BACKORDER_FILL_LIMIT", 2)
+
+    register_inventory(db, InventoryRequest(item_code="ABC123", quantity=5, receipt_date="2023-06-01", unit_price=10))
+
+    # 入荷の登録では上限件数のみを引き当て、残りは差分割当のワーカーが引き当てる
+    assert [allocated for _, allocated, _, _ in order_states(db)] == [True, True, False]
+    run_worker(TestingSessionLocal, "FIFO", once=True)
+    assert [allocated for _, allocated, _, _ in order_states(db)] == [True, True, True]
+    cleanup(db)
+    db.close()
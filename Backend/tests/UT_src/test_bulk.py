@@ -0,0 +1,107 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import json
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from models import Order, Inventory, AllocationResult, InventorySummary
+from bulk import ingest_orders, ingest_inventories
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def test_ingest_orders_json_array():
+    db = TestingSessionLocal()
+    cleanup(db)
+    body = json.dumps([
+        {"item_code": "ABC123", "quantity": 5},
+        {"item_code": "ABC123", "quantity": "many"},
+        {"item_code": "XYZ789", "quantity": 2},
+        "not an object",
+    ]).encode()
+
+    result = ingest_orders(db, body, "application/json")
+
+    assert result.inserted == 2
+    assert [error.index for error in result.errors] == [1, 3]
+    assert result.errors[0].errors[0].startswith("quantity: ")
+    assert result.ids[1] is None and result.ids[3] is None
+    assert result.rows_per_second > 0
+
+    orders = {order.id: order for order in db.query(Order)}
+    assert (orders[result.ids[0]].item_code, orders[result.ids[0]].quantity) == ("ABC123", 5)
+    assert (orders[result.ids[2]].item_code, orders[result.ids[2]].quantity) == ("XYZ789", 2)
+    assert not any(order.allocated for order in orders.values())
+
+def test_ingest_inventories_ndjson_updates_summary():
+    db = TestingSessionLocal()
+    cleanup(db)
+    # 集計が未作成の商品に既存の在庫がある状態
+    db.add(Inventory(item_code="ABC123", quantity=2, unit_price=10, receipt_date=date(2023, 12, 1)))
+    db.commit()
+    lot_cache.get(db, "ABC123")
+
+    body = "\n".join([
+        '{"item_code": "ABC123", "quantity": 4, "receipt_date": "2024-01-01", "unit_price": 12}',
+        '{"item_code": "ABC123", "quantity": 1, "receipt_date": "2024-13-01", "unit_price": 12}',
+        '{broken',
+        '',
+        '{"item_code": "ABC123", "quantity": 6, "receipt_date": "2024-01-02", "unit_price": 11}',
+    ]).encode()
+
+    result = ingest_inventories(db, body, "application/x-ndjson; charset=utf-8")
+
+    assert result.inserted == 2
+    assert [error.index for error in result.errors] == [1, 2]
+    inventories = {inventory.id: inventory for inventory in db.query(Inventory)}
+    assert inventories[result.ids[0]].receipt_date == date(2024, 1, 1)
+    assert inventories[result.ids[3]].quantity == 6
+
+    summary = db.get(InventorySummary, "ABC123")
+    assert (summary.total_quantity, summary.total_value, summary.lot_count) == (12, 2 * 10 + 4 * 12 + 6 * 11, 3)
+    # 割当APIのロットキャッシュは破棄され、次回の取得で登録した在庫を含む
+    assert ("ABC123", "receipt_date") not in lot_cache.entries
+    assert len(lot_cache.get(db, "ABC123")) == 3
+
+def test_ingest_inserts_one_statement_per_chunk():
+    db = TestingSessionLocal()
+    cleanup(db)
+    body = json.dumps([{"item_code": f"ITEM{i}", "quantity": i} for i in range(5)]).encode()
+
+    statements = []
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        # 差分割当のイベント（allocation_outbox）のINSERTは数えない
+        if statement.lstrip().upper().startswith("INSERT INTO ORDERS"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        result = ingest_orders(db, body, "application/json", chunk_size=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert len(statements) == 3
+    assert result.ids == sorted(result.ids)
+    assert [db.get(Order, order_id).quantity for order_id in result.ids] == [0, 1, 2, 3, 4]
+
+def test_ingest_rejects_non_array_body():
+    db = TestingSessionLocal()
+    with pytest.raises(HTTPException) as error:
+        ingest_orders(db, b'{"item_code": "ABC123"}', "application/json")
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        ingest_orders(db, b"[", "application/json")
@@ -0,0 +1,218 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from datetime import date
+from types import SimpleNamespace
+import pytest
+import allocation
+import checkpoints
+import database
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder, AllocationCheckpoint
+from allocation import allocate_inventory, next_partition
+from checkpoints import COMPLETED, RUNNING, partition_key
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(AllocationCheckpoint).delete()
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def seed(db):
+    # 3商品 × 2注文（各商品の在庫は注文数量の合計と同じ）
+    for index, item_code in enumerate(["AAA", "BBB", "CCC"]):
+        db.add_all([
+            Order(id=index * 2 + 1, item_code=item_code, quantity=1, allocated=False),
+            Order(id=index * 2 + 2, item_code=item_code, quantity=2, allocated=False),
+        ])
+        db.add(Inventory(id=index + 1, item_code=item_code, quantity=3, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+
+def test_partition_helpers():
+    db = TestingSessionLocal()
+    cleanup(db)
+    orders = {"A": 3, "B": 1, "C": 2, "D": 1}
+    order_id = 0
+    for item_code, count in orders.items():
+        for _ in range(count):
+            order_id += 1
+            db.add(Order(id=order_id, item_code=item_code, quantity=1, allocated=False))
+    db.commit()
+
+    # 1商品の注文は分割せず、目安の注文数に達した商品までを1区切りとする
+    assert next_partition(db, None, 7, None, 2) == (["A"], False)
+    assert next_partition(db, None, 7, "A", 2) == (["B", "C"], False)
+    assert next_partition(db, None, 7, "C", 2) == (["D"], True)
+    assert next_partition(db, None, 7, "D", 2) == ([], True)
+    # 注文IDの上限より後に登録された注文・対象外の商品は含めない
+    assert next_partition(db, None, 4, "A", 10) == (["B"], True)
+    assert next_partition(db, ["C", "D"], 7, None, 10) == (["C", "D"], True)
+    assert partition_key(None) == "*"
+    assert partition_key(["B", "A"]) == partition_key(["A", "B"]) != partition_key(["A"])
+    cleanup(db)
+    db.close()
+
+def test_chunked_commits_record_checkpoint():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    summary = allocate_inventory(db, "FIFO", commit_orders=3)
+
+    assert (summary["items"], summary["orders"], summary["commits"], summary["remaining_items"]) == (3, 6, 2, 0)
+    assert all(order.allocated for order in db.query(Order))
+    assert db.query(AllocationResult).count() == 6
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [0, 0, 0]
+    checkpoint = db.query(AllocationCheckpoint).one()
+    assert (checkpoint.strategy, checkpoint.partition, checkpoint.max_order_id) == ("FIFO", "*", 6)
+    assert (checkpoint.status, checkpoint.last_item_code, checkpoint.items, checkpoint.orders) == (COMPLETED, "CCC", 3, 6)
+    cleanup(db)
+    db.close()
+
+def test_resume_after_failure(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+    allocate_orders = allocation.allocate_orders
+
+    def fail_on_second_item(db, allocation_strategy, orders, *args):
+        if orders[0].item_code == "BBB":
+            raise RuntimeError("crash")
+        return allocate_orders(db, allocation_strategy, orders, *args)
+
+    monkeypatch.setattr(allocation, "allocate_orders", fail_on_second_item)
+    with pytest.raises(RuntimeError):
+        allocate_inventory(db, "FIFO", commit_orders=1)
+    db.rollback()
+
+    # 最初の区切りはコミット済み
+    checkpoint = db.query(AllocationCheckpoint).one()
+    assert (checkpoint.status, checkpoint.last_item_code, checkpoint.items, checkpoint.orders) == (RUNNING, "AAA", 1, 2)
+    assert [order.allocated for order in db.query(Order).order_by(Order.id)] == [True, True, False, False, False, False]
+
+    # 中断後に登録された注文は再開した実行の対象に含めない
+    db.add(Order(id=7, item_code="CCC", quantity=1, allocated=False))
+    db.commit()
+    monkeypatch.setattr(allocation, "allocate_orders", allocate_orders)
+    summary = allocate_inventory(db, "FIFO", commit_orders=1, resume=True)
+
+    assert (summary["items"], summary["orders"], summary["commits"]) == (2, 4, 2)
+    assert db.query(AllocationCheckpoint).count() == 1
+    checkpoint = db.query(AllocationCheckpoint).one()
+    assert (checkpoint.status, checkpoint.last_item_code, checkpoint.items, checkpoint.orders) == (COMPLETED, "CCC", 3, 6)
+    assert [order.allocated for order in db.query(Order).order_by(Order.id)] == [True] * 6 + [False]
+    cleanup(db)
+    db.close()
+
+def test_commit_seconds_commits_each_item():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    summary = allocate_inventory(db, "FIFO", commit_seconds=1e-9)
+
+    assert (summary["items"], summary["commits"], summary["remaining_items"]) == (3, 3, 0)
+    assert db.query(AllocationCheckpoint).one().status == COMPLETED
+    assert all(order.allocated for order in db.query(Order))
+    cleanup(db)
+    db.close()
+
+def test_commit_seconds_bounds_orders_per_partition(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+    monkeypatch.setattr(checkpoints, "ALLOCATION_COMMIT_ORDERS_DEFAULT", 2)
+
+    # 処理時間の目安に達しなくても、1区切りの注文数は既定の上限まで
+    summary = allocate_inventory(db, "FIFO", commit_seconds=3600)
+
+    assert (summary["items"], summary["commits"], summary["remaining_items"]) == (3, 3, 0)
+    assert all(order.allocated for order in db.query(Order))
+
+    # 再開のみの指定も同じ上限で区切る
+    db.add_all([Order(id=7 + index, item_code=item_code, quantity=1, allocated=False) for index, item_code in enumerate(["AAA", "AAA", "BBB", "BBB"])])
+    db.commit()
+    summary = allocate_inventory(db, "FIFO", resume=True)
+    assert (summary["items"], summary["commits"]) == (2, 2)
+    cleanup(db)
+    db.close()
+
+def test_chunked_run_loads_bounded_keys_per_partition(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    for index in range(10):
+        db.add(Order(id=index + 1, item_code=f"ITEM{index}", quantity=1, allocated=False))
+        db.add(Inventory(id=index + 1, item_code=f"ITEM{index}", quantity=1, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+
+    # 区切りごとに取得した商品のキーと注文の件数を記録する
+    query_open_item_counts = allocation.query_open_item_counts
+    query_open_orders = allocation.query_open_orders
+    keys, loaded = [], []
+
+    def count_keys(*args, **kwargs):
+        rows = query_open_item_counts(*args, **kwargs).all()
+        keys.append(len(rows))
+        return SimpleNamespace(all=lambda: rows)
+
+    def count_orders(*args, **kwargs):
+        orders = query_open_orders(*args, **kwargs).all()
+        loaded.append(len(orders))
+        return SimpleNamespace(all=lambda: orders)
+
+    monkeypatch.setattr(allocation, "query_open_item_counts", count_keys)
+    monkeypatch.setattr(allocation, "query_open_orders", count_orders)
+    summary = allocate_inventory(db, "FIFO", commit_orders=3)
+
+    # 注文のキーを一括取得せず、区切りごとに目安の注文数 + 1 件までを取得する
+    assert (summary["items"], summary["commits"], summary["remaining_items"]) == (10, 4, 0)
+    assert keys == [4, 4, 4, 1]
+    assert loaded == [3, 3, 3, 1]
+    assert db.query(AllocationCheckpoint).one().status == COMPLETED
+    assert all(order.allocated for order in db.query(Order))
+    cleanup(db)
+    db.close()
+
+def test_main_time_slice_picks_up_new_orders(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    for index, item_code in enumerate(["AAA", "BBB", "CCC", "DDD"]):
+        db.add(Order(id=index + 1, item_code=item_code, quantity=1, allocated=False))
+        db.add(Inventory(id=index + 1, item_code=item_code, quantity=1, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+
+    calls = []
+
+    def allocate_and_receive_order(*args, **kwargs):
+        calls.append(kwargs["resume"])
+        summary = allocate_inventory(*args, **kwargs)
+        if len(calls) == 2:
+            # 2回目の時間枠の後に優先度の高い注文が登録される
+            db.add(Order(id=5, item_code="EEE", quantity=1, allocated=False, priority=100))
+            db.add(Inventory(id=5, item_code="EEE", quantity=1, unit_price=10, receipt_date=date(2024, 1, 1)))
+            db.commit()
+        return summary
+
+    monkeypatch.setattr(allocation, "allocate_inventory", allocate_and_receive_order)
+    monkeypatch.setattr(allocation, "configure_logging", lambda: None)
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(sys, "argv", ["allocation.py", "--strategy", "FIFO", "--time-slice", "1e-9"])
+    allocation.main()
+
+    # 時間枠のみの実行はチェックポイントを使わず、毎回注文を読み直す
+    assert calls == [False] * 5
+    assert db.query(AllocationCheckpoint).count() == 0
+    assert all(order.allocated for order in db.query(Order))
+    cleanup(db)
+    db.close()
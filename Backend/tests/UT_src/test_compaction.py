@@ -0,0 +1,115 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from datetime import datetime, timedelta
+from models import Order, Inventory, AllocationResult, InventorySummary, InventoryArchive, Backorder
+from allocation import allocate_inventory, load_inventories_by_item
+from compaction import compact_depleted_lots
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.query(InventoryArchive).delete()
+    db.commit()
+
+def test_allocation_marks_depleted_lots():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add(Order(id=1, item_code="ABC123", quantity=5, allocated=False))
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=6, unit_price=12),
+    ])
+    db.commit()
+
+    allocate_inventory(db, "FIFO")
+
+    depleted, remaining = db.query(Inventory).order_by(Inventory.id).all()
+    assert depleted.quantity == 0
+    assert depleted.depleted_at is not None
+    assert remaining.quantity == 5
+    assert remaining.depleted_at is None
+
+def test_depleted_lots_are_not_loaded():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add(Order(id=1, item_code="ABC123", quantity=1, allocated=False))
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=0, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=0, unit_price=11),
+        Inventory(id=3, item_code="ABC123", quantity=3, unit_price=12),
+    ])
+    db.commit()
+
+    inventories_by_item = load_inventories_by_item(db)
+    assert [inventory.id for inventory in inventories_by_item["ABC123"]] == [3]
+
+    # 使い切ったロットに対する割り当て結果（数量0）は作成されない
+    allocate_inventory(db, "FIFO")
+    results = db.query(AllocationResult).all()
+    assert [(r.allocated_quantity, r.allocated_price) for r in results] == [(1, 12)]
+
+def test_moving_average_without_live_lots():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add(Order(id=1, item_code="ABC123", quantity=2, allocated=False))
+    db.add(Inventory(id=1, item_code="ABC123", quantity=0, unit_price=10))
+    db.commit()
+
+    allocate_inventory(db, "MOVING_AVERAGE")
+
+    # 引き当てられなかった数量はバックオーダーに登録する
+    result = db.query(AllocationResult).one()
+    assert result.allocated_quantity == 0
+    assert result.allocated_price == 0
+    assert db.query(Backorder).one().remaining_quantity == 2
+
+def test_compact_depleted_lots_moves_to_archive():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=0, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=5, unit_price=11),
+        Inventory(id=3, item_code="XYZ789", quantity=0, unit_price=12),
+        Inventory(id=4, item_code="XYZ789", quantity=0, unit_price=13),
+    ])
+    db.commit()
+
+    assert compact_depleted_lots(db, batch_size=2) == 3
+
+    assert [inventory.id for inventory in db.query(Inventory).all()] == [2]
+    archives = db.query(InventoryArchive).order_by(InventoryArchive.id).all()
+    assert [(a.id, a.item_code, a.unit_price) for a in archives] == [(1, "ABC123", 10), (3, "XYZ789", 12), (4, "XYZ789", 13)]
+    assert all(a.archived_at is not None for a in archives)
+
+    # 対象が無い場合は何もしない
+    assert compact_depleted_lots(db) == 0
+
+def test_compact_depleted_lots_respects_min_age():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    now = datetime.utcnow()
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=0, unit_price=10, depleted_at=now - timedelta(days=2)),
+        Inventory(id=2, item_code="ABC123", quantity=0, unit_price=11, depleted_at=now),
+        Inventory(id=3, item_code="ABC123", quantity=0, unit_price=12, depleted_at=None),
+    ])
+    db.commit()
+
+    assert compact_depleted_lots(db, min_age=timedelta(days=1)) == 2
+    assert [inventory.id for inventory in db.query(Inventory).all()] == [2]
@@ -0,0 +1,107 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import asyncio
+import csv
+import io
+import json
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Order, Inventory, AllocationResult
+from allocation import allocate_inventory
+from lot_cache import lot_cache
+from export import build_export_query, iter_export
+from app import export_allocation_results
+from database import Base
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    ファイルのSQLiteデータベースのセッションを返す
+    （同期ジェネレータの本文はスレッドプールで読み出されるため、スレッドごとに別のデータベースとなるインメモリは使用しない）
+    """
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=file_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)()
+    yield db
+    db.close()
+    file_engine.dispose()
+
+def seed(db):
+    db.add_all([
+        AllocationResult(id=i, order_id=i, item_code="ABC123" if i % 2 else "XYZ789", allocated_quantity=i, allocated_price=i * 10.5, allocation_date=date(2024, 1, i))
+        for i in range(1, 8)
+    ])
+    db.commit()
+
+def read_body(response):
+    """
+    ストリーミングレスポンスの本文を読み出す
+    """
+    async def collect():
+        return "".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+def export(db, export_format="ndjson", fields=None, after_id=None, item_code=None, date_from=None, date_to=None):
+    # エンドポイント関数を直接呼び出すため、Query() の既定値を使わずに全引数を指定する
+    return export_allocation_results(export_format=export_format, fields=fields, after_id=after_id, item_code=item_code,
+                                     date_from=date_from, date_to=date_to, db=db, token_payload=None)
+
+def test_export_ndjson(db):
+    seed(db)
+
+    response = export(db, item_code="ABC123", date_to=date(2024, 1, 5))
+    assert response.media_type == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="allocation_results.ndjson"'
+
+    rows = [json.loads(line) for line in read_body(response).splitlines()]
+    assert [row["id"] for row in rows] == [1, 3, 5]
+    assert rows[0] == {"id": 1, "order_id": 1, "item_code": "ABC123", "allocated_quantity": 1, "allocated_price": 10.5, "allocation_date": "2024-01-01"}
+
+def test_export_csv_with_fields(db):
+    seed(db)
+
+    response = export(db, export_format="csv", fields="allocated_quantity,allocation_date", after_id=5)
+    assert response.media_type == "text/csv"
+    rows = list(csv.reader(io.StringIO(read_body(response))))
+    assert rows == [["id", "allocated_quantity", "allocation_date"], ["6", "6", "2024-01-06"], ["7", "7", "2024-01-07"]]
+
+def test_export_streams_in_batches(db):
+    seed(db)
+
+    query, names = build_export_query(AllocationResult, batch_size=3)
+    assert query.get_execution_options()["stream_results"] is True
+    assert query.get_execution_options()["yield_per"] == 3
+
+    # 見出し行 + 3行ずつのまとまり（3, 3, 1行）
+    chunks = list(iter_export(db, query, names, "csv"))
+    assert [chunk.count("\n") for chunk in chunks] == [1, 3, 3, 1]
+
+def test_export_rejects_unknown_format(db):
+    with pytest.raises(HTTPException) as error:
+        export(db, export_format="xlsx")
+    assert error.value.status_code == 400
+
+def test_export_filters_include_batch_allocation_results(db):
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=2, allocated=False),
+        Order(id=2, item_code="XYZ789", quantity=1, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="XYZ789", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+    ])
+    db.commit()
+    allocate_inventory(db, "FIFO")
+    lot_cache.invalidate()
+
+    # 一括割当の割り当て結果も商品コード・割当日で絞り込んで出力される
+    response = export(db, item_code="XYZ789", date_from=date.today())
+    rows = [json.loads(line) for line in read_body(response).splitlines()]
+    assert [(row["order_id"], row["item_code"], row["allocation_date"]) for row in rows] == [(2, "XYZ789", date.today().isoformat())]
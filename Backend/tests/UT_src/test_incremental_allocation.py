@@ -0,0 +1,148 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import json
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+from models import Order, Inventory, AllocationResult, InventorySummary, AllocationOutbox, Backorder
+from schemas import OrderRequest, InventoryRequest
+from app import create_order, register_inventory
+from bulk import ingest_orders
+from outbox import ORDER_CREATED, INVENTORY_RECEIVED
+from incremental_allocation import allocate_pending, run_worker
+import incremental_allocation
+import allocation
+from allocation import reserve_lot
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.query(AllocationOutbox).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def test_endpoints_record_events():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    order = create_order(OrderRequest(item_code="ABC123", quantity=3), db=db, token_payload=None)
+    inventory = register_inventory(db, InventoryRequest(item_code="XYZ789", quantity=5, receipt_date="2023-06-01", unit_price=10))
+    ingest_orders(db, json.dumps([{"item_code": "DEF456", "quantity": 1}]).encode(), "application/json")
+
+    events = db.query(AllocationOutbox).order_by(AllocationOutbox.id).all()
+    assert [(event.event_type, event.item_code) for event in events] == [
+        (ORDER_CREATED, "ABC123"),
+        (INVENTORY_RECEIVED, "XYZ789"),
+        (ORDER_CREATED, "DEF456"),
+    ]
+    assert events[0].entity_id == order.id
+    assert events[1].entity_id == inventory.id
+    cleanup(db)
+    db.close()
+
+def test_allocate_pending_only_touches_affected_items():
+    db = TestingSessionLocal()
+    cleanup(db)
+    # 既存の未割当の注文（イベントなし）は差分割当の対象にならない
+    db.add(Order(item_code="OLD001", quantity=1, allocated=False))
+    db.add(Inventory(item_code="OLD001", quantity=5, unit_price=10))
+    db.commit()
+
+    create_order(OrderRequest(item_code="ABC123", quantity=3), db=db, token_payload=None)
+    create_order(OrderRequest(item_code="ABC123", quantity=2), db=db, token_payload=None)
+    register_inventory(db, InventoryRequest(item_code="ABC123", quantity=10, receipt_date="2023-06-01", unit_price=10))
+
+    summary = allocate_pending(db, "FIFO")
+    assert summary["events"] == 3
+    assert summary["item_codes"] == 1
+    assert summary["orders"] == 2
+
+    assert db.query(AllocationOutbox).count() == 0
+    assert db.query(Order).filter(Order.item_code == "OLD001").one().allocated is False
+    assert all(order.allocated for order in db.query(Order).filter(Order.item_code == "ABC123"))
+    # 未処理のイベントがない場合は何もしない
+    assert allocate_pending(db, "FIFO") is None
+    cleanup(db)
+    db.close()
+
+def test_allocate_pending_batch_size():
+    db = TestingSessionLocal()
+    cleanup(db)
+    for item_code in ("ABC123", "DEF456", "XYZ789"):
+        create_order(OrderRequest(item_code=item_code, quantity=1), db=db, token_payload=None)
+
+    summary = allocate_pending(db, "FIFO", batch_size=2)
+    assert (summary["events"], summary["item_codes"]) == (2, 2)
+    assert [event.item_code for event in db.query(AllocationOutbox)] == ["XYZ789"]
+
+    assert run_worker(TestingSessionLocal, "FIFO", once=True) == 1
+    assert db.query(AllocationOutbox).count() == 0
+    cleanup(db)
+    db.close()
+
+def test_allocate_pending_keeps_events_on_failure(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    create_order(OrderRequest(item_code="ABC123", quantity=1), db=db, token_payload=None)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("allocation failed")
+    monkeypatch.setattr(incremental_allocation, "allocate_inventory", fail)
+    with pytest.raises(RuntimeError):
+        allocate_pending(db, "FIFO")
+
+    # 割り当てに失敗した場合はイベントの削除もロールバックされ、次回に再処理される
+    assert db.query(AllocationOutbox).count() == 1
+    cleanup(db)
+    db.close()
+
+def test_worker_retries_after_conflict_with_allocate_api(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    create_order(OrderRequest(item_code="ABC123", quantity=2), db=db, token_payload=None)
+    inventory = register_inventory(db, InventoryRequest(item_code="ABC123", quantity=10, receipt_date="2023-06-01", unit_price=10))
+    load_summaries = allocation.load_summaries
+    collisions = []
+
+    def reserve_after_load(session, item_codes):
+        # ワーカーが在庫を読み込んだ後に割当APIが同じロットを引き当てる（在庫のバージョンが加算される）
+        if not collisions:
+            collisions.append(reserve_lot(session, "ABC123", inventory.id, 1, 10))
+        return load_summaries(session, item_codes)
+
+    monkeypatch.setattr(allocation, "load_summaries", reserve_after_load)
+    assert run_worker(lambda: db, "FIFO", once=True) == 2
+
+    # 1回目は StaleDataError でロールバックされ、イベントを再処理して割り当てる
+    assert collisions == [True]
+    assert db.query(AllocationOutbox).count() == 0
+    order = db.query(Order).one()
+    assert (order.allocated, order.allocated_quantity) == (True, 2)
+    cleanup(db)
+    db.close()
+
+def test_worker_gives_up_after_repeated_conflicts(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    create_order(OrderRequest(item_code="ABC123", quantity=1), db=db, token_payload=None)
+
+    def conflict(*args, **kwargs):
+        raise StaleDataError("conflict")
+    monkeypatch.setattr(incremental_allocation, "allocate_inventory", conflict)
+    monkeypatch.setattr(incremental_allocation, "OUTBOX_MAX_RETRIES", 2)
+    with pytest.raises(StaleDataError):
+        run_worker(TestingSessionLocal, "FIFO", once=True)
+    assert db.query(AllocationOutbox).count() == 1
+    cleanup(db)
+    db.close()
@@ -0,0 +1,173 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import pytest
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory, allocate_average
+from inventory_summary import get_summary, ensure_summaries, apply_receipt, apply_consumption, deplete_lot, rebuild_summaries, average_price
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+
+def summary_values(summary):
+    return (summary.total_quantity, summary.total_value, summary.lot_count)
+
+def test_get_summary_builds_from_inventories():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(item_code="ABC123", quantity=0, unit_price=99),
+        Inventory(item_code="ABC123", quantity=6, unit_price=12),
+    ])
+    db.commit()
+
+    summary = get_summary(db, "ABC123")
+    assert summary_values(summary) == (10, 112, 2)
+    assert average_price(summary) == pytest.approx(11.2)
+
+    # 在庫の無い商品は空の集計を作成する
+    assert summary_values(get_summary(db, "NONE")) == (0, 0, 0)
+    assert average_price(get_summary(db, "NONE")) == 0
+
+def test_apply_receipt_and_deplete_lot():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    # 在庫の無い商品の集計は入荷時に作成する
+    inventory = Inventory(item_code="ABC123", quantity=5, unit_price=20)
+    db.add(inventory)
+    apply_receipt(db, "ABC123", 5, 20)
+    summary = get_summary(db, "ABC123")
+    assert summary_values(summary) == (5, 100, 1)
+
+    deplete_lot(inventory, 3, summary)
+    assert inventory.quantity == 2
+    assert summary_values(summary) == (2, 40, 1)
+
+    # ロットを使い切った場合はロット数を減らす
+    deplete_lot(inventory, 2, summary)
+    assert inventory.quantity == 0
+    assert summary_values(summary) == (0, 0, 0)
+
+def test_concurrent_receipts_and_consumption_are_not_lost():
+    db = TestingSessionLocal()
+    other = TestingSessionLocal()
+    cleanup(db)
+    db.add(Inventory(item_code="ABC123", quantity=10, unit_price=10))
+    db.commit()
+
+    # 両方のセッションが集計を読み込んだ後に入荷・引当を反映しても、加算・減算のため更新が失われない
+    stale = get_summary(db, "ABC123")
+    get_summary(other, "ABC123")
+    apply_receipt(other, "ABC123", 5, 20)
+    other.commit()
+    apply_receipt(db, "ABC123", 3, 10)
+    apply_consumption(db, "ABC123", 4, 40)
+    db.commit()
+    assert summary_values(stale) == (10, 100, 1)
+    assert summary_values(get_summary(db, "ABC123")) == (14, 190, 3)
+
+    # 同時に作成しても一方の行が残る（主キーの重複エラーにならない）
+    ensure_summaries(db, ["ABC123"])
+    ensure_summaries(other, ["ABC123"])
+    db.commit()
+    other.commit()
+    assert db.query(InventorySummary).count() == 1
+    assert summary_values(get_summary(db, "ABC123")) == (14, 190, 3)
+    cleanup(db)
+    other.close()
+    db.close()
+
+def test_allocation_does_not_overwrite_concurrent_receipt():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add(Order(id=1, item_code="ABC123", quantity=4, allocated=False))
+    db.add(Inventory(item_code="ABC123", quantity=10, unit_price=10))
+    db.commit()
+    get_summary(db, "ABC123")
+    db.commit()
+
+    # 一括割当が集計を読み込んだ後にAPIの入荷が反映された場合も、一括割当は引当数量のみを減算する
+    import allocation
+    load_summaries = allocation.load_summaries
+
+    def receive_after_load(db, item_codes):
+        summaries = load_summaries(db, item_codes)
+        other = TestingSessionLocal()
+        apply_receipt(other, "ABC123", 5, 20)
+        other.commit()
+        other.close()
+        return summaries
+
+    allocation.load_summaries = receive_after_load
+    try:
+        allocate_inventory(db, "FIFO")
+    finally:
+        allocation.load_summaries = load_summaries
+    assert summary_values(get_summary(db, "ABC123")) == (11, 160, 2)
+    cleanup(db)
+    db.close()
+
+@pytest.mark.parametrize("strategy", ["FIFO", "LIFO", "AVERAGE", "SPECIFIC", "TOTAL_AVERAGE", "MOVING_AVERAGE"])
+def test_allocation_keeps_summary_in_sync(strategy):
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=5, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=3, allocated=False),
+        Order(id=3, item_code="XYZ789", quantity=2, allocated=False),
+    ])
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(item_code="ABC123", quantity=6, unit_price=12),
+        Inventory(item_code="XYZ789", quantity=1, unit_price=30),
+        Inventory(item_code="XYZ789", quantity=3, unit_price=31),
+    ])
+    db.commit()
+
+    allocate_inventory(db, strategy)
+
+    # 引当後の集計は在庫テーブルから再集計した値と一致する
+    maintained = {s.item_code: summary_values(s) for s in db.query(InventorySummary).all()}
+    rebuild_summaries(db)
+    db.commit()
+    rebuilt = {s.item_code: summary_values(s) for s in db.query(InventorySummary).all()}
+    assert maintained.keys() == rebuilt.keys()
+    for item_code, (total_quantity, total_value, lot_count) in rebuilt.items():
+        assert maintained[item_code][0] == total_quantity
+        assert maintained[item_code][1] == pytest.approx(total_value)
+        assert maintained[item_code][2] == lot_count
+
+def test_allocate_average_reads_summary():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    order = Order(id=1, item_code="DEF456", quantity=2, allocated=False)
+    inventory = Inventory(item_code="DEF456", quantity=10, unit_price=20)
+    db.add_all([order, inventory])
+    db.commit()
+
+    # 平均単価は在庫リストではなく在庫集計から取得する
+    summary = InventorySummary(item_code="DEF456", total_quantity=10, total_value=250, lot_count=1)
+    allocate_average(db, order, [inventory], summary=summary)
+    db.commit()
+
+    result = db.query(AllocationResult).first()
+    assert result.allocated_price == 50
+    assert inventory.quantity == 8
+    assert summary_values(summary) == (8, 210, 1)
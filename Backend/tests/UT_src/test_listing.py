@@ -0,0 +1,194 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import json
+from datetime import date
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from lot_cache import lot_cache
+from listing import NEXT_CURSOR_HEADER, build_list_query
+import app as app_module
+from app import app, read_orders, read_inventories, read_allocation_results
+from database import Base, TestingSessionLocal, engine, get_db
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def list_orders(db, response, after_id=None, limit=100, fields=None, item_code=None, allocated=None):
+    # エンドポイント関数を直接呼び出すため、Query() の既定値を使わずに全引数を指定する
+    return read_orders(response, after_id=after_id, limit=limit, fields=fields, item_code=item_code, allocated=allocated, db=db, token_payload=None)
+
+def test_orders_keyset_pagination():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Order(id=i, item_code="ABC123", quantity=i, allocated=False) for i in range(1, 6)])
+    db.commit()
+
+    response = Response()
+    page = list_orders(db, response, limit=2)
+    assert [order.id for order in page] == [1, 2]
+    assert response.headers[NEXT_CURSOR_HEADER] == "2"
+
+    response = Response()
+    page = list_orders(db, response, after_id=4, limit=2)
+    assert [order.id for order in page] == [5]
+    # 最終ページには次のカーソルを付与しない
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+def test_orders_filters():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=1, allocated=False),
+        Order(id=2, item_code="XYZ789", quantity=1, allocated=True),
+        Order(id=3, item_code="ABC123", quantity=1, allocated=True),
+    ])
+    db.commit()
+
+    assert [order.id for order in list_orders(db, Response(), item_code="ABC123")] == [1, 3]
+    assert [order.id for order in list_orders(db, Response(), allocated=True)] == [2, 3]
+    assert [order.id for order in list_orders(db, Response(), item_code="ABC123", allocated=False)] == [1]
+
+def test_fields_projection_returns_only_requested_columns():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Order(id=i, item_code="ABC123", quantity=i, allocated=False) for i in range(1, 4)])
+    db.commit()
+
+    response = list_orders(db, Response(), limit=2, fields="quantity")
+    assert isinstance(response, JSONResponse)
+    assert json.loads(response.body) == [{"id": 1, "quantity": 1}, {"id": 2, "quantity": 2}]
+    assert response.headers[NEXT_CURSOR_HEADER] == "2"
+
+    # 射影したカラムのみをSELECTする
+    sql = str(build_list_query(Order, fields="item_code,quantity"))
+    assert "allocated" not in sql and "version" not in sql
+
+    with pytest.raises(HTTPException) as error:
+        list_orders(db, Response(), fields="quantity,secret")
+    assert error.value.status_code == 400
+
+def test_date_range_filters():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=1, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="ABC123", quantity=1, unit_price=10, receipt_date=date(2024, 2, 1)),
+        Inventory(id=3, item_code="XYZ789", quantity=1, unit_price=10, receipt_date=date(2024, 3, 1)),
+    ])
+    db.add_all([
+        AllocationResult(id=1, order_id=1, item_code="ABC123", allocated_quantity=1, allocated_price=10, allocation_date=date(2024, 1, 15)),
+        AllocationResult(id=2, order_id=2, item_code="ABC123", allocated_quantity=1, allocated_price=10, allocation_date=date(2024, 2, 15)),
+    ])
+    db.commit()
+
+    inventories = read_inventories(Response(), after_id=None, limit=100, fields="receipt_date", item_code=None,
+                                   date_from=date(2024, 1, 15), date_to=date(2024, 3, 1), db=db, token_payload=None)
+    assert json.loads(inventories.body) == [{"id": 2, "receipt_date": "2024-02-01"}, {"id": 3, "receipt_date": "2024-03-01"}]
+
+    results = read_allocation_results(Response(), after_id=None, limit=100, fields=None, item_code="ABC123",
+                                      date_from=None, date_to=date(2024, 1, 31), db=db, token_payload=None)
+    assert [result.id for result in results] == [1]
+
+    with pytest.raises(HTTPException):
+        build_list_query(Order, date_from=date(2024, 1, 1))
+    with pytest.raises(HTTPException):
+        build_list_query(Inventory, allocated=True)
+
+def test_filters_include_batch_allocation_results():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=2, allocated=False),
+        Order(id=2, item_code="XYZ789", quantity=1, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="XYZ789", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+    ])
+    db.commit()
+    allocate_inventory(db, "FIFO")
+
+    # 一括割当のライタで書き込んだ割り当て結果も商品コード・割当日で絞り込める
+    results = read_allocation_results(Response(), after_id=None, limit=100, fields=None, item_code="ABC123",
+                                      date_from=date.today(), date_to=date.today(), db=db, token_payload=None)
+    assert [(result.order_id, result.item_code, result.allocation_date) for result in results] == [(1, "ABC123", date.today())]
+    cleanup(db)
+    db.close()
+
+@pytest.fixture
+def http_session(monkeypatch):
+    """
+    認証を通過するテストクライアントと、その要求と共有するデータベースのセッションファクトリを返す
+    （エンドポイントは別スレッドで実行されるため、1つの接続を共有するインメモリのデータベースを使用する）
+    """
+    shared_engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=shared_engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=shared_engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(app_module, "authenticate_token", lambda token: SimpleNamespace(sub="test"))
+    yield TestClient(app, headers={"Authorization": "Bearer test"}), SessionLocal
+    app.dependency_overrides.pop(get_db, None)
+    shared_engine.dispose()
+
+def test_list_endpoints_over_http(http_session):
+    client, SessionLocal = http_session
+    db = SessionLocal()
+    db.add_all([Order(id=i, item_code="ABC123", quantity=i, allocated=False, due_date=date(2024, 3, i)) for i in range(1, 4)])
+    db.add(Inventory(id=1, item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.add_all([
+        AllocationResult(id=i, order_id=i, item_code="ABC123", allocated_quantity=1, allocated_price=10, allocation_date=date(2024, 2, i))
+        for i in range(1, 4)
+    ])
+    db.commit()
+
+    # レスポンスモデルで検証したモデルの一覧を返す
+    response = client.get("/orders", params={"limit": 2})
+    assert response.status_code == 200
+    assert [(order["id"], order["quantity"], order["due_date"]) for order in response.json()] == [(1, 1, "2024-03-01"), (2, 2, "2024-03-02")]
+    assert response.headers[NEXT_CURSOR_HEADER] == "2"
+    response = client.get("/orders", params={"after_id": 2, "limit": 2})
+    assert [order["id"] for order in response.json()] == [3]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    response = client.get("/allocation-results", params={"limit": 2, "date_from": "2024-02-02"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": 2, "order_id": 2, "item_code": "ABC123", "allocated_quantity": 1, "allocated_price": 10.0, "allocation_date": "2024-02-02"},
+        {"id": 3, "order_id": 3, "item_code": "ABC123", "allocated_quantity": 1, "allocated_price": 10.0, "allocation_date": "2024-02-03"},
+    ]
+    assert response.headers[NEXT_CURSOR_HEADER] == "3"
+
+    response = client.get("/inventories")
+    assert response.status_code == 200
+    assert [(inventory["id"], inventory["receipt_date"]) for inventory in response.json()] == [(1, "2024-01-01")]
+    assert NEXT_CURSOR_HEADER not in response.headers
+    db.close()
@@ -0,0 +1,103 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import logging
+import threading
+import pytest
+import allocation
+import log_config
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+@pytest.fixture
+def allocation_log():
+    """
+    allocation のロガーの出力を記録する（レベルはテストごとに設定する）
+    """
+    handler = RecordingHandler()
+    logger = logging.getLogger("allocation")
+    level = logger.level
+    logger.addHandler(handler)
+    yield logger, handler
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+def seed(db, orders: int):
+    db.add_all([Order(id=i, item_code=f"ITEM{i % 3}", quantity=1, allocated=False) for i in range(1, orders + 1)])
+    db.add_all([Inventory(item_code=f"ITEM{i}", quantity=orders, unit_price=10) for i in range(3)])
+    db.commit()
+
+def test_queue_handler_writes_from_listener_thread():
+    target = RecordingHandler()
+    logger = logging.getLogger("test_log_config.queue")
+    logger.propagate = False
+    handler = log_config.queue_handler(target)
+    logger.addHandler(handler)
+    try:
+        logger.warning("value=%d", 42)
+        log_config.flush()
+    finally:
+        logger.removeHandler(handler)
+
+    assert [record.getMessage() for record in target.records] == ["value=42"]
+    assert threading.current_thread().name not in target.threads
+
+def test_info_logs_only_progress_and_summary(allocation_log, monkeypatch):
+    logger, handler = allocation_log
+    logger.setLevel(logging.INFO)
+    monkeypatch.setattr(allocation, "ALLOCATION_LOG_INTERVAL", 4)
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db, 9)
+
+    allocate_inventory(db, "FIFO")
+
+    messages = [record.getMessage() for record in handler.records]
+    assert messages[0] == "Starting inventory allocation with strategy: FIFO"
+    assert messages[-1].startswith("Inventory allocation completed: ")
+    # 注文ごとの行は出力せず、4件ごとの進捗のみを出力する（商品単位で判定するため商品の区切りで出力される）
+    progress = messages[1:-1]
+    assert len(progress) == 2
+    assert all(message.startswith("Allocated ") for message in progress)
+    assert not any(record.levelno == logging.DEBUG for record in handler.records)
+
+def test_debug_logs_each_order_lazily(allocation_log):
+    logger, handler = allocation_log
+    logger.setLevel(logging.DEBUG)
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db, 3)
+
+    allocate_inventory(db, "FIFO")
+
+    processing = [record for record in handler.records if record.msg.startswith("Processing order")]
+    assert len(processing) == 3
+    # メッセージは出力時に % で組み立てる（引数のまま渡す）
+    assert processing[0].args == (3, "ITEM0", 1)
@@ -0,0 +1,204 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import threading
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from lot_cache import InventoryLotCache, LotQueue, LotRecord, ORDER_BY_ID, ORDER_BY_RECEIPT_DATE, lot_cache
+from schemas import AllocationRequest
+from app import allocate_inventory as allocate_endpoint
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+class SelectCounter:
+    """
+    発行されたSELECT文を記録する
+    """
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(engine, "before_cursor_execute", self)
+
+def test_lot_queue_id_ordering():
+    queue = LotQueue(ORDER_BY_ID, [LotRecord(1, 5, 10), LotRecord(3, 2, 12), LotRecord(4, 0, 13)])
+    queue.add(LotRecord(2, 4, 11))
+
+    assert [record.id for record in queue] == [1, 2, 3]
+    assert queue.first().id == 1
+    assert queue.last().id == 3
+    assert queue.first_fit(4).id == 1
+
+    queue.consume(1, 5)
+    assert queue.first().id == 2
+    assert len(queue) == 2
+
+def test_lot_queue_receipt_date_ordering():
+    queue = LotQueue(ORDER_BY_RECEIPT_DATE, [
+        LotRecord(1, 5, 10, date(2024, 3, 1)),
+        LotRecord(2, 2, 11, date(2024, 1, 1)),
+        LotRecord(3, 8, 12, date(2024, 2, 1)),
+    ])
+
+    assert [record.id for record in queue] == [2, 3, 1]
+    assert queue.first().id == 2
+    assert queue.first_fit(3).id == 3
+    assert queue.first_fit(9) is None
+
+    queue.consume(2, 2)
+    assert queue.first().id == 3
+    assert len(queue) == 2
+    with pytest.raises(ValueError):
+        queue.last()
+
+def test_cache_hit_does_not_query_database():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 2)),
+        Inventory(item_code="ABC123", quantity=3, unit_price=11, receipt_date=date(2024, 1, 1)),
+    ])
+    db.commit()
+
+    cache = InventoryLotCache(max_lots=100)
+    with SelectCounter() as counter:
+        cache.get(db, "ABC123")
+        cache.get(db, "ABC123")
+        cache.get(db, "ABC123")
+    assert len(counter.statements) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert [record.unit_price for record in cache.get(db, "ABC123")] == [11, 10]
+
+def test_cache_add_lot_and_consume_keep_entries_coherent():
+    db = TestingSessionLocal()
+    cleanup(db)
+    inventory = Inventory(item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 2))
+    db.add(inventory)
+    db.commit()
+
+    cache = InventoryLotCache(max_lots=100)
+    by_date = cache.get(db, "ABC123", ORDER_BY_RECEIPT_DATE)
+    by_id = cache.get(db, "ABC123", ORDER_BY_ID)
+
+    received = Inventory(item_code="ABC123", quantity=4, unit_price=9, receipt_date=date(2024, 1, 1))
+    db.add(received)
+    db.commit()
+    cache.add_lot(received)
+    assert by_date.first().id == received.id
+    assert by_id.last().id == received.id
+    assert cache.size == 4
+
+    cache.consume("ABC123", received.id, 4)
+    assert by_date.first().id == inventory.id
+    assert by_id.last().id == inventory.id
+    assert cache.size == 2
+
+def test_cache_lookups_run_under_lock():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=2, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="ABC123", quantity=6, unit_price=11, receipt_date=date(2024, 1, 2)),
+    ])
+    db.commit()
+    cache = InventoryLotCache(max_lots=100)
+    cache.get(db, "ABC123")
+
+    # 他のスレッドが並びを更新している間（ロックの保持中）は検索を待つ
+    results = []
+    with cache.lock:
+        thread = threading.Thread(target=lambda: results.append(cache.first_fit(db, "ABC123", 2)))
+        thread.start()
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+        cache.consume("ABC123", 1, 2)
+    thread.join()
+    assert [record.id for record in results] == [2]
+    assert cache.best_fit(db, "ABC123", 7) is None
+
+def test_cache_evicts_least_recently_used_items():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Inventory(item_code=f"ITEM{i}", quantity=1, unit_price=10) for i in range(3) for _ in range(2)])
+    db.commit()
+
+    cache = InventoryLotCache(max_lots=4)
+    cache.get(db, "ITEM0")
+    cache.get(db, "ITEM1")
+    cache.get(db, "ITEM0")
+    cache.get(db, "ITEM2")
+
+    # 上限（4ロット）を超えたため、最も古く使われたITEM1が破棄される
+    assert cache.size == 4
+    assert cache.evictions == 1
+    assert ("ITEM1", ORDER_BY_RECEIPT_DATE) not in cache.entries
+    assert ("ITEM0", ORDER_BY_RECEIPT_DATE) in cache.entries
+
+def test_allocate_endpoint_uses_cache_for_repeated_allocations():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Order(id=i, item_code="ABC123", quantity=1, allocated=False) for i in range(1, 4)])
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=2, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(item_code="ABC123", quantity=5, unit_price=12, receipt_date=date(2024, 1, 2)),
+    ])
+    db.commit()
+
+    request = AllocationRequest(order_id=1, item_code="ABC123", quantity=1, allocation_date="2024-02-01")
+    allocate_endpoint(1, request, db=db, token_payload=None)
+
+    with SelectCounter() as counter:
+        prices = [allocate_endpoint(order_id, request, db=db, token_payload=None).allocated_price for order_id in (2, 3)]
+    # 在庫の読み込みは発生しない（注文の取得と割当結果のrefreshのみ）
+    assert not any("FROM inventories" in statement for statement in counter.statements)
+    assert prices == [10, 12]
+
+    quantities = [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)]
+    assert quantities == [0, 4]
+
+def test_allocate_endpoint_reloads_stale_cache():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([Order(id=i, item_code="ABC123", quantity=3, allocated=False) for i in (1, 2)])
+    first = Inventory(item_code="ABC123", quantity=3, unit_price=10, receipt_date=date(2024, 1, 1))
+    second = Inventory(item_code="ABC123", quantity=3, unit_price=12, receipt_date=date(2024, 1, 2))
+    db.add_all([first, second])
+    db.commit()
+    lot_cache.get(db, "ABC123")
+
+    # 別のプロセスがキャッシュを経由せずに引き当てた状態
+    first.quantity = 0
+    db.commit()
+
+    request = AllocationRequest(order_id=1, item_code="ABC123", quantity=3, allocation_date="2024-02-01")
+    result = allocate_endpoint(1, request, db=db, token_payload=None)
+    assert result.allocated_price == 12
+
+    with pytest.raises(HTTPException) as error:
+        allocate_endpoint(2, request, db=db, token_payload=None)
+    assert error.value.status_code == 404
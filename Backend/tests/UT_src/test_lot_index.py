@@ -0,0 +1,120 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import random
+from datetime import date
+import pytest
+from lot_index import LotIndex, BEST_FIT, FIRST_FIT, linear_select
+from lot_cache import LotQueue, LotRecord, ORDER_BY_RECEIPT_DATE
+import allocation
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def lots_of(quantities):
+    return [LotRecord(i + 1, quantity, 10) for i, quantity in enumerate(quantities)]
+
+def test_best_fit_and_first_fit():
+    index = LotIndex(lots_of([5, 3, 8, 3, 0]))
+
+    assert index.best_fit(3).id == 2
+    assert index.best_fit(4).id == 1
+    assert index.best_fit(9) is None
+    assert index.first_fit(4).id == 1
+    assert index.first_fit(6).id == 3
+    assert index.first_fit(9) is None
+    assert len(index) == 4
+
+@pytest.mark.parametrize("selection", [BEST_FIT, FIRST_FIT])
+def test_matches_linear_scan_while_depleting(selection):
+    rng = random.Random(7)
+    lots = lots_of([rng.randint(0, 50) for _ in range(300)])
+    index = LotIndex(lots)
+    for _ in range(600):
+        quantity = rng.randint(1, 40)
+        expected = linear_select(lots, quantity, selection)
+        lot = index.select(quantity, selection)
+        assert lot is expected
+        if lot is not None:
+            lot.quantity -= quantity
+            index.update(lot)
+
+def test_add_grows_and_keeps_order():
+    index = LotIndex([], key=LotRecord.receipt_key)
+    for lot_id, day, quantity in [(1, 3, 5), (2, 5, 4), (3, 1, 6), (4, 2, 2), (5, 9, 7)]:
+        index.add(LotRecord(lot_id, quantity, 10, date(2024, 1, day)))
+
+    # 入荷日が途中のロットは並び順の正しい位置に入る
+    assert [lot.id for lot in index.lots] == [3, 4, 1, 2, 5]
+    assert index.first_fit(4).id == 3
+    assert index.first_fit(7).id == 5
+    assert index.best_fit(3).id == 2
+
+def test_unknown_selection():
+    with pytest.raises(ValueError):
+        LotIndex(lots_of([1])).select(1, "worst_fit")
+    with pytest.raises(ValueError):
+        linear_select(lots_of([1]), 1, "worst_fit")
+
+def test_lot_queue_uses_index_after_consume():
+    queue = LotQueue(ORDER_BY_RECEIPT_DATE, [
+        LotRecord(1, 5, 10, date(2024, 3, 1)),
+        LotRecord(2, 2, 11, date(2024, 1, 1)),
+        LotRecord(3, 8, 12, date(2024, 2, 1)),
+    ])
+    assert queue.first_fit(2).id == 2
+    assert queue.best_fit(4).id == 1
+
+    queue.consume(1, 4)
+    queue.add(LotRecord(4, 4, 13, date(2024, 4, 1)))
+    assert queue.best_fit(4).id == 4
+    assert queue.first_fit(4).id == 3
+
+def test_specific_allocation_uses_best_fit(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=3, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=8, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=8, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=3, unit_price=12),
+    ])
+    db.commit()
+
+    allocate_inventory(db, "SPECIFIC")
+
+    # 先頭適合では1件目が8のロットを使い、2件目の注文を引き当てられない
+    results = db.query(AllocationResult).order_by(AllocationResult.order_id).all()
+    assert [(r.order_id, r.allocated_quantity, r.allocated_price) for r in results] == [(1, 3, 36), (2, 8, 80)]
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [0, 0]
+    cleanup(db)
+
+    monkeypatch.setattr(allocation, "SPECIFIC_LOT_SELECTION", FIRST_FIT)
+    db.add(Order(id=1, item_code="ABC123", quantity=3, allocated=False))
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=8, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=3, unit_price=12),
+    ])
+    db.commit()
+    allocate_inventory(db, "SPECIFIC")
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [5, 3]
+    cleanup(db)
+    db.close()
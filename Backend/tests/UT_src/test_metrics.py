@@ -0,0 +1,126 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import asyncio
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+import metrics
+from metrics import Counter, Histogram
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from app import read_metrics
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.clear()
+    yield
+    metrics.set_enabled(True)
+    metrics.clear()
+
+def seed(db):
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=5, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=3, allocated=False),
+        Order(id=3, item_code="XYZ789", quantity=2, allocated=False),
+    ])
+    db.add_all([
+        Inventory(item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(item_code="ABC123", quantity=6, unit_price=12),
+        Inventory(item_code="XYZ789", quantity=3, unit_price=30),
+    ])
+    db.commit()
+
+def test_render_prometheus_text_format():
+    counter = Counter("test_total", "Test counter.", ("kind",))
+    histogram = Histogram("test_seconds", "Test histogram.", ("path",), buckets=(0.1, 1.0))
+    counter.inc(kind='a"b')
+    counter.inc(2, kind='a"b')
+    histogram.observe(0.05, path="/x")
+    histogram.observe(0.5, path="/x")
+    histogram.observe(5, path="/x")
+
+    assert counter.render() == ["# HELP test_total Test counter.", "# TYPE test_total counter", 'test_total{kind="a\\"b"} 3']
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{path="/x",le="0.1"} 1',
+        'test_seconds_bucket{path="/x",le="1"} 2',
+        'test_seconds_bucket{path="/x",le="+Inf"} 3',
+        'test_seconds_sum{path="/x"} 5.55',
+        'test_seconds_count{path="/x"} 3',
+    ]
+
+def test_allocation_run_summary_and_metrics():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    summary = allocate_inventory(db, "FIFO")
+
+    assert summary["strategy"] == "FIFO"
+    # FIFOは使い切ったロットにも数量0の結果を出力するため、注文2の結果は2件になる
+    assert (summary["items"], summary["orders"], summary["allocation_results"]) == (2, 3, 5)
+    # ABC123 の2ロットと XYZ789 の1ロットを引き当てる
+    assert summary["lots_touched"] == 3
+    assert summary["db_round_trips"] > 0
+    assert set(summary["phases"]) == {"query_orders", "query_inventories", "strategy", "write_results", "flush", "commit"}
+
+    assert metrics.ALLOCATION_ORDERS.get(strategy="FIFO") == 3
+    assert metrics.ALLOCATION_LOTS_TOUCHED.get(strategy="FIFO") == 3
+    assert metrics.ALLOCATION_ROUND_TRIPS.count(strategy="FIFO") == 1
+    assert metrics.ALLOCATION_PHASE_SECONDS.count(phase="commit") == 1
+    assert metrics.DB_ROUND_TRIPS.get() >= summary["db_round_trips"]
+
+def test_disabled_metrics_record_nothing():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    metrics.clear()
+    metrics.set_enabled(False)
+    assert metrics.phase("strategy") is metrics.phase("commit")
+    summary = allocate_inventory(db, "LIFO")
+
+    # 要約の件数は出力するが、計測値は記録しない
+    assert summary["orders"] == 3
+    assert summary["db_round_trips"] is None
+    assert metrics.ALLOCATION_ORDERS.get(strategy="LIFO") == 0
+    assert metrics.DB_ROUND_TRIPS.get() == 0
+
+def test_http_middleware_records_route_template():
+    class Route:
+        path = "/orders/{order_id}/allocate"
+
+    async def call_next(request):
+        request.scope["route"] = Route()
+        return Response(status_code=404)
+
+    async def failing(request):
+        raise RuntimeError("boom")
+
+    request = Request({"type": "http", "method": "POST", "path": "/orders/1/allocate", "headers": []})
+    response = asyncio.run(metrics.http_middleware(request, call_next))
+    assert response.status_code == 404
+    with pytest.raises(RuntimeError):
+        asyncio.run(metrics.http_middleware(Request({"type": "http", "method": "GET", "path": "/x", "headers": []}), failing))
+
+    assert metrics.HTTP_REQUEST_SECONDS.count(method="POST", route="/orders/{order_id}/allocate", status="404") == 1
+    assert metrics.HTTP_REQUEST_SECONDS.count(method="GET", route="unmatched", status="500") == 1
+    body = read_metrics(token_payload=None).body.decode()
+    assert 'inventory_http_request_duration_seconds_count{method="POST",route="/orders/{order_id}/allocate",status="404"} 1' in body
@@ -0,0 +1,148 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from allocation import query_open_orders, query_inventories, query_lot_for_update
+from lot_cache import query_live_lots
+from compaction import depleted_lots_query
+from listing import build_list_query
+from models import Order, AllocationResult
+from migrations import upgrade
+
+# インデックス追加前のテーブル定義
+LEGACY_SCHEMA = [
+    "CREATE TABLE orders (id INTEGER NOT NULL PRIMARY KEY, item_code VARCHAR, quantity INTEGER, allocated BOOLEAN)",
+    "CREATE INDEX ix_orders_id ON orders (id)",
+    "CREATE INDEX ix_orders_item_code ON orders (item_code)",
+    "CREATE TABLE inventories (id INTEGER NOT NULL PRIMARY KEY, item_code VARCHAR, quantity INTEGER, receipt_date DATE, unit_price FLOAT, created_at DATETIME)",
+    "CREATE INDEX ix_inventories_id ON inventories (id)",
+    "CREATE INDEX ix_inventories_item_code ON inventories (item_code)",
+    # モデル定義から削除したインデックス
+    "CREATE INDEX ix_inventories_item_code_id ON inventories (item_code, id)",
+]
+
+def create_migrated_engine(live_ratio):
+    """
+    インデックス追加前のスキーマにマイグレーションを適用し、統計情報を収集したエンジンを返す
+    :param live_ratio: 残数量のあるロット・未割当の注文の割合（10 なら 1/10）
+    """
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        for ddl in LEGACY_SCHEMA:
+            conn.exec_driver_sql(ddl)
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO inventories (item_code, quantity, unit_price) VALUES "
+            + ",".join(f"('ITEM{i % 50}', {5 if (i // 50) % live_ratio == 0 else 0}, 10.0)" for i in range(2000))
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO orders (item_code, quantity, allocated) VALUES "
+            + ",".join(f"('ITEM{i % 50}', 1, {0 if (i // 50) % live_ratio == 0 else 1})" for i in range(2000))
+        )
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+@pytest.fixture
+def migrated_engine():
+    # 使い切ったロット・割当済みの注文が大半を占める状態
+    return create_migrated_engine(live_ratio=10)
+
+def explain(engine, query):
+    """
+    クエリをSQLiteのEXPLAIN QUERY PLANで実行し、実行計画の各行を返す
+    """
+    sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+def test_upgrade_creates_indexes_and_tables(migrated_engine):
+    inspector = inspect(migrated_engine)
+    inventory_indexes = {index["name"] for index in inspector.get_indexes("inventories")}
+    order_indexes = {index["name"] for index in inspector.get_indexes("orders")}
+
+    assert {"ix_inventories_item_code_receipt_date_id", "ix_inventories_open_lots"} <= inventory_indexes
+    assert "ix_inventories_item_code_id" not in inventory_indexes
+    assert "ix_orders_open" in order_indexes
+    assert {"depleted_at", "version"} <= {column["name"] for column in inspector.get_columns("inventories")}
+    assert "version" in {column["name"] for column in inspector.get_columns("orders")}
+    assert "allocation_results" in inspector.get_table_names()
+    assert "inventory_summaries" in inspector.get_table_names()
+
+def test_upgrade_is_idempotent(migrated_engine):
+    upgrade(migrated_engine)
+    inspector = inspect(migrated_engine)
+    assert "ix_orders_open" in {index["name"] for index in inspector.get_indexes("orders")}
+
+def test_partial_indexes_are_partial(migrated_engine):
+    with migrated_engine.connect() as conn:
+        definitions = dict(conn.exec_driver_sql("SELECT name, sql FROM sqlite_master WHERE type = 'index'").all())
+    assert "WHERE quantity > 0" in definitions["ix_inventories_open_lots"]
+    assert "WHERE allocated = 0" in definitions["ix_orders_open"]
+
+def test_open_orders_query_uses_partial_index(migrated_engine):
+    db = sessionmaker(bind=migrated_engine)()
+    plan = explain(migrated_engine, query_open_orders(db))
+    assert any("ix_orders_open" in step for step in plan)
+    # 並び替えのための一時B-treeを使用しない
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+def test_inventories_query_uses_open_lots_index(migrated_engine):
+    db = sessionmaker(bind=migrated_engine)()
+    plan = explain(migrated_engine, query_inventories(db))
+    assert any("SEARCH inventories USING INDEX ix_inventories_open_lots" in step for step in plan)
+    assert any("ix_orders_open" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+def test_live_lots_query_uses_open_lots_index(migrated_engine):
+    db = sessionmaker(bind=migrated_engine)()
+    plan = explain(migrated_engine, query_live_lots(db, "ITEM1"))
+    assert any("ix_inventories_open_lots" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+@pytest.mark.parametrize("live_ratio", [10, 1])
+def test_lot_for_update_query_uses_receipt_date_index(live_ratio):
+    # 割当APIの検索（商品コード + 残数量の条件、入荷日・ID順の先頭1件）は並び替えずに複合インデックスを順に読む
+    engine = create_migrated_engine(live_ratio)
+    db = sessionmaker(bind=engine)()
+    plan = explain(engine, query_lot_for_update(db, "ITEM1", 3))
+    assert any("SEARCH inventories USING INDEX ix_inventories_item_code_receipt_date_id (item_code=?)" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+def explain_statement(engine, statement):
+    """
+    select 文をSQLiteのEXPLAIN QUERY PLANで実行し、実行計画の各行を返す
+    """
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+def test_list_queries_use_keyset_indexes(migrated_engine):
+    # SQLiteの単一カラムのインデックスはrowid（id）を含むため、どちらのインデックスでもID順に検索される
+    # （どちらを使用するかはテーブルの行の幅による）
+    plan = explain_statement(migrated_engine, build_list_query(Order, after_id=100, limit=50, item_code="ITEM1"))
+    assert any("USING INDEX ix_orders_item_code" in step and "id>?" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+    plan = explain_statement(migrated_engine, build_list_query(AllocationResult, after_id=100, limit=50, item_code="ITEM1"))
+    assert any("USING INDEX ix_allocation_results_item_code" in step and "id>?" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+    # 絞り込みなしのページはIDの範囲検索になる
+    plan = explain_statement(migrated_engine, build_list_query(Order, after_id=100, limit=50))
+    assert any("USING INTEGER PRIMARY KEY" in step for step in plan)
+
+def test_depleted_lots_query_uses_partial_index():
+    # アーカイブ後の定常状態（使い切ったロットは少数）
+    engine = create_migrated_engine(live_ratio=1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE inventories SET quantity = 0 WHERE id % 100 = 0")
+        conn.exec_driver_sql("ANALYZE")
+    db = sessionmaker(bind=engine)()
+    plan = explain(engine, depleted_lots_query(db, 100))
+    assert any("ix_inventories_depleted_lots" in step for step in plan)
@@ -0,0 +1,116 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import allocation
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder, AllocationCheckpoint
+from allocation import allocate_inventory
+from parallel_allocation import allocate_inventory_parallel, shard_item_codes
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+
+def create_file_session(path):
+    """
+    ワーカープロセスと共有できるファイルのSQLiteデータベースに、複数商品の注文と在庫を登録したセッションを返す
+    """
+    file_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=file_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)()
+    for i in range(12):
+        item_code = f"ITEM{i}"
+        db.add_all([Order(item_code=item_code, quantity=3 + (i + j) % 4, allocated=False) for j in range(5)])
+        db.add_all([Inventory(item_code=item_code, quantity=4 + (i * j) % 5, unit_price=10 + i + j) for j in range(4)])
+    db.commit()
+    return db
+
+def snapshot(db):
+    """
+    割り当て結果・在庫・注文の状態を比較可能な形で返す（割り当て結果のIDは実行順に依存するため除く）
+    """
+    results = sorted(
+        (result.order_id, result.allocated_quantity, result.allocated_price)
+        for result in db.query(AllocationResult)
+    )
+    inventories = [(inventory.id, inventory.quantity) for inventory in db.query(Inventory).order_by(Inventory.id)]
+    orders = [(order.id, order.allocated) for order in db.query(Order).order_by(Order.id)]
+    summaries = sorted(
+        (summary.item_code, summary.total_quantity, summary.total_value, summary.lot_count)
+        for summary in db.query(InventorySummary)
+    )
+    return results, inventories, orders, summaries
+
+def test_shard_item_codes_is_stable_and_disjoint():
+    item_codes = [f"ITEM{i}" for i in range(100)]
+    shards = shard_item_codes(item_codes, 4)
+
+    assert sorted(code for shard in shards for code in shard) == sorted(item_codes)
+    assert shard_item_codes(list(reversed(item_codes)), 4) == shards
+    with pytest.raises(ValueError):
+        shard_item_codes(item_codes, 0)
+
+def test_allocate_inventory_limited_to_item_codes():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=2, allocated=False),
+        Order(id=2, item_code="XYZ789", quantity=2, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=5, unit_price=10),
+        Inventory(id=2, item_code="XYZ789", quantity=5, unit_price=20),
+    ])
+    db.commit()
+
+    allocate_inventory(db, "FIFO", item_codes=["XYZ789"])
+
+    assert [(order.id, order.allocated) for order in db.query(Order).order_by(Order.id)] == [(1, False), (2, True)]
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [5, 3]
+    assert [result.order_id for result in db.query(AllocationResult)] == [2]
+
+@pytest.mark.parametrize("strategy", ["FIFO", "LIFO", "AVERAGE", "SPECIFIC", "TOTAL_AVERAGE", "MOVING_AVERAGE"])
+def test_parallel_allocation_matches_serial(tmp_path, strategy):
+    serial = create_file_session(tmp_path / "serial.db")
+    parallel = create_file_session(tmp_path / "parallel.db")
+
+    allocate_inventory(serial, strategy)
+    allocated = allocate_inventory_parallel(parallel, strategy, workers=2, shard_count=3)
+
+    assert allocated == 12
+    assert snapshot(parallel) == snapshot(serial)
+
+def test_parallel_allocation_passes_commit_options(tmp_path):
+    serial = create_file_session(tmp_path / "serial.db")
+    parallel = create_file_session(tmp_path / "parallel.db")
+
+    allocate_inventory(serial, "FIFO")
+    # ワーカーも時間枠・区切りコミットごとにコミットし、シャードの残りの商品がなくなるまで繰り返す
+    allocated = allocate_inventory_parallel(parallel, "FIFO", workers=2, shard_count=3, time_slice=1e-9, commit_orders=1, commit_seconds=1e-9)
+
+    assert allocated == 12
+    assert snapshot(parallel) == snapshot(serial)
+    assert parallel.query(AllocationCheckpoint).count() == 3
+
+def test_main_rejects_resume_with_workers(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["allocation.py", "--workers", "2", "--resume"])
+    with pytest.raises(SystemExit):
+        allocation.main()
+
+def test_parallel_allocation_rejects_in_memory_database():
+    db = TestingSessionLocal()
+    with pytest.raises(ValueError):
+        allocate_inventory_parallel(db, "FIFO", workers=2)
@@ -0,0 +1,87 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import random
+import pytest
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from database import Base, TestingSessionLocal, engine
+import pricing
+
+pytest.importorskip("numpy")
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def run_allocation(strategy, orders, lots, use_numpy, monkeypatch):
+    """
+    同じテストデータで在庫割当を実行し、割り当て結果と在庫残数量を返す
+    """
+    monkeypatch.setattr(pricing, "HAS_NUMPY", use_numpy)
+    db = TestingSessionLocal()
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+
+    db.add_all([Order(id=i + 1, item_code=item_code, quantity=quantity, allocated=False) for i, (item_code, quantity) in enumerate(orders)])
+    db.add_all([Inventory(item_code=item_code, quantity=quantity, unit_price=unit_price) for item_code, quantity, unit_price in lots])
+    db.commit()
+
+    allocate_inventory(db, strategy)
+
+    results = db.query(AllocationResult).order_by(AllocationResult.order_id, AllocationResult.id).all()
+    inventories = db.query(Inventory).order_by(Inventory.id).all()
+    allocated = [(r.order_id, r.allocated_quantity, r.allocated_price) for r in results]
+    remaining = [inventory.quantity for inventory in inventories]
+    db.close()
+    return allocated, remaining
+
+@pytest.mark.parametrize("strategy", ["AVERAGE", "TOTAL_AVERAGE", "MOVING_AVERAGE"])
+def test_vectorized_matches_python(strategy, monkeypatch):
+    rng = random.Random(42)
+    item_codes = [f"ITEM{i}" for i in range(4)]
+    # 在庫不足・数量0のロットを含むテストデータ
+    lots = [(rng.choice(item_codes), rng.choice([0, 1, 3, 5, 8]), rng.choice([9.5, 10, 12.25, 15])) for _ in range(30)]
+    orders = [(rng.choice(item_codes), rng.randint(1, 6)) for _ in range(40)]
+
+    expected_allocated, expected_remaining = run_allocation(strategy, orders, lots, False, monkeypatch)
+    allocated, remaining = run_allocation(strategy, orders, lots, True, monkeypatch)
+
+    assert remaining == expected_remaining
+    assert [(order_id, quantity) for order_id, quantity, _ in allocated] == [(order_id, quantity) for order_id, quantity, _ in expected_allocated]
+    assert [price for _, _, price in allocated] == pytest.approx([price for _, _, price in expected_allocated])
+
+def test_consume_depletes_lots_in_order():
+    import numpy as np
+    before, allocated, remaining = pricing.consume(np.array([4, 0, 6]), np.array([5, 3, 4]))
+    assert before.tolist() == [0, 5, 8]
+    assert allocated.tolist() == [5, 3, 2]
+    assert remaining.tolist() == [0, 0, 0]
+
+def test_average_prices():
+    prices, remaining = pricing.average_prices([4, 8], [20, 22], [6])
+    assert prices == pytest.approx([6 * 256 / 12])
+    assert remaining == [0, 6]
+
+def test_total_average_prices_with_shortage():
+    prices, remaining = pricing.total_average_prices([3, 5], [10, 12], [7, 4])
+    # 在庫不足の注文は引当数量（2件目は1）で計上する
+    assert prices == pytest.approx([7 * 90 / 8, 1 * 12])
+    assert remaining == [0, 0]
+
+def test_moving_average_prices_window():
+    prices, remaining = pricing.moving_average_prices([1, 1, 1, 1, 5], [10, 20, 30, 40, 50], [4, 1])
+    assert prices == pytest.approx([4 * (20 + 30 + 40) / 3, 1 * (30 + 40 + 50) / 3])
+    assert remaining == [0, 0, 0, 0, 4]
+
+def test_is_supported():
+    assert pricing.is_supported([1, 2], [10, 20], [1])
+    assert not pricing.is_supported([], [], [1])
+    assert not pricing.is_supported([1], [10], [0])
+    assert not pricing.is_supported([1], [None], [1])
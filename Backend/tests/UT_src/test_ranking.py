@@ -0,0 +1,108 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from datetime import date
+from types import SimpleNamespace
+import pytest
+import ranking
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def seed(db):
+    # 在庫不足（需要10に対して在庫5）
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=5, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=2, allocated=False),
+        Order(id=3, item_code="ABC123", quantity=3, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=3, unit_price=12, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="ABC123", quantity=2, unit_price=10, receipt_date=date(2024, 1, 2)),
+    ])
+    db.commit()
+
+def test_rank_assignments_fills_small_orders_from_cheap_lots():
+    assignments = ranking.rank_assignments([5, 2, 3], [4, 3], [10, 9])
+    assert assignments == [(0, 0, 2), (1, 1, 2), (2, 0, 2), (2, 1, 1)]
+    # 在庫が足りる場合は全注文を引き当てる
+    assert sum(quantity for _, _, quantity in ranking.rank_assignments([1, 2], [5], [1])) == 3
+    assert ranking.rank_assignments([1], [0], [1]) == []
+
+def test_rank_assignments_fills_urgent_ranks_first():
+    # 階級0（最も緊急）の注文は数量が多くても先に引き当てる
+    assignments = ranking.rank_assignments([5, 2, 3], [4, 3], [10, 9], ranks=[0, 1, 1])
+    assert assignments == [(0, 0, 2), (0, 1, 3), (1, 0, 2)]
+
+def test_lot_costs_discount_older_lots():
+    lots = [
+        SimpleNamespace(unit_price=10, receipt_date=date(2024, 1, 1)),
+        SimpleNamespace(unit_price=10, receipt_date=date(2024, 1, 11)),
+        SimpleNamespace(unit_price=10, receipt_date=None),
+    ]
+    assert ranking.lot_costs(lots, today=date(2024, 1, 21), age_weight=0.1) == pytest.approx([8, 9, 10])
+
+def test_ranked_strategy_fills_more_orders_than_fifo():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    summary = allocate_inventory(db, "RANKED")
+
+    # FIFOでは注文1のみ（在庫5で数量5）だが、数量の少ない順では注文2・3を全量引き当てる
+    assert summary["backorders"] == 1
+    states = [(order.id, order.allocated, order.allocated_quantity) for order in db.query(Order).order_by(Order.id)]
+    assert states == [(1, False, 0), (2, True, 2), (3, True, 3)]
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [0, 0]
+    results = db.query(AllocationResult).order_by(AllocationResult.order_id, AllocationResult.id).all()
+    assert sum(r.allocated_price for r in results) == 3 * 12 + 2 * 10
+    summary = db.get(InventorySummary, "ABC123")
+    assert (summary.total_quantity, summary.lot_count) == (0, 0)
+    cleanup(db)
+    db.close()
+
+def test_ranked_strategy_fills_high_priority_orders_first():
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+    db.get(Order, 1).priority = 1
+    db.commit()
+
+    summary = allocate_inventory(db, "RANKED")
+
+    # 優先度の高い注文1を全量引き当ててから、残りの在庫で小さい注文を引き当てる
+    assert summary["backorders"] == 2
+    states = [(order.id, order.allocated, order.allocated_quantity) for order in db.query(Order).order_by(Order.id)]
+    assert states == [(1, True, 5), (2, False, 0), (3, False, 0)]
+    cleanup(db)
+    db.close()
+
+def test_time_budget_falls_back_to_fifo(monkeypatch):
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+    monkeypatch.setattr(ranking, "RANKING_TIME_BUDGET", -1)
+
+    allocate_inventory(db, "RANKED")
+
+    states = [(order.id, order.allocated, order.allocated_quantity) for order in db.query(Order).order_by(Order.id)]
+    assert states == [(1, True, 5), (2, False, 0), (3, False, 0)]
+    assert ranking._deadline is None
+    cleanup(db)
+    db.close()
@@ -0,0 +1,106 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from datetime import date
+import pytest
+from sqlalchemy import event
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from result_writer import AllocationResultWriter
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+
+def test_writer_flushes_in_chunks():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    order = Order(id=1, item_code="ABC123", quantity=5, allocated=False)
+    db.add(order)
+    db.commit()
+
+    # 発行されたINSERT文の数を計測
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        writer = AllocationResultWriter(db, chunk_size=2)
+        for i in range(5):
+            writer.add(order.id, 1, 10.0 + i)
+        # チャンクサイズに達した分だけ書き込まれている
+        assert len(inserts) == 2
+        assert writer.written == 4
+        writer.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert len(inserts) == 3
+    assert writer.written == 5
+    db.commit()
+
+    results = db.query(AllocationResult).order_by(AllocationResult.id).all()
+    assert [r.allocated_price for r in results] == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert all(r.order_id == 1 and r.allocated_quantity == 1 for r in results)
+
+def test_writer_context_manager_flushes_on_exit():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add(Order(id=1, item_code="ABC123", quantity=5, allocated=False))
+    db.commit()
+
+    with AllocationResultWriter(db, chunk_size=100) as writer:
+        writer.add(1, 5, 50.0)
+        assert db.query(AllocationResult).count() == 0
+    db.commit()
+
+    assert db.query(AllocationResult).count() == 1
+
+def test_writer_records_item_code_and_allocation_date():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add(Order(id=1, item_code="ABC123", quantity=5, allocated=False))
+    db.commit()
+
+    with AllocationResultWriter(db, chunk_size=100, allocation_date=date(2024, 3, 1)) as writer:
+        writer.add(1, 5, 50.0, "ABC123")
+    db.commit()
+
+    result = db.query(AllocationResult).one()
+    assert (result.item_code, result.allocation_date) == ("ABC123", date(2024, 3, 1))
+
+def test_writer_rejects_invalid_chunk_size():
+    db = TestingSessionLocal()
+    with pytest.raises(ValueError):
+        AllocationResultWriter(db, chunk_size=0)
+
+def test_allocate_inventory_does_not_track_result_objects():
+    db = TestingSessionLocal()
+    cleanup(db)
+
+    db.add_all([Order(id=i, item_code="ABC123", quantity=1, allocated=False) for i in range(1, 11)])
+    db.add(Inventory(item_code="ABC123", quantity=20, unit_price=10))
+    db.commit()
+
+    allocate_inventory(db, "FIFO", chunk_size=3)
+
+    # 割り当て結果のORMオブジェクトはセッションに保持されない
+    assert not any(isinstance(obj, AllocationResult) for obj in db.identity_map.values())
+    assert db.query(AllocationResult).count() == 10
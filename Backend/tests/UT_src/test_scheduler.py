@@ -0,0 +1,127 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+from datetime import date
+from types import SimpleNamespace
+import scheduler
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory
+from backorders import load_backorders
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+def make_order(id, quantity=1, priority=0, due_date=None, customer_id=None):
+    return SimpleNamespace(id=id, item_code="ABC123", quantity=quantity, priority=priority, due_date=due_date, customer_id=customer_id)
+
+def test_schedule_orders_by_priority_and_due_date():
+    orders = [
+        make_order(1),
+        make_order(2, due_date=date(2024, 3, 1)),
+        make_order(3, priority=5),
+        make_order(4, due_date=date(2024, 2, 1)),
+        make_order(5, priority=5, due_date=date(2024, 1, 1)),
+    ]
+    assert [order.id for order in scheduler.schedule(orders)] == [5, 3, 4, 2, 1]
+
+def test_order_items_by_most_urgent_order():
+    orders_by_item = {
+        "A": [make_order(1), make_order(2)],
+        "B": [make_order(3), make_order(4, priority=1)],
+        "C": [make_order(5, due_date=date(2024, 1, 1))],
+        "D": [make_order(6)],
+    }
+    # 優先度・納期が同じ商品は商品コード順
+    assert scheduler.order_items(orders_by_item) == ["B", "C", "A", "D"]
+
+def test_fair_share_defers_orders_over_cap():
+    orders = [
+        make_order(1, quantity=4, customer_id="X"),
+        make_order(2, quantity=4, customer_id="X"),
+        make_order(3, quantity=3, customer_id="Y"),
+        make_order(4, quantity=2),
+    ]
+    # 在庫10に対して需要13。1顧客の上限は ceil(10 × 0.5) = 5 のため、顧客Xの2件目を後回しにする
+    assert [order.id for order in scheduler.schedule(orders, available=10, fair_share=0.5)] == [1, 3, 4, 2]
+    # 在庫が足りる場合・上限が無効の場合は緊急度順のまま
+    assert [order.id for order in scheduler.schedule(orders, available=13, fair_share=0.5)] == [1, 2, 3, 4]
+    assert [order.id for order in scheduler.schedule(orders, available=10, fair_share=0)] == [1, 2, 3, 4]
+
+def test_urgency_ranks_put_deferred_orders_last():
+    orders = [
+        make_order(1, quantity=4, customer_id="X", priority=1),
+        make_order(2, quantity=4, customer_id="X", priority=1),
+        make_order(3, quantity=3, customer_id="Y", priority=1),
+        make_order(4, quantity=2),
+    ]
+    scheduled = scheduler.schedule(orders, available=10, fair_share=0.5)
+    assert [order.id for order in scheduled] == [1, 3, 4, 2]
+    # 後回しにした注文2は同じ優先度の注文1・3より後、優先度の低い注文4より後の階級
+    assert scheduler.urgency_ranks(scheduled) == [0, 0, 1, 2]
+
+def test_high_priority_order_gets_scarce_stock():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=5, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=5, allocated=False, due_date=date(2024, 2, 1)),
+        Order(id=3, item_code="ABC123", quantity=5, allocated=False, priority=1),
+    ])
+    db.add(Inventory(id=1, item_code="ABC123", quantity=10, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+
+    summary = allocate_inventory(db, "FIFO")
+
+    assert summary["backorders"] == 1
+    states = [(order.id, order.allocated, order.allocated_quantity) for order in db.query(Order).order_by(Order.id)]
+    assert states == [(1, False, 0), (2, True, 5), (3, True, 5)]
+    # バックオーダーは注文の優先度を引き継ぐ
+    assert [(backorder.order_id, backorder.priority) for backorder, _ in load_backorders(db, "ABC123")] == [(1, 0)]
+    cleanup(db)
+    db.close()
+
+def test_time_slice_yields_at_item_boundary():
+    db = TestingSessionLocal()
+    cleanup(db)
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=1, allocated=False),
+        Order(id=2, item_code="DEF456", quantity=1, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+        Inventory(id=2, item_code="DEF456", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)),
+    ])
+    db.commit()
+
+    # 時間枠を超えても最低1商品は処理する
+    summary = allocate_inventory(db, "FIFO", time_slice=1e-9)
+    assert (summary["items"], summary["remaining_items"]) == (1, 1)
+    assert [order.allocated for order in db.query(Order).order_by(Order.id)] == [True, False]
+
+    # 中断中に登録された優先度の高い注文の商品を先に処理する
+    db.add(Order(id=3, item_code="GHI789", quantity=1, allocated=False, priority=9))
+    db.add(Inventory(id=3, item_code="GHI789", quantity=5, unit_price=10, receipt_date=date(2024, 1, 1)))
+    db.commit()
+    summary = allocate_inventory(db, "FIFO", time_slice=1e-9)
+    assert (summary["items"], summary["remaining_items"]) == (1, 1)
+    assert db.get(Order, 3).allocated
+
+    summary = allocate_inventory(db, "FIFO", time_slice=0)
+    assert (summary["items"], summary["remaining_items"]) == (1, 0)
+    assert all(order.allocated for order in db.query(Order))
+    cleanup(db)
+    db.close()
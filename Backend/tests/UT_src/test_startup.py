@@ -0,0 +1,48 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+src_dir = os.path.join(grandparent_dir, 'Backend', 'src')
+sys.path.insert(0, src_dir)
+
+import json
+import subprocess
+import database
+
+def run_python(script: str) -> subprocess.CompletedProcess:
+    """
+    新しいPythonプロセスでスクリプトを実行する（読み込み済みのモジュールの影響を受けないようにする）
+    """
+    env = dict(os.environ, PYTHONPATH=src_dir)
+    return subprocess.run([sys.executable, "-c", script], cwd=src_dir, env=env, capture_output=True, text=True, check=True)
+
+def test_import_app_defers_engine_and_rarely_used_modules():
+    completed = run_python(
+        "import json, sys\n"
+        "import app, database\n"
+        "print(json.dumps({'engine': database._engine is not None, 'modules': [name for name in ('numpy', 'bulk', 'export') if name in sys.modules]}))"
+    )
+    # 読み込み時には標準出力に何も出力せず、エンジンも作成しない
+    assert json.loads(completed.stdout) == {"engine": False, "modules": []}
+
+def test_engine_is_created_once_on_first_use():
+    engine = database.get_engine()
+    assert database.engine is engine
+    assert database.SessionLocal is database.get_sessionmaker()
+    assert database.TestingSessionLocal is database.SessionLocal
+
+    db = next(database.get_db())
+    assert db.get_bind() is engine
+    db.close()
+
+def test_pricing_loads_numpy_on_first_use():
+    completed = run_python(
+        "import sys\n"
+        "import pricing\n"
+        "assert 'numpy' not in sys.modules\n"
+        "if pricing.HAS_NUMPY:\n"
+        "    prices, remaining = pricing.average_prices([4, 8], [20, 22], [6])\n"
+        "    assert 'numpy' in sys.modules and pricing.np is sys.modules['numpy']\n"
+        "print('ok')"
+    )
+    assert completed.stdout.strip() == "ok"
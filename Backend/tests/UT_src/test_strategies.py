@@ -0,0 +1,138 @@
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grandparent_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+sys.path.insert(0, os.path.join(grandparent_dir, 'Backend', 'src'))
+
+import pytest
+import strategies
+from models import Order, Inventory, AllocationResult, InventorySummary, Backorder
+from allocation import allocate_inventory, create_allocation_result
+from inventory_summary import deplete_lot, rebuild_summaries
+from strategies import AllocationStrategy, DESCENDING, get_strategy, register_strategy, strategy_names
+from lot_cache import lot_cache
+from database import Base, TestingSessionLocal, engine
+
+# テスト前にデータベースのテーブルを作成
+Base.metadata.create_all(bind=engine)
+
+def cleanup(db):
+    db.query(Backorder).delete()
+    db.query(Order).delete()
+    db.query(Inventory).delete()
+    db.query(AllocationResult).delete()
+    db.query(InventorySummary).delete()
+    db.commit()
+    lot_cache.invalidate()
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    テストで登録した戦略が他のテストに残らないようにする
+    """
+    monkeypatch.setattr(strategies, "STRATEGIES", dict(strategies.STRATEGIES))
+    monkeypatch.setattr(strategies, "_entry_points_loaded", False)
+    return strategies.STRATEGIES
+
+def seed(db):
+    db.add_all([
+        Order(id=1, item_code="ABC123", quantity=5, allocated=False),
+        Order(id=2, item_code="ABC123", quantity=3, allocated=False),
+    ])
+    db.add_all([
+        Inventory(id=1, item_code="ABC123", quantity=4, unit_price=10),
+        Inventory(id=2, item_code="ABC123", quantity=6, unit_price=12),
+    ])
+    db.commit()
+
+def test_builtin_strategies_are_registered():
+    assert strategy_names()[:6] == ["FIFO", "LIFO", "AVERAGE", "SPECIFIC", "TOTAL_AVERAGE", "MOVING_AVERAGE"]
+    assert get_strategy("LIFO").lot_order == DESCENDING
+    assert get_strategy("AVERAGE").needs_aggregate
+    assert not get_strategy("FIFO").needs_aggregate
+    with pytest.raises(ValueError):
+        get_strategy("UNKNOWN")
+    with pytest.raises(ValueError):
+        AllocationStrategy("BAD", lambda *args: None, lot_order="random")
+
+def test_custom_strategy_receives_declared_lot_order(registry):
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    received = []
+
+    def allocate_most_expensive(db, order, lots, writer, summary):
+        # 単価の高い（新しい）ロットから引き当てる
+        received.append(([lot.id for lot in lots], summary))
+        remaining_quantity = order.quantity
+        for lot in lots:
+            allocated_quantity = min(remaining_quantity, lot.quantity)
+            if allocated_quantity <= 0:
+                continue
+            remaining_quantity -= allocated_quantity
+            deplete_lot(lot, allocated_quantity)
+            create_allocation_result(db, order, allocated_quantity, allocated_quantity * lot.unit_price, writer)
+
+    register_strategy(AllocationStrategy("NEWEST", allocate_most_expensive, lot_order=DESCENDING))
+    with pytest.raises(ValueError):
+        register_strategy(AllocationStrategy("NEWEST", allocate_most_expensive))
+
+    allocate_inventory(db, "NEWEST")
+
+    # 並べ替えは商品ごとに1回で、在庫集計は渡されない（割り当て後にまとめて反映される）
+    assert received == [([2, 1], None), ([2, 1], None)]
+    assert [inventory.quantity for inventory in db.query(Inventory).order_by(Inventory.id)] == [2, 0]
+    maintained = db.get(InventorySummary, "ABC123")
+    assert (maintained.total_quantity, maintained.total_value, maintained.lot_count) == (2, 20, 1)
+
+    rebuild_summaries(db)
+    db.commit()
+    rebuilt = db.get(InventorySummary, "ABC123")
+    assert (rebuilt.total_quantity, rebuilt.total_value, rebuilt.lot_count) == (2, 20, 1)
+
+def test_aggregate_strategy_receives_summary(registry):
+    db = TestingSessionLocal()
+    cleanup(db)
+    seed(db)
+
+    summaries = []
+
+    def allocate_recording(db, order, lots, writer, summary):
+        summaries.append(summary)
+        create_allocation_result(db, order, order.quantity, 0, writer)
+
+    register_strategy(AllocationStrategy("RECORDING", allocate_recording, needs_aggregate=True))
+    allocate_inventory(db, "RECORDING")
+
+    assert len(summaries) == 2
+    assert summaries[0] is summaries[1]
+    assert summaries[0].item_code == "ABC123"
+
+def test_strategies_are_loaded_from_entry_points(registry, monkeypatch):
+    class FakeEntryPoint:
+        def __init__(self, name, value):
+            self.name = name
+            self.value = value
+
+        def load(self):
+            if isinstance(self.value, Exception):
+                raise self.value
+            return self.value
+
+    plugin = AllocationStrategy("PLUGIN", lambda *args: None)
+    factory = lambda: AllocationStrategy("FACTORY", lambda *args: None)
+    loaded_groups = []
+
+    def fake_entry_points(group):
+        loaded_groups.append(group)
+        return [FakeEntryPoint("plugin", plugin), FakeEntryPoint("factory", factory), FakeEntryPoint("broken", ImportError("missing"))]
+
+    monkeypatch.setattr(strategies, "entry_points", fake_entry_points)
+
+    assert get_strategy("PLUGIN") is plugin
+    assert "FACTORY" in strategy_names()
+    # エントリーポイントは1回だけ読み込み、読み込めない戦略は無視する
+    assert loaded_groups == [strategies.ENTRY_POINT_GROUP]
+    with pytest.raises(ValueError):
+        get_strategy("broken")